@@ -22,6 +22,30 @@ nodelist
 visualise
     Convert a GlobalTalk JSON snapshot into visualisation formats (Mermaid
     mindmap, D3.js hierarchical JSON).
+
+merge
+    Stream-merge several snapshots or sorted NDJSON node files into a single
+    de-duplicated data set.
+
+query
+    Answer filter queries about a GlobalTalk JSON snapshot from in-memory
+    zone, type, address and object indexes.
+
+backfill
+    Regenerate historical metrics from many archived snapshots in parallel,
+    as CSV, JSON or an OpenMetrics backfill file.
+
+archive
+    Store a series of snapshots as periodic keyframes plus compact deltas,
+    and reconstruct the snapshot in effect at any point in time.
+
+run
+    Scrape or load a snapshot once and write the snapshot, metrics and
+    visualisations from it in a single process.
+
+serve
+    Serve a snapshot, its zones, node queries and visualisations over HTTP,
+    reloading when the snapshot file changes.
 """
 
 __version__ = "0.1.0"
@@ -32,4 +56,10 @@ __all__ = [
     "metrics",
     "nodelist",
     "visualise",
+    "merge",
+    "query",
+    "backfill",
+    "archive",
+    "run",
+    "serve",
 ]
@@ -5,15 +5,23 @@ GlobalTalk CLI
 Unified entry point for the globaltalk toolkit.
 
 Usage:
-    globaltalk <command> [options]
+    globaltalk [--profile FILE] [--trace-malloc] <command> [options]
 
 Commands:
     scrape      Scrape the GlobalTalk network and emit a JSON snapshot
     metrics     Convert a JSON snapshot into Prometheus metrics
     nodelist    Convert a node list into a jrouter YAML configuration
+    visualise   Convert a JSON snapshot into a visualisation format
+    merge       Merge snapshots and sorted NDJSON node streams
+    query       Query the nodes in a JSON snapshot
+    backfill    Regenerate historical metrics from archived snapshots
+    archive     Store snapshots as compact keyframes and deltas
+    run         Write several outputs from one scrape or snapshot
+    serve       Serve a JSON snapshot over HTTP
 """
 
 import sys
+from typing import List, Optional, Tuple
 
 from globaltalk import __version__
 
@@ -22,36 +30,87 @@ COMMANDS = {
     "metrics": "globaltalk.metrics",
     "nodelist": "globaltalk.nodelist",
     "visualise": "globaltalk.visualise",
+    "merge": "globaltalk.merge",
+    "query": "globaltalk.query",
+    "backfill": "globaltalk.backfill",
+    "archive": "globaltalk.archive",
+    "run": "globaltalk.run",
+    "serve": "globaltalk.serve",
 }
 
 HELP = """\
-usage: globaltalk <command> [options]
+usage: globaltalk [--profile FILE] [--trace-malloc] <command> [options]
 
 GlobalTalk network toolkit.
 
+global options:
+  --profile FILE  Run the command under cProfile, dump stats to FILE and
+                  print a per-phase timing report to stderr
+  --trace-malloc  Trace allocations and report peak memory and the top
+                  allocation sites to stderr
+
 commands:
   scrape      Scrape the GlobalTalk network and emit a JSON snapshot
   metrics     Convert a JSON snapshot into Prometheus metrics
   nodelist    Convert a node list into a jrouter YAML configuration
   visualise   Convert a JSON snapshot into a visualisation format
+  merge       Merge snapshots and sorted NDJSON node streams
+  query       Query the nodes in a JSON snapshot
+  backfill    Regenerate historical metrics from archived snapshots
+  archive     Store snapshots as compact keyframes and deltas
+  run         Write several outputs from one scrape or snapshot
+  serve       Serve a JSON snapshot over HTTP
 
 Run 'globaltalk <command> --help' for help on a specific command.
 Run 'globaltalk --version' to print the version and exit.
 """
 
 
+def _pop_global_options(argv: List[str]) -> Tuple[Optional[str], bool, List[str]]:
+    """Strip the global profiling options from the front of *argv*.
+
+    Returns a ``(profile_path, trace_malloc, remaining_argv)`` tuple.  Only
+    options that appear before the subcommand name are consumed, so a
+    subcommand remains free to define options with the same names.
+    """
+    profile_path: Optional[str] = None
+    trace_malloc = False
+    args = list(argv)
+
+    while args:
+        arg = args[0]
+        if arg == "--trace-malloc":
+            trace_malloc = True
+            args.pop(0)
+        elif arg == "--profile":
+            if len(args) < 2:
+                sys.stderr.write("globaltalk: --profile requires a file name\n")
+                sys.exit(1)
+            profile_path = args[1]
+            del args[:2]
+        elif arg.startswith("--profile="):
+            profile_path = arg.partition("=")[2]
+            args.pop(0)
+        else:
+            break
+
+    return profile_path, trace_malloc, args
+
+
 def main() -> None:
+    profile_path, trace_malloc, args = _pop_global_options(sys.argv[1:])
+
     # Pull the subcommand out of argv before delegating, so that each
     # submodule's argparse instance only sees its own arguments.
-    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+    if not args or args[0] in ("-h", "--help"):
         sys.stdout.write(HELP)
         sys.exit(0)
 
-    if sys.argv[1] in ("-V", "--version"):
+    if args[0] in ("-V", "--version"):
         sys.stdout.write(f"globaltalk {__version__}\n")
         sys.exit(0)
 
-    command = sys.argv[1]
+    command = args[0]
 
     if command not in COMMANDS:
         sys.stderr.write(f"globaltalk: unknown command '{command}'\n\n")
@@ -59,7 +118,7 @@ def main() -> None:
         sys.exit(1)
 
     # Replace argv so the subcommand's own argparse sees a clean slate.
-    sys.argv = [f"globaltalk {command}", *sys.argv[2:]]
+    sys.argv = [f"globaltalk {command}", *args[1:]]
 
     module_name = COMMANDS[command]
 
@@ -67,7 +126,14 @@ def main() -> None:
     import importlib
 
     module = importlib.import_module(module_name)
-    module.main()
+
+    if profile_path is None and not trace_malloc:
+        module.main()
+        return
+
+    from globaltalk.profiling import run_profiled
+
+    run_profiled(module.main, profile_path=profile_path, trace_malloc=trace_malloc)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Archive
+
+A compact on-disk archive of GlobalTalk snapshots taken over time.
+
+Consecutive scrapes are nearly identical, so rather than storing every
+snapshot in full the archive keeps a full *keyframe* every
+``keyframe_interval`` snapshots and, in between, a small *delta* against the
+previous snapshot:
+
+- node additions and removals, keyed on ``(address, socket, type, object)``
+  like :func:`globaltalk.scrape.deduplicate_nodes` (a node whose key is
+  unchanged but whose zone moved is stored as an addition, which replaces
+  it);
+- zones added to and removed from the ``zones`` list, or the whole list
+  when it is not the previous one with zones removed and new ones appended
+  (a zone inserted part-way, a reordering or a duplicate);
+- the remaining top-level fields (``generated_at``, ``format``, ...).
+
+An archive is a directory::
+
+    archive/
+        index.json                 # one entry per snapshot, in time order
+        00000000.json.gz           # keyframe
+        00000001.delta.json.gz     # delta against snapshot 0
+        ...
+
+Any snapshot is reconstructed by loading the nearest keyframe at or before it
+and replaying the deltas that follow, so a read touches the index, one
+keyframe and fewer than ``keyframe_interval`` small delta files.
+
+Reconstructed snapshots hold each node key once (the first occurrence wins,
+as in ``globaltalk scrape``).  Nodes keep their keyframe order, with nodes
+added by later deltas appended.
+"""
+
+import bisect
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from globaltalk.atomic import write_atomic
+from globaltalk.metrics import _snapshot_timestamp, load_data
+from globaltalk.profiling import phase
+from globaltalk.scrape import node_key
+
+# Snapshots between keyframes: four hours of five-minute scrapes.
+DEFAULT_KEYFRAME_INTERVAL = 48
+
+INDEX_FILE = "index.json"
+
+_INDEX_VERSION = 1
+
+
+class ArchiveEntry(NamedTuple):
+    """One snapshot in an archive's index.
+
+    Attributes:
+        seq: Position of the snapshot in the archive, from 0.
+        timestamp: The snapshot's ``generated_at`` time as a Unix timestamp.
+        file: The keyframe or delta file, relative to the archive directory.
+        keyframe: ``True`` if *file* holds the full snapshot.
+    """
+
+    seq: int
+    timestamp: float
+    file: str
+    keyframe: bool
+
+
+# ---------------------------------------------------------------------------
+# Deltas
+# ---------------------------------------------------------------------------
+
+
+# Fields not carried in a delta's meta.  ``zone_hashes`` (from ``scrape
+# --canonical``) describes the nodes as scraped, in canonical order; a
+# reconstructed snapshot holds its nodes in a different order, so renderers
+# and caches must recompute the hashes rather than trust stale ones.
+_REBUILT_FIELDS = ("nodes", "zones", "zone_hashes")
+
+
+def _keyed_nodes(nodes: List[Dict[str, str]]) -> Dict[Tuple[str, ...], Dict[str, str]]:
+    """Return *nodes* keyed on :func:`node_key`, keeping the first occurrence."""
+    keyed: Dict[Tuple[str, ...], Dict[str, str]] = {}
+    for node in nodes:
+        keyed.setdefault(node_key(node), node)
+    return keyed
+
+
+def compute_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the delta that turns snapshot *old* into snapshot *new*.
+
+    The delta is a dictionary with the keys ``meta`` (every top-level field of
+    *new* other than ``nodes`` and ``zones``), ``zones_added``,
+    ``zones_removed``, ``nodes_added`` (full node records) and
+    ``nodes_removed`` (node keys as lists).  If applying the zone changes
+    would not reproduce *new*'s ``zones`` list exactly, the delta also holds
+    that list as ``zones``.
+    """
+    old_nodes = _keyed_nodes(old.get("nodes", []))
+    new_nodes = _keyed_nodes(new.get("nodes", []))
+    old_zones_list = old.get("zones", [])
+    new_zones_list = new.get("zones", [])
+    old_zones = set(old_zones_list)
+    new_zones = set(new_zones_list)
+    zones_added = [z for z in new_zones_list if z not in old_zones]
+
+    delta = {
+        "meta": {k: v for k, v in new.items() if k not in _REBUILT_FIELDS},
+        "zones_added": zones_added,
+        "zones_removed": [z for z in old_zones_list if z not in new_zones],
+        "nodes_added": [
+            node for key, node in new_nodes.items() if old_nodes.get(key) != node
+        ],
+        "nodes_removed": [list(key) for key in old_nodes if key not in new_nodes],
+    }
+    kept = [z for z in old_zones_list if z in new_zones]
+    if kept + zones_added != new_zones_list:
+        delta["zones"] = list(new_zones_list)
+    return delta
+
+
+def apply_delta(data: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a new snapshot: *data* with *delta* applied.
+
+    *data* is not modified.
+    """
+    if "zones" in delta:
+        zones = list(delta["zones"])
+    else:
+        removed_zones = set(delta["zones_removed"])
+        zones = [z for z in data.get("zones", []) if z not in removed_zones]
+        zones.extend(delta["zones_added"])
+
+    nodes = _keyed_nodes(data.get("nodes", []))
+    for key in delta["nodes_removed"]:
+        nodes.pop(tuple(key), None)
+    for node in delta["nodes_added"]:
+        # Replacing a dict value keeps its position, so moved nodes stay put.
+        nodes[node_key(node)] = node
+
+    result = {k: v for k, v in delta["meta"].items() if k not in _REBUILT_FIELDS}
+    result["zones"] = zones
+    result["nodes"] = list(nodes.values())
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------------
+
+
+class SnapshotArchive:
+    """A keyframe-plus-delta archive of snapshots in the directory *path*.
+
+    Args:
+        path: Archive directory.  It is created on the first :meth:`add`.
+        keyframe_interval: Store a full keyframe every this many snapshots.
+            Only used when creating a new archive; an existing archive keeps
+            the interval recorded in its index.
+
+    Raises:
+        ValueError: If the index exists but cannot be read, or was written
+            in a different index version.
+    """
+
+    def __init__(
+        self, path: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL
+    ) -> None:
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.entries: List[ArchiveEntry] = []
+        # The most recent snapshot, kept once known so that consecutive
+        # add() calls need not replay the archive.
+        self._head: Optional[Dict[str, Any]] = None
+
+        index_path = os.path.join(path, INDEX_FILE)
+        try:
+            with open(index_path, "r", encoding="utf-8") as fh:
+                index = json.load(fh)
+            if index.get("version") != _INDEX_VERSION:
+                raise ValueError(
+                    f"unsupported version {index.get('version')!r}"
+                    f" (expected {_INDEX_VERSION})"
+                )
+            self.keyframe_interval = int(index["keyframe_interval"])
+            self.entries = [ArchiveEntry(*entry) for entry in index["entries"]]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as exc:
+            raise ValueError(f"Invalid archive index {index_path}: {exc}") from exc
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _read(self, entry: ArchiveEntry) -> Dict[str, Any]:
+        with gzip.open(
+            os.path.join(self.path, entry.file), "rt", encoding="utf-8"
+        ) as fh:
+            return json.load(fh)
+
+    def _write(self, name: str, data: Dict[str, Any]) -> None:
+        raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        # A fixed mtime keeps the files reproducible.
+        write_atomic(os.path.join(self.path, name), gzip.compress(raw, mtime=0))
+
+    def _write_index(self) -> None:
+        index = {
+            "version": _INDEX_VERSION,
+            "keyframe_interval": self.keyframe_interval,
+            "entries": [list(entry) for entry in self.entries],
+        }
+        write_atomic(
+            os.path.join(self.path, INDEX_FILE),
+            (json.dumps(index, indent=1) + "\n").encode("utf-8"),
+        )
+
+    def find(self, timestamp: Optional[float] = None) -> ArchiveEntry:
+        """Return the latest entry at or before *timestamp* (default: the last).
+
+        Raises:
+            LookupError: If the archive is empty or every snapshot is newer
+                than *timestamp*.
+        """
+        if not self.entries:
+            raise LookupError("The archive is empty")
+        if timestamp is None:
+            return self.entries[-1]
+        pos = bisect.bisect_right([e.timestamp for e in self.entries], timestamp)
+        if pos == 0:
+            raise LookupError("No snapshot at or before the requested time")
+        return self.entries[pos - 1]
+
+    def get(self, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Reconstruct the snapshot in effect at *timestamp* (default: latest).
+
+        Raises:
+            LookupError: As for :meth:`find`.
+        """
+        return self.reconstruct(self.find(timestamp).seq)
+
+    def reconstruct(self, seq: int) -> Dict[str, Any]:
+        """Reconstruct snapshot number *seq* from its keyframe and deltas."""
+        start = seq
+        while not self.entries[start].keyframe:
+            start -= 1
+        data = self._read(self.entries[start])
+        for entry in self.entries[start + 1 : seq + 1]:
+            data = apply_delta(data, self._read(entry))
+        logging.debug("Reconstructed snapshot %d from %d file(s)", seq, seq - start + 1)
+        return data
+
+    def add(
+        self, data: Dict[str, Any], timestamp: Optional[float] = None
+    ) -> ArchiveEntry:
+        """Append snapshot *data* to the archive.
+
+        Args:
+            data: A v1 snapshot dictionary.
+            timestamp: The snapshot time as a Unix timestamp.  Defaults to the
+                snapshot's ``generated_at`` field.
+
+        Raises:
+            ValueError: If no timestamp is available, or the snapshot is older
+                than the last one in the archive.
+        """
+        if timestamp is None:
+            timestamp = _snapshot_timestamp(data)
+            if timestamp is None:
+                raise ValueError("Snapshot has no usable 'generated_at' field")
+        if self.entries and timestamp < self.entries[-1].timestamp:
+            raise ValueError("Snapshots must be added in time order")
+
+        os.makedirs(self.path, exist_ok=True)
+        seq = len(self.entries)
+        keyframe = seq % self.keyframe_interval == 0
+        if keyframe:
+            name = f"{seq:08d}.json.gz"
+            # Store the keyframe as it will be reconstructed.
+            record = {k: v for k, v in data.items() if k != "zone_hashes"}
+            record["nodes"] = list(_keyed_nodes(data.get("nodes", [])).values())
+        else:
+            if self._head is None:
+                self._head = self.reconstruct(seq - 1)
+            name = f"{seq:08d}.delta.json.gz"
+            record = compute_delta(self._head, data)
+        self._write(name, record)
+
+        entry = ArchiveEntry(seq, timestamp, name, keyframe)
+        self.entries.append(entry)
+        # The index is written last, so an interrupted add leaves at most an
+        # unreferenced file behind.
+        self._write_index()
+        self._head = data
+        return entry
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+
+def _parse_time(text: str) -> float:
+    """Parse an ISO-8601 time or a Unix timestamp."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    when = datetime.fromisoformat(text)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _cmd_add(args) -> None:
+    archive = SnapshotArchive(args.archive, keyframe_interval=args.keyframe_interval)
+    for path in args.snapshots:
+        with phase("load"):
+            data = load_data(path)
+        timestamp = _snapshot_timestamp(data)
+        if timestamp is None:
+            timestamp = os.path.getmtime(path)
+        with phase("write"):
+            entry = archive.add(data, timestamp)
+        logging.info(
+            "Added %s as %s %d",
+            path,
+            "keyframe" if entry.keyframe else "delta",
+            entry.seq,
+        )
+
+
+def _cmd_get(args) -> None:
+    archive = SnapshotArchive(args.archive)
+    with phase("load"):
+        data = archive.get(_parse_time(args.at) if args.at else None)
+    with phase("write"):
+        json.dump(data, args.output, indent=2)
+        args.output.write("\n")
+
+
+def _cmd_list(args) -> None:
+    archive = SnapshotArchive(args.archive)
+    for entry in archive.entries:
+        size = os.path.getsize(os.path.join(archive.path, entry.file))
+        args.output.write(
+            f"{entry.seq}\t{_isoformat(entry.timestamp)}\t"
+            f"{'keyframe' if entry.keyframe else 'delta'}\t{size}\n"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``archive`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk archive",
+        description="Store GlobalTalk snapshots as compact keyframes and deltas",
+    )
+    subparsers = parser.add_subparsers(
+        dest="action",
+        metavar="action",
+        required=True,
+    )
+
+    add_parser = subparsers.add_parser("add", help="Append snapshots to an archive")
+    add_parser.add_argument("archive", help="Archive directory")
+    add_parser.add_argument(
+        "snapshots",
+        nargs="+",
+        metavar="snapshot",
+        help="GlobalTalk JSON snapshots, oldest first",
+    )
+    add_parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        default=DEFAULT_KEYFRAME_INTERVAL,
+        metavar="N",
+        help=(
+            "Store a full keyframe every N snapshots when creating the archive "
+            f"(default: {DEFAULT_KEYFRAME_INTERVAL})"
+        ),
+    )
+
+    get_parser = subparsers.add_parser(
+        "get", help="Reconstruct the snapshot in effect at a point in time"
+    )
+    get_parser.add_argument("archive", help="Archive directory")
+    get_parser.add_argument(
+        "--at",
+        default=None,
+        metavar="TIME",
+        help="ISO-8601 time or Unix timestamp (default: the latest snapshot)",
+    )
+
+    list_parser = subparsers.add_parser(
+        "list", help="List the snapshots in an archive, with their file sizes"
+    )
+    list_parser.add_argument("archive", help="Archive directory")
+
+    for sub in (get_parser, list_parser):
+        sub.add_argument(
+            "--output",
+            type=argparse.FileType("w"),
+            default=sys.stdout,
+            help="File to write output to (default: stdout)",
+        )
+    for sub in (add_parser, get_parser, list_parser):
+        sub.add_argument("--debug", action="store_true", help="Enable debug logging")
+        sub.add_argument("--quiet", action="store_true", help="Suppress info logging")
+
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    action = {"add": _cmd_add, "get": _cmd_get, "list": _cmd_list}[args.action]
+    try:
+        action(args)
+    except FileNotFoundError as exc:
+        logging.error("File not found: %s", exc.filename)
+        sys.exit(1)
+    except (ValueError, LookupError) as exc:
+        logging.error("%s", exc)
+        sys.exit(1)
+
+    output = getattr(args, "output", sys.stdout)
+    if output is not sys.stdout:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
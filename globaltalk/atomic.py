@@ -0,0 +1,51 @@
+"""
+GlobalTalk Atomic Writes
+
+Writes files so that readers never see a partial one.
+
+The Prometheus textfile collector, jrouter, ``--watch`` loops and other
+processes read the files this toolkit writes while it may be rewriting them.
+Every output is therefore written to a sibling ``.tmp`` file and moved onto
+the target with ``os.replace()``, which is atomic on POSIX when both paths
+are on the same filesystem (always true for a sibling).  If writing fails
+the temporary file is removed and the target is left untouched.
+"""
+
+import contextlib
+import os
+from typing import IO, Any, Iterator, Union
+
+
+@contextlib.contextmanager
+def atomic_writer(path: str, binary: bool = False) -> Iterator[IO[Any]]:
+    """Open a sibling ``.tmp`` file for writing and move it onto *path* on success.
+
+    If the block raises, the temporary file is removed and *path* is left
+    untouched.
+
+    Args:
+        path: The file to replace.
+        binary: Open the temporary file in binary mode rather than as UTF-8
+            text.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        if binary:
+            fh = open(tmp_path, "wb")
+        else:
+            fh = open(tmp_path, "w", encoding="utf-8")
+        with fh:
+            yield fh
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path: str, content: Union[str, bytes]) -> None:
+    """Replace *path* with *content*, text or bytes, using :func:`atomic_writer`."""
+    with atomic_writer(path, binary=isinstance(content, bytes)) as fh:
+        fh.write(content)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Backfill
+
+Regenerates historical metrics from an archive of GlobalTalk JSON snapshots.
+
+Each snapshot is loaded and aggregated with the same code as
+``globaltalk metrics``, but the files are fanned out over a process pool so
+that every core is busy.  The per-snapshot results are then merged, in
+``generated_at`` order, into a single time series written as:
+
+csv
+    One row per sample: ``timestamp,metric,labels,value``.
+
+json
+    A list with one object per snapshot, mapping each series
+    (``name{labels}``) to its value.
+
+openmetrics
+    A timestamped OpenMetrics exposition suitable for
+    ``promtool tsdb create-blocks-from openmetrics``.
+
+The ``snapshot_age_seconds`` gauge is left out, since it describes the age of
+a snapshot relative to the time the metrics were generated.
+"""
+
+import concurrent.futures
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import IO, Dict, List, NamedTuple, Optional, Tuple
+
+from globaltalk.exposition import MetricFamily, render
+from globaltalk.metrics import (
+    ZoneTypeLimits,
+    _snapshot_timestamp,
+    collect_metrics,
+    load_data,
+)
+from globaltalk.profiling import phase
+
+OUTPUT_FORMATS = ("csv", "json", "openmetrics")
+
+
+class SnapshotMetrics(NamedTuple):
+    """Aggregated metrics for one archived snapshot.
+
+    Attributes:
+        path: The snapshot file.
+        timestamp: The snapshot's ``generated_at`` time as a Unix timestamp,
+            or the file's modification time if the field is missing.
+        families: The metric families, with every sample stamped with
+            *timestamp*.
+    """
+
+    path: str
+    timestamp: float
+    families: List[MetricFamily]
+
+
+def find_snapshots(paths: List[str]) -> List[str]:
+    """Expand *paths* into a sorted list of snapshot files.
+
+    Directories are replaced by the ``*.json`` files directly inside them.
+    """
+    found: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.endswith(".json")
+            )
+        else:
+            found.append(path)
+    return sorted(found)
+
+
+def process_snapshot(
+    path: str,
+    prefix: str = "globaltalk",
+    zone_types: Optional[ZoneTypeLimits] = None,
+) -> Tuple[Optional[SnapshotMetrics], Optional[str]]:
+    """Load and aggregate a single snapshot.
+
+    Runs in a worker process, so errors are returned rather than raised.
+
+    Returns:
+        A ``(metrics, error)`` tuple; exactly one of the two is ``None``.
+    """
+    try:
+        data = load_data(path)
+        timestamp = _snapshot_timestamp(data)
+        if timestamp is None:
+            timestamp = os.path.getmtime(path)
+        collected = collect_metrics(data, prefix=prefix, zone_types=zone_types)
+    except (OSError, ValueError) as exc:
+        return None, f"{path}: {exc}"
+    except (AttributeError, KeyError, TypeError) as exc:
+        # Valid JSON with the top-level fields, but malformed inside (a node
+        # that is not an object, a ``zones`` that is not a list, ...).
+        return None, f"{path}: malformed snapshot: {exc!r}"
+
+    age_family = f"{prefix}_snapshot_age_seconds"
+    families = []
+    for family in collected:
+        if family.name == age_family:
+            continue
+        family.samples = [
+            (labels, value, timestamp) for labels, value, _ in family.samples
+        ]
+        families.append(family)
+    return SnapshotMetrics(path, timestamp, families), None
+
+
+def _process_one(args: Tuple[str, str, Optional[ZoneTypeLimits]]):
+    return process_snapshot(*args)
+
+
+def backfill(
+    paths: List[str],
+    workers: Optional[int] = None,
+    prefix: str = "globaltalk",
+    zone_types: Optional[ZoneTypeLimits] = None,
+) -> List[SnapshotMetrics]:
+    """Aggregate every snapshot in *paths*, in parallel.
+
+    Args:
+        paths: Snapshot files to process.
+        workers: Number of worker processes.  Defaults to the number of CPUs;
+            ``1`` processes the files in the current process.
+        prefix: Metric name prefix.
+        zone_types: When given, also compute the ``zone_type_devices``
+            breakdown.
+
+    Returns:
+        The per-snapshot results, sorted by timestamp.  Files that cannot be
+        loaded are logged and skipped.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = [(path, prefix, zone_types) for path in paths]
+
+    if workers == 1 or len(jobs) <= 1:
+        results = _collect(map(_process_one, jobs))
+    else:
+        # Hand out files in chunks to keep inter-process overhead low, while
+        # leaving enough chunks to balance the load across workers.
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            results = _collect(executor.map(_process_one, jobs, chunksize=chunksize))
+
+    results.sort(key=lambda result: (result.timestamp, result.path))
+    logging.info("Processed %d of %d snapshot(s)", len(results), len(paths))
+    return results
+
+
+def _collect(outcomes) -> List[SnapshotMetrics]:
+    results = []
+    for metrics, error in outcomes:
+        if error is not None:
+            logging.warning("Skipping %s", error)
+        else:
+            results.append(metrics)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Output writers
+# ---------------------------------------------------------------------------
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def write_csv(results: List[SnapshotMetrics], output: IO[str]) -> None:
+    """Write *results* as ``timestamp,metric,labels,value`` rows.
+
+    ``labels`` holds the Prometheus label set without braces, e.g.
+    ``zone="Doofnet"``, and is empty for unlabelled metrics.
+    """
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["timestamp", "metric", "labels", "value"])
+    for result in results:
+        when = _isoformat(result.timestamp)
+        for family in result.families:
+            for labels, value, _ in family.samples:
+                writer.writerow([when, family.name, labels[1:-1], value])
+
+
+def write_json(results: List[SnapshotMetrics], output: IO[str]) -> None:
+    """Write *results* as a JSON list with one object per snapshot."""
+    records = []
+    for result in results:
+        series: Dict[str, float] = {}
+        for family in result.families:
+            for labels, value, _ in family.samples:
+                series[family.name + labels] = value
+        records.append(
+            {
+                "timestamp": _isoformat(result.timestamp),
+                "file": result.path,
+                "series": series,
+            }
+        )
+    json.dump(records, output, indent=2)
+    output.write("\n")
+
+
+def write_openmetrics(results: List[SnapshotMetrics], output: IO[str]) -> None:
+    """Write *results* as one timestamped OpenMetrics exposition.
+
+    OpenMetrics requires the samples of a family, and of each series within
+    it, to be contiguous and in timestamp order, so the per-snapshot
+    families are regrouped by name and then by label set.
+    """
+    merged: Dict[str, MetricFamily] = {}
+    for result in results:
+        for family in result.families:
+            target = merged.get(family.name)
+            if target is None:
+                target = MetricFamily(family.name, family.metric_type, family.help_text)
+                merged[family.name] = target
+            target.samples.extend(family.samples)
+    for family in merged.values():
+        # A stable sort keeps each series in timestamp order.
+        family.samples.sort(key=lambda sample: sample[0])
+    output.write(render(merged.values(), openmetrics=True))
+
+
+_WRITERS = {
+    "csv": write_csv,
+    "json": write_json,
+    "openmetrics": write_openmetrics,
+}
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``backfill`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk backfill",
+        description=(
+            "Regenerate historical metrics from archived GlobalTalk snapshots "
+            "in parallel"
+        ),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        metavar="input",
+        help="Snapshot files, or directories of *.json snapshots",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="File to write output to (default: stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="Output format: csv, json or openmetrics (default: csv)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--prefix",
+        default="globaltalk",
+        help="Metric name prefix (default: globaltalk)",
+    )
+    parser.add_argument(
+        "--zone-types",
+        action="store_true",
+        help="Include the zone_type_devices{zone,type} breakdown (top 20 zones)",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    if args.workers is not None and args.workers < 1:
+        logging.error("--workers must be at least 1")
+        sys.exit(1)
+
+    paths = find_snapshots(args.inputs)
+    if not paths:
+        logging.error("No snapshot files found")
+        sys.exit(1)
+
+    with phase("aggregate"):
+        results = backfill(
+            paths,
+            workers=args.workers,
+            prefix=args.prefix,
+            zone_types=ZoneTypeLimits() if args.zone_types else None,
+        )
+    if not results:
+        logging.error("None of the %d snapshot(s) could be processed", len(paths))
+        sys.exit(1)
+
+    with phase("write"):
+        _WRITERS[args.format](results, args.output)
+
+    if args.output is not sys.stdout:
+        args.output.close()
+
+
+if __name__ == "__main__":
+    main()
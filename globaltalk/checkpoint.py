@@ -0,0 +1,187 @@
+"""
+GlobalTalk Checkpoint
+
+A crash-safe journal of completed zone lookups, so that an interrupted
+``globaltalk scrape`` can resume without redoing finished work.
+
+The journal is an NDJSON file with one record per completed zone::
+
+    {"zone": "Doofnet", "completed_at": 1736942400.0, "types": null,
+     "nodes": [...]}
+
+``types`` lists the NBP types the zone was looked up with (``null`` for
+every type), so a resumed scrape only reuses zones scraped the same way.
+Each record is appended, flushed and ``fsync``-ed as soon as the zone's
+lookup finishes.  When resuming, records younger than the freshness window
+are reused and their zones are not scanned again; a record torn by a crash
+mid-write is ignored.  Once the final snapshot has been written the journal
+is removed.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+# Default freshness window for resumed zones, in seconds.
+DEFAULT_MAX_AGE = 3600.0
+
+
+def read_journal(
+    path: str,
+    max_age: Optional[float] = DEFAULT_MAX_AGE,
+    now: Optional[float] = None,
+    types: Optional[List[str]] = None,
+) -> Dict[str, List[Dict[str, str]]]:
+    """Return the zones recorded in the journal at *path*, with their nodes.
+
+    Args:
+        path: Journal file.  A missing file is treated as empty.
+        max_age: Ignore records completed more than this many seconds ago.
+            ``None`` accepts records of any age.
+        now: The current Unix time (default: ``time.time()``).
+        types: The sorted NBP types of the scrape being resumed, or ``None``
+            for an unfiltered scrape.  Records made with a different set of
+            types are ignored.
+
+    Returns:
+        A mapping of zone name to node list.  If a zone was recorded more
+        than once, the latest record wins.
+    """
+    now = time.time() if now is None else now
+    completed: Dict[str, List[Dict[str, str]]] = {}
+    stale = 0
+    mismatched = 0
+
+    try:
+        fh = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return completed
+
+    with fh:
+        for line_num, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                zone = record["zone"]
+                completed_at = float(record["completed_at"])
+                nodes = record["nodes"]
+            except (ValueError, KeyError, TypeError):
+                # Most likely the tail of a write interrupted by a crash.
+                logging.warning(
+                    "Ignoring unreadable checkpoint record on line %d of %s",
+                    line_num,
+                    path,
+                )
+                continue
+            if max_age is not None and now - completed_at > max_age:
+                stale += 1
+                continue
+            if record.get("types") != types:
+                mismatched += 1
+                continue
+            completed[zone] = nodes
+
+    if stale:
+        logging.info("Ignoring %d stale checkpoint record(s)", stale)
+    if mismatched:
+        logging.info(
+            "Ignoring %d checkpoint record(s) scraped with different types",
+            mismatched,
+        )
+    return completed
+
+
+def _has_torn_tail(path: str) -> bool:
+    """Return ``True`` if *path* is non-empty and does not end in a newline."""
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            if fh.tell() == 0:
+                return False
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+class ScrapeJournal:
+    """Append-only checkpoint journal for a scrape in progress.
+
+    Args:
+        path: Journal file.
+        resume: When ``True`` keep the existing journal and expose its fresh
+            records as :attr:`completed`; otherwise start a new journal.
+        max_age: Freshness window for resumed records, in seconds.
+        types: The NBP types the scrape is restricted to, as returned by
+            :func:`globaltalk.scrape.normalise_types`; ``None`` for every
+            type.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        resume: bool = False,
+        max_age: Optional[float] = DEFAULT_MAX_AGE,
+        types: Optional[List[str]] = None,
+    ) -> None:
+        self.path = path
+        self.types = types
+        self.completed: Dict[str, List[Dict[str, str]]] = {}
+
+        if resume:
+            self.completed = read_journal(path, max_age, types=types)
+            if self.completed:
+                logging.info(
+                    "Resuming: %d zone(s) already checkpointed in %s",
+                    len(self.completed),
+                    path,
+                )
+            torn = _has_torn_tail(path)
+            self._fh = open(path, "a", encoding="utf-8")
+            # Start on a fresh line if the last record was torn mid-write.
+            if torn:
+                self._fh.write("\n")
+        else:
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                logging.warning(
+                    "Starting a new checkpoint journal; discarding the existing "
+                    "records in %s (resume to reuse them)",
+                    path,
+                )
+            self._fh = open(path, "w", encoding="utf-8")
+
+    def __enter__(self) -> "ScrapeJournal":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def record(self, zone: str, nodes: List[Dict[str, str]]) -> None:
+        """Durably append the results for *zone* to the journal."""
+        line = json.dumps(
+            {
+                "zone": zone,
+                "completed_at": time.time(),
+                "types": self.types,
+                "nodes": nodes,
+            }
+        )
+        self._fh.write(line + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        """Close the journal, leaving it on disk for a later resume."""
+        if not self._fh.closed:
+            self._fh.close()
+
+    def remove(self) -> None:
+        """Close and delete the journal once its results are safely written."""
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,259 @@
+"""
+GlobalTalk Churn
+
+Node churn between successive snapshots, without keeping the previous one.
+
+Comparing two snapshots node by node needs both in memory.  Instead, each
+run of ``globaltalk metrics --churn-state FILE`` reduces its snapshot to a
+:class:`Fingerprint` and saves it in a small binary sidecar:
+
+- the sorted, de-duplicated 64-bit :func:`~globaltalk.scrape.node_digest` of
+  every node (eight bytes per node), and
+- the first 64 bits of each zone's :func:`~globaltalk.snapshot.zone_hash`,
+  taken from the snapshot's stored ``zone_hashes`` when ``scrape
+  --canonical`` wrote them.
+
+The next run merges its own sorted digests with the saved ones in a single
+linear pass to count added and removed nodes, and compares the zone hashes
+to count changed zones.
+
+Sidecar layout (all integers little-endian)::
+
+    header   4s magic "GTFP", H version, 2 pad bytes, Q nodes, Q zones
+    digests  Q × nodes, ascending
+    zones    (Q hash, H name length, UTF-8 name) × zones
+"""
+
+import logging
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from globaltalk.atomic import write_atomic
+from globaltalk.scrape import node_digest
+from globaltalk.snapshot import UNKNOWN, record_digest, zone_hash_of_digests
+
+MAGIC = b"GTFP"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHxxQQ")
+_ZONE = struct.Struct("<QH")
+
+
+class Churn(NamedTuple):
+    """Differences between two fingerprints.
+
+    Attributes:
+        nodes_added: Node keys present only in the newer snapshot.
+        nodes_removed: Node keys present only in the older snapshot.
+        zones_changed: Zones added, removed, or whose set of nodes differs.
+    """
+
+    nodes_added: int
+    nodes_removed: int
+    zones_changed: int
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array("Q", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le_bytes(data: bytes) -> array:
+    values = array("Q")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _sorted_unique(values: Iterable[int]) -> array:
+    return array("Q", sorted(set(values)))
+
+
+def _zone_value(zone_hash: str) -> int:
+    """Return the first 64 bits of a hex :func:`~globaltalk.snapshot.zone_hash`."""
+    return int(zone_hash[:16], 16)
+
+
+class Fingerprint:
+    """The node digests and per-zone hashes of one snapshot.
+
+    Attributes:
+        digests: Every distinct node digest, ascending, as ``array('Q')``.
+        zone_hashes: ``{zone: hash}`` for every zone with at least one node.
+    """
+
+    def __init__(self, digests: array, zone_hashes: Dict[str, int]) -> None:
+        self.digests = digests
+        self.zone_hashes = zone_hashes
+
+    @classmethod
+    def from_nodes(
+        cls,
+        nodes: Iterable[Dict[str, str]],
+        zone_hashes: Optional[Dict[str, str]] = None,
+    ) -> "Fingerprint":
+        """Return the fingerprint of *nodes*; see :meth:`FingerprintBuilder.build`."""
+        builder = FingerprintBuilder()
+        builder.update(nodes)
+        return builder.build(zone_hashes)
+
+    @classmethod
+    def load(cls, path: str) -> "Fingerprint":
+        """Read a fingerprint sidecar written by :meth:`save`.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is not a valid sidecar.
+        """
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if len(data) < _HEADER.size:
+            raise ValueError(f"{path}: truncated churn state")
+        magic, version, node_count, zone_count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} churn state file")
+
+        offset = _HEADER.size
+        end = offset + node_count * 8
+        if end > len(data):
+            raise ValueError(f"{path}: truncated churn state")
+        digests = _from_le_bytes(data[offset:end])
+
+        zone_hashes = {}
+        offset = end
+        try:
+            for _ in range(zone_count):
+                value, length = _ZONE.unpack_from(data, offset)
+                offset += _ZONE.size
+                name = data[offset : offset + length]
+                if len(name) != length:
+                    raise ValueError(f"{path}: truncated churn state")
+                zone_hashes[name.decode("utf-8")] = value
+                offset += length
+        except (struct.error, UnicodeDecodeError) as exc:
+            raise ValueError(f"{path}: corrupt churn state: {exc}") from exc
+        return cls(digests, zone_hashes)
+
+    def save(self, path: str) -> None:
+        """Write the fingerprint to *path* atomically."""
+        parts = [
+            _HEADER.pack(MAGIC, VERSION, len(self.digests), len(self.zone_hashes)),
+            _to_le_bytes(self.digests),
+        ]
+        for zone, value in sorted(self.zone_hashes.items()):
+            name = zone.encode("utf-8")
+            parts.append(_ZONE.pack(value, len(name)))
+            parts.append(name)
+
+        write_atomic(path, b"".join(parts))
+
+
+class FingerprintBuilder:
+    """Accumulates a :class:`Fingerprint` one node at a time.
+
+    Only two eight-byte digests of each node are kept, its
+    :func:`~globaltalk.scrape.node_digest` and, grouped by zone, its
+    :func:`~globaltalk.snapshot.record_digest`, so the builder can sit
+    alongside a streaming reader.
+    """
+
+    def __init__(self) -> None:
+        self._digests = array("Q")
+        self._records: Dict[str, array] = {}
+
+    def add(self, node: Dict[str, str]) -> None:
+        """Record one node."""
+        zone = node.get("zone", UNKNOWN)
+        records = self._records.get(zone)
+        if records is None:
+            records = self._records[zone] = array("Q")
+        records.append(record_digest(node))
+        self._digests.append(node_digest(node))
+
+    def update(self, nodes: Iterable[Dict[str, str]]) -> None:
+        """Record every node in *nodes*."""
+        for node in nodes:
+            self.add(node)
+
+    def build(self, zone_hashes: Optional[Dict[str, str]] = None) -> Fingerprint:
+        """Return the fingerprint of the nodes recorded so far.
+
+        Args:
+            zone_hashes: The snapshot's stored ``zone_hashes``, if any.  A
+                zone's stored hash is used in place of the one computed from
+                its nodes; both are the same
+                :func:`~globaltalk.snapshot.zone_hash`.
+        """
+        stored = zone_hashes or {}
+        values = {}
+        for zone, records in self._records.items():
+            try:
+                values[zone] = _zone_value(stored[zone])
+            except (KeyError, TypeError, ValueError):
+                values[zone] = _zone_value(zone_hash_of_digests(records))
+        return Fingerprint(_sorted_unique(self._digests), values)
+
+
+def merge_counts(old: array, new: array) -> Tuple[int, int]:
+    """Return ``(added, removed)`` between two ascending digest arrays.
+
+    The arrays are merged in a single linear pass.
+    """
+    i = j = added = removed = 0
+    while i < len(old) and j < len(new):
+        a, b = old[i], new[j]
+        if a == b:
+            i += 1
+            j += 1
+        elif a < b:
+            removed += 1
+            i += 1
+        else:
+            added += 1
+            j += 1
+    return added + len(new) - j, removed + len(old) - i
+
+
+def compute_churn(old: Fingerprint, new: Fingerprint) -> Churn:
+    """Compare two fingerprints."""
+    added, removed = merge_counts(old.digests, new.digests)
+    zones = old.zone_hashes.keys() | new.zone_hashes.keys()
+    changed = sum(
+        1 for zone in zones if old.zone_hashes.get(zone) != new.zone_hashes.get(zone)
+    )
+    return Churn(added, removed, changed)
+
+
+def compare_state(path: str, fingerprint: Fingerprint) -> Optional[Churn]:
+    """Compare *fingerprint* with the one saved at *path*.
+
+    The state file is left alone; call :func:`save_state` once the churn has
+    been reported, so a run that fails to deliver its metrics is measured
+    against the same state next time.  Problems reading the state file are
+    logged rather than raised, so a broken sidecar never stops the metrics
+    themselves.
+
+    Returns:
+        The churn since the saved fingerprint, or ``None`` if there was no
+        usable previous state (the first run, or an unreadable file).
+    """
+    try:
+        return compute_churn(Fingerprint.load(path), fingerprint)
+    except FileNotFoundError:
+        logging.info("No previous churn state at %s; starting a new one", path)
+    except (OSError, ValueError) as exc:
+        logging.warning("Ignoring unreadable churn state: %s", exc)
+    return None
+
+
+def save_state(path: str, fingerprint: Fingerprint) -> None:
+    """Replace the state at *path* with *fingerprint*, logging any failure."""
+    try:
+        fingerprint.save(path)
+    except OSError as exc:
+        logging.error("Failed to write churn state %s: %s", path, exc)
@@ -0,0 +1,119 @@
+"""
+GlobalTalk Exposition
+
+A small, dependency-free renderer for the Prometheus text exposition format
+and OpenMetrics.
+
+Metrics are collected into :class:`MetricFamily` objects and rendered in one
+go by :func:`render`, which assembles the whole exposition in a single buffer
+so that callers can write it with one ``write()`` call.  Label sets are
+escaped once and cached, so large per-zone label sets that repeat from run to
+run (or across families) are only escaped the first time they are seen.
+"""
+
+import functools
+import math
+from typing import Iterable, List, Optional, Tuple
+
+CONTENT_TYPE_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+    """Escape special characters in a Prometheus label value."""
+    value = value.replace("\\", "\\\\")
+    value = value.replace("\n", "\\n")
+    value = value.replace('"', '\\"')
+    return value
+
+
+def _escape_help(text: str) -> str:
+    """Escape backslashes and newlines in a HELP docstring."""
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+@functools.lru_cache(maxsize=65536)
+def _label_set(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Return the rendered ``{name="value",...}`` string for *labels*."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value as the exposition formats expect."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricFamily:
+    """A named metric with HELP/TYPE metadata and a list of samples.
+
+    Samples are stored with their label set already rendered, so adding the
+    same label set to many families (or across runs in a long-lived process)
+    only escapes it once.
+    """
+
+    __slots__ = ("name", "metric_type", "help_text", "samples")
+
+    def __init__(self, name: str, metric_type: str, help_text: str) -> None:
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: List[Tuple[str, float, Optional[float]]] = []
+
+    def add(
+        self,
+        value: float,
+        timestamp: Optional[float] = None,
+        **labels: str,
+    ) -> None:
+        """Append a sample.
+
+        Args:
+            value: The sample value.
+            timestamp: Optional Unix timestamp in seconds.
+            **labels: Label names and (unescaped) values.
+        """
+        self.samples.append((_label_set(tuple(labels.items())), value, timestamp))
+
+    def __repr__(self) -> str:
+        return f"MetricFamily({self.name!r}, {len(self.samples)} samples)"
+
+
+def render(families: Iterable[MetricFamily], openmetrics: bool = False) -> str:
+    """Render *families* as a complete exposition string.
+
+    Args:
+        families: The metric families to render, in output order.
+        openmetrics: When ``True`` produce OpenMetrics (timestamps in
+            seconds, terminated by ``# EOF``); otherwise the classic
+            Prometheus text format (timestamps in milliseconds).
+    """
+    parts: List[str] = []
+    append = parts.append
+
+    for family in families:
+        name = family.name
+        append(f"# HELP {name} {_escape_help(family.help_text)}\n")
+        append(f"# TYPE {name} {family.metric_type}\n")
+        for labels, value, timestamp in family.samples:
+            if timestamp is None:
+                append(f"{name}{labels} {_format_value(value)}\n")
+            elif openmetrics:
+                append(f"{name}{labels} {_format_value(value)} {timestamp!r}\n")
+            else:
+                append(
+                    f"{name}{labels} {_format_value(value)} {int(timestamp * 1000)}\n"
+                )
+
+    if openmetrics:
+        append("# EOF\n")
+
+    return "".join(parts)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Merge
+
+Combines several GlobalTalk node sources into a single de-duplicated data set.
+
+Each input is either a v1 JSON snapshot (as produced by ``globaltalk scrape``)
+or an NDJSON file holding one node record per line.  NDJSON inputs must be
+sorted on the dedupe key ``(address, socket, type, object)``; they are then
+k-way merged with ``heapq.merge`` so that only one record per input is held in
+memory at a time.  This makes it practical to combine per-vantage or per-hour
+data sets that are much larger than RAM.
+
+v1 snapshots are not sorted by ``globaltalk scrape``, so they are loaded and
+sorted in memory before merging.  Merging a single v1 snapshot with
+``--format ndjson`` is the easiest way to produce a sorted NDJSON shard.
+"""
+
+import heapq
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set
+
+from globaltalk.profiling import phase
+from globaltalk.scrape import node_key
+
+_REQUIRED_FIELDS = ("object", "type", "address", "socket", "zone")
+
+
+def _check_node(node: object, path: str, line_num: int) -> Dict[str, str]:
+    """Return *node* if it is a valid node record, else raise ``ValueError``."""
+    if not isinstance(node, dict) or any(f not in node for f in _REQUIRED_FIELDS):
+        raise ValueError(f"{path}: line {line_num} is not a valid node record")
+    return node
+
+
+def read_nodes(path: str, zones: Optional[Set[str]] = None) -> Iterator[Dict[str, str]]:
+    """Yield node records from *path* in dedupe-key order.
+
+    The input format is detected from the first non-blank line: a line that
+    parses as a node record on its own means NDJSON, anything else is treated
+    as a v1 JSON snapshot.  An empty or blank file is an empty NDJSON stream
+    and yields no nodes.
+
+    Args:
+        path: Path to an NDJSON node stream or a v1 JSON snapshot.
+        zones: If given, zone names listed in a v1 snapshot's ``zones`` field
+            are added to this set.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file is malformed, or an NDJSON input is not sorted
+            on the dedupe key.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        first = ""
+        for first in fh:
+            if first.strip():
+                break
+        else:
+            return
+        try:
+            head = json.loads(first)
+        except json.JSONDecodeError:
+            head = None
+
+        if isinstance(head, dict) and "nodes" not in head:
+            yield from _read_ndjson(fh, path, first)
+            return
+
+    from globaltalk.metrics import load_data
+
+    data = load_data(path)
+    if zones is not None:
+        zones.update(data["zones"])
+    yield from sorted(data["nodes"], key=node_key)
+
+
+def _read_ndjson(fh: IO[str], path: str, first: str) -> Iterator[Dict[str, str]]:
+    """Yield node records from an open NDJSON stream, checking sort order.
+
+    *first* is the line already consumed from *fh* during format detection.
+    """
+    previous = None
+
+    def _lines() -> Iterator[str]:
+        yield first
+        yield from fh
+
+    for line_num, line in enumerate(_lines(), 1):
+        if not line.strip():
+            continue
+        try:
+            node = _check_node(json.loads(line), path, line_num)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{path}: line {line_num}: {exc}") from exc
+
+        key = node_key(node)
+        if previous is not None and key < previous:
+            raise ValueError(
+                f"{path}: line {line_num} is out of order; NDJSON inputs must be "
+                "sorted by (address, socket, type, object)"
+            )
+        previous = key
+        yield node
+
+
+def merge_nodes(
+    sources: Iterable[Iterable[Dict[str, str]]],
+) -> Iterator[Dict[str, str]]:
+    """K-way merge sorted node streams, yielding each dedupe key only once.
+
+    Every source must already be sorted by :func:`globaltalk.scrape.node_key`.
+    When the same key appears in several sources the first record seen wins,
+    matching the behaviour of :func:`globaltalk.scrape.deduplicate_nodes`.
+    """
+    previous = None
+    duplicates = 0
+
+    for node in heapq.merge(*sources, key=node_key):
+        key = node_key(node)
+        if key == previous:
+            duplicates += 1
+            continue
+        previous = key
+        yield node
+
+    if duplicates > 0:
+        logging.info("Removed %d duplicate node(s)", duplicates)
+
+
+def write_ndjson(nodes: Iterable[Dict[str, str]], output: IO[str]) -> int:
+    """Write *nodes* to *output* as NDJSON, returning the number written."""
+    count = 0
+    for node in nodes:
+        output.write(json.dumps(node))
+        output.write("\n")
+        count += 1
+    return count
+
+
+def write_v1(
+    nodes: Iterable[Dict[str, str]],
+    output: IO[str],
+    zones: Optional[Set[str]] = None,
+) -> int:
+    """Write *nodes* to *output* as a v1 JSON snapshot, returning the node count.
+
+    Nodes are streamed straight through to *output*; only the set of zone
+    names is accumulated, so that it can be emitted after the ``nodes`` array.
+
+    Args:
+        nodes: Node records to write.
+        output: A writable text stream.
+        zones: Extra zone names to include in the ``zones`` field, in addition
+            to the zones the nodes were found in.  The set is read only after
+            *nodes* is exhausted, so it may be filled in by :func:`read_nodes`
+            while merging.
+    """
+    seen_zones: Set[str] = set()
+    generated_at = datetime.now(timezone.utc).isoformat()
+
+    output.write("{\n")
+    output.write('  "format": "v1",\n')
+    output.write(f'  "generated_at": {json.dumps(generated_at)},\n')
+    output.write('  "nodes": [')
+
+    count = 0
+    for node in nodes:
+        output.write(",\n    " if count else "\n    ")
+        output.write(json.dumps(node))
+        seen_zones.add(node["zone"])
+        count += 1
+
+    output.write("\n  ],\n" if count else "],\n")
+    seen_zones.update(zones or ())
+    output.write(f'  "zones": {json.dumps(sorted(seen_zones))}\n')
+    output.write("}\n")
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``merge`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk merge",
+        description=(
+            "Merge GlobalTalk snapshots and sorted NDJSON node streams into a "
+            "single de-duplicated data set"
+        ),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        metavar="input",
+        help="v1 JSON snapshots or sorted NDJSON node files to merge",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="File to write merged output to (default: stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["v1", "ndjson"],
+        default="v1",
+        help="Output format (default: v1)",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    zones: Set[str] = set()
+    merged = merge_nodes(read_nodes(path, zones) for path in args.inputs)
+
+    try:
+        with phase("merge"):
+            if args.format == "ndjson":
+                count = write_ndjson(merged, args.output)
+            else:
+                count = write_v1(merged, args.output, zones)
+    except FileNotFoundError as exc:
+        logging.error("File not found: %s", exc.filename)
+        sys.exit(1)
+    except ValueError as exc:
+        logging.error("%s", exc)
+        sys.exit(1)
+
+    logging.info("Merged %d input(s) into %d node(s)", len(args.inputs), count)
+
+    if args.output is not sys.stdout:
+        args.output.close()
+
+
+if __name__ == "__main__":
+    main()
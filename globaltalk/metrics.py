@@ -15,28 +15,232 @@ import logging
 import os
 import re
 import sys
+import threading
 from datetime import datetime, timezone
-from typing import IO, Any, Dict, List, Optional
+from functools import cached_property
+from typing import (
+    IO,
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+from globaltalk.atomic import atomic_writer
+from globaltalk.churn import (
+    Churn,
+    Fingerprint,
+    FingerprintBuilder,
+    compare_state,
+    save_state,
+)
 
-def escape_label_value(value: str) -> str:
-    """Escape special characters in a Prometheus label value."""
-    value = value.replace("\\", "\\\\")
-    value = value.replace("\n", "\\n")
-    value = value.replace('"', '\\"')
-    return value
+# escape_label_value lived here before the renderer moved to exposition.py;
+# it is re-exported so existing imports keep working.
+from globaltalk.exposition import MetricFamily, escape_label_value, render  # noqa: F401
+from globaltalk.profiling import phase
+from globaltalk.snapshot import (
+    UNKNOWN,
+    AddressIndex,
+    Snapshot,
+    as_snapshot,
+    parse_network_range,
+    validate,
+)
+from globaltalk.stream import DEFAULT_CHUNK_SIZE, iter_nodes
+from globaltalk.watch import DEFAULT_POLL_INTERVAL, watch_file
 
 
-def _write_meta(output: IO[str], name: str, metric_type: str, help_text: str) -> None:
-    """Write Prometheus HELP and TYPE comment lines."""
-    output.write(f"# HELP {name} {help_text}\n")
-    output.write(f"# TYPE {name} {metric_type}\n")
+# Label value used for zones that fall outside the top-K of the zone×type
+# breakdown.
+ZONE_TYPE_OTHER = "other"
+
+# Snapshots of at least this many bytes are streamed by ``globaltalk
+# metrics`` rather than parsed whole (see load_metrics_source).
+STREAMING_THRESHOLD = 32 * 1024 * 1024
+
+_JROUTER_PATTERN = re.compile(r"^jrouter\s+(.+)", re.IGNORECASE)
+
+
+class ZoneTypeLimits(NamedTuple):
+    """Cardinality limits for the ``zone_type_devices{zone,type}`` family.
+
+    Attributes:
+        top_k: Number of largest zones (by matching endpoints) that keep their
+            own ``zone`` label; the rest are summed into the
+            :data:`ZONE_TYPE_OTHER` bucket.  ``None`` means no limit.
+        include: If given, only these NBP types are counted.
+        exclude: NBP types that are never counted.
+    """
+
+    top_k: Optional[int] = 20
+    include: Optional[Collection[str]] = None
+    exclude: Optional[Collection[str]] = None
+
+
+class NetworkBreakdown(NamedTuple):
+    """Options for the per-network device families.
+
+    Attributes:
+        per_network: Emit ``network_devices{network}`` for every network.
+        ranges: ``(first, last)`` network number ranges, inclusive, each
+            emitted as ``network_range_devices{range="first-last"}``.
+    """
+
+    per_network: bool = True
+    ranges: Sequence[Tuple[int, int]] = ()
+
+
+class SnapshotCounts:
+    """The per-key node counts that metrics are aggregated from.
+
+    Everything :func:`collect_metrics` reports can be derived from these
+    counters, so they can be built either from a loaded
+    :class:`~globaltalk.snapshot.Snapshot` or in one pass over streamed node
+    records (see :func:`count_file`) without keeping the nodes themselves.
+
+    Attributes:
+        fields: The snapshot's top-level fields other than ``nodes``.
+        total_nodes: Number of node records.
+        zones: Endpoints per zone.
+        types: Endpoints per NBP type.
+        addresses: Endpoints per AppleTalk address.
+        zone_types: Endpoints per ``(zone, type)`` pair.
+        jrouter_versions: jRouter instances per version.
+    """
+
+    def __init__(self, fields: Dict[str, Any]) -> None:
+        self.fields = fields
+        self.total_nodes = 0
+        self.zones: collections.Counter = collections.Counter()
+        self.types: collections.Counter = collections.Counter()
+        self.addresses: collections.Counter = collections.Counter()
+        self.zone_types: collections.Counter = collections.Counter()
+        self.jrouter_versions: collections.Counter = collections.Counter()
+
+    @classmethod
+    def from_nodes(
+        cls, fields: Dict[str, Any], nodes: Iterable[Dict[str, Any]]
+    ) -> "SnapshotCounts":
+        """Count *nodes*, which may be any iterable, in a single pass."""
+        counts = cls(fields)
+        for node in nodes:
+            zone = node.get("zone", UNKNOWN)
+            device_type = node.get("type", UNKNOWN)
+            counts.total_nodes += 1
+            counts.zones[zone] += 1
+            counts.types[device_type] += 1
+            counts.addresses[node.get("address", UNKNOWN)] += 1
+            counts.zone_types[(zone, device_type)] += 1
+            counts._count_jrouter(node)
+        return counts
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> "SnapshotCounts":
+        """Count *snapshot* using its cached ``by_*`` indexes."""
+        counts = cls(snapshot.data)
+        counts.total_nodes = len(snapshot.nodes)
+        counts.zones.update({k: len(v) for k, v in snapshot.by_zone.items()})
+        counts.types.update({k: len(v) for k, v in snapshot.by_type.items()})
+        counts.addresses.update({k: len(v) for k, v in snapshot.by_address.items()})
+        for node in snapshot.nodes:
+            counts.zone_types[
+                (node.get("zone", UNKNOWN), node.get("type", UNKNOWN))
+            ] += 1
+            counts._count_jrouter(node)
+        return counts
+
+    def _count_jrouter(self, node: Dict[str, Any]) -> None:
+        match = _JROUTER_PATTERN.match(node.get("object", ""))
+        if match:
+            self.jrouter_versions[match.group(1).strip()] += 1
+
+    @property
+    def unique_devices(self) -> int:
+        """The number of distinct device addresses."""
+        return len(self.addresses)
+
+    @cached_property
+    def address_index(self) -> AddressIndex:
+        """The distinct addresses as a packed :class:`AddressIndex`."""
+        return AddressIndex(self.addresses)
+
+    @property
+    def multihomed_devices(self) -> int:
+        """The number of addresses with more than one endpoint registered."""
+        return sum(1 for count in self.addresses.values() if count > 1)
+
+
+def count_file(
+    path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    fingerprint: Optional[FingerprintBuilder] = None,
+) -> SnapshotCounts:
+    """Stream the snapshot at *path* into :class:`SnapshotCounts`.
+
+    Node records are decoded and counted one at a time, so memory use grows
+    with the number of distinct zones, types and addresses rather than with
+    the size of the file.  Each node is also added to *fingerprint*, if
+    given.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the JSON is malformed or the structure is invalid.
+    """
+    fields: Dict[str, Any] = {}
+    with open(path, "r", encoding="utf-8") as fh:
+        nodes = iter_nodes(fh, fields, chunk_size)
+        if fingerprint is not None:
+            nodes = _recorded(nodes, fingerprint)
+        return SnapshotCounts.from_nodes(fields, nodes)
+
+
+def _recorded(
+    nodes: Iterable[Dict[str, Any]], fingerprint: FingerprintBuilder
+) -> Iterator[Dict[str, Any]]:
+    for node in nodes:
+        fingerprint.add(node)
+        yield node
+
+
+def load_metrics_source(
+    path: str,
+    threshold: Optional[int] = STREAMING_THRESHOLD,
+    fingerprint: Optional[FingerprintBuilder] = None,
+) -> Union[Snapshot, SnapshotCounts]:
+    """Load *path* for :func:`collect_metrics` in the cheapest suitable way.
+
+    Files of at least *threshold* bytes are streamed with :func:`count_file`;
+    smaller files are parsed whole with ``json.load``, which is faster when
+    the result fits comfortably in memory.  A *threshold* of ``None`` never
+    streams.  Every node is added to *fingerprint*, if given.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the JSON is malformed or the structure is invalid.
+    """
+    if threshold is not None and os.path.getsize(path) >= threshold:
+        logging.debug("Streaming %s", path)
+        return count_file(path, fingerprint=fingerprint)
+    snapshot = Snapshot.load(path)
+    if fingerprint is not None:
+        fingerprint.update(snapshot.nodes)
+    return snapshot
 
 
 def load_data(path: str) -> Dict[str, Any]:
     """Load and validate a GlobalTalk JSON snapshot from *path*.
 
-    Returns the parsed dictionary.
+    Returns the parsed dictionary.  Use
+    :meth:`globaltalk.snapshot.Snapshot.load` to get a :class:`Snapshot` with
+    cached indexes instead.
 
     Raises:
         FileNotFoundError: If the file does not exist.
@@ -48,16 +252,7 @@ def load_data(path: str) -> Dict[str, Any]:
     except json.JSONDecodeError as exc:
         raise ValueError(f"Failed to decode JSON: {exc}") from exc
 
-    if not isinstance(data, dict):
-        raise ValueError("JSON root must be an object")
-
-    if "nodes" not in data or "zones" not in data:
-        raise ValueError("JSON must contain 'nodes' and 'zones' fields")
-
-    if "format" in data and data["format"] != "v1":
-        logging.warning("Unknown format version '%s', expected 'v1'", data["format"])
-
-    return data
+    return validate(data)
 
 
 def _snapshot_age_seconds(data: Dict[str, Any]) -> float | None:
@@ -78,120 +273,228 @@ def _snapshot_age_seconds(data: Dict[str, Any]) -> float | None:
         return None
 
 
-def generate_metrics(
-    data: Dict[str, Any],
-    output: IO[str],
+def _snapshot_timestamp(data: Dict[str, Any]) -> float | None:
+    """Return ``generated_at`` as a Unix timestamp, or ``None`` if the field
+    is absent or unparseable."""
+    raw = data.get("generated_at")
+    if not raw:
+        return None
+    try:
+        generated_at = datetime.fromisoformat(raw)
+    except (ValueError, TypeError):
+        return None
+    if generated_at.tzinfo is None:
+        generated_at = generated_at.replace(tzinfo=timezone.utc)
+    return generated_at.timestamp()
+
+
+def _zone_type_counts(
+    all_pairs: Dict[Tuple[str, str], int], limits: ZoneTypeLimits
+) -> Dict[Tuple[str, str], int]:
+    """Limit per-``(zone, type)`` endpoint counts to the given cardinality.
+
+    Zones outside the top-K are folded into :data:`ZONE_TYPE_OTHER`, so the
+    number of series is bounded by ``(top_k + 1) × types``.
+    """
+    include = set(limits.include) if limits.include is not None else None
+    exclude = set(limits.exclude or ())
+
+    pairs: collections.Counter = collections.Counter()
+    for (zone, device_type), count in all_pairs.items():
+        if device_type in exclude:
+            continue
+        if include is not None and device_type not in include:
+            continue
+        pairs[(zone, device_type)] += count
+
+    if limits.top_k is None:
+        return dict(pairs)
+
+    zone_totals: collections.Counter = collections.Counter()
+    for (zone, _), count in pairs.items():
+        zone_totals[zone] += count
+    # Largest first; ties broken by name so the selection is stable.
+    ranked = sorted(zone_totals.items(), key=lambda item: (-item[1], item[0]))
+    kept = {zone for zone, _ in ranked[: limits.top_k]}
+
+    limited: collections.Counter = collections.Counter()
+    for (zone, device_type), count in pairs.items():
+        limited[(zone if zone in kept else ZONE_TYPE_OTHER, device_type)] += count
+    return dict(limited)
+
+
+def collect_metrics(
+    data: Union[Snapshot, SnapshotCounts, Dict[str, Any]],
     prefix: str = "globaltalk",
-) -> None:
-    """Write Prometheus metrics derived from *data* to *output*.
+    timestamps: bool = False,
+    zone_types: Optional[ZoneTypeLimits] = None,
+    churn: Optional[Churn] = None,
+    networks: Optional[NetworkBreakdown] = None,
+) -> List[MetricFamily]:
+    """Aggregate *data* into a list of metric families, in output order.
 
     Args:
-        data: A validated GlobalTalk snapshot dictionary (as returned by
-            :func:`load_data`).
-        output: A writable text stream.
+        data: A :class:`~globaltalk.snapshot.Snapshot`, a GlobalTalk
+            snapshot dictionary (as returned by :func:`load_data`), or
+            :class:`SnapshotCounts` (as returned by :func:`count_file`).
         prefix: Metric name prefix (default: ``globaltalk``).
+        timestamps: When ``True`` every sample carries the snapshot's
+            ``generated_at`` time as its timestamp (if the field is present).
+        zone_types: When given, also emit the ``zone_type_devices{zone,type}``
+            breakdown, bounded by these limits.
+        churn: When given, also emit the ``nodes_added``, ``nodes_removed``
+            and ``zones_changed`` gauges (see :mod:`globaltalk.churn`).
+        networks: When given, also emit per-network device counts.
     """
-    nodes: List[Dict[str, Any]] = data["nodes"]
-    zones: List[str] = data["zones"]
+    if isinstance(data, SnapshotCounts):
+        counts = data
+    else:
+        counts = SnapshotCounts.from_snapshot(as_snapshot(data))
+    data = counts.fields
+    ts = _snapshot_timestamp(data) if timestamps else None
+    families: List[MetricFamily] = []
+
+    def _family(name: str, help_text: str) -> MetricFamily:
+        family = MetricFamily(f"{prefix}_{name}", "gauge", help_text)
+        families.append(family)
+        return family
 
     # Snapshot age (only present when generated_at is in the data)
     age = _snapshot_age_seconds(data)
     if age is not None:
-        _write_meta(
-            output,
-            f"{prefix}_snapshot_age_seconds",
-            "gauge",
+        _family(
+            "snapshot_age_seconds",
             "Seconds elapsed since the snapshot was generated",
-        )
-        output.write(f"{prefix}_snapshot_age_seconds {age:.3f}\n")
+        ).add(round(age, 3), ts)
 
     # Total zones
-    _write_meta(output, f"{prefix}_zones", "gauge", "Total number of AppleTalk zones")
-    output.write(f"{prefix}_zones {len(zones)}\n")
+    _family("zones", "Total number of AppleTalk zones").add(len(data["zones"]), ts)
 
     # Unique devices (by AppleTalk address)
-    devices = collections.Counter(node.get("address", "Unknown") for node in nodes)
-    _write_meta(
-        output,
-        f"{prefix}_unique_devices",
-        "gauge",
-        "Number of unique devices by address",
+    _family("unique_devices", "Number of unique devices by address").add(
+        counts.unique_devices, ts
     )
-    output.write(f"{prefix}_unique_devices {len(devices)}\n")
 
     # Total nodes / endpoints
-    _write_meta(
-        output,
-        f"{prefix}_total_nodes",
-        "gauge",
-        "Total number of network nodes",
-    )
-    output.write(f"{prefix}_total_nodes {len(nodes)}\n")
+    _family("total_nodes", "Total number of network nodes").add(counts.total_nodes, ts)
 
     # Endpoints per zone
-    zone_counts = collections.Counter(node.get("zone", "Unknown") for node in nodes)
-    _write_meta(
-        output,
-        f"{prefix}_zone_devices",
-        "gauge",
-        "Number of devices per zone",
-    )
-    for zone, count in sorted(zone_counts.items()):
-        output.write(
-            f'{prefix}_zone_devices{{zone="{escape_label_value(zone)}"}} {count}\n'
-        )
+    family = _family("zone_devices", "Number of devices per zone")
+    for zone, count in sorted(counts.zones.items()):
+        family.add(count, ts, zone=zone)
 
     # Device type breakdown
-    type_counts = collections.Counter(node.get("type", "Unknown") for node in nodes)
-    _write_meta(
-        output,
-        f"{prefix}_device_types",
-        "gauge",
-        "Number of devices by type",
-    )
-    for device_type, count in sorted(type_counts.items()):
-        output.write(
-            f'{prefix}_device_types{{type="{escape_label_value(device_type)}"}} {count}\n'
+    family = _family("device_types", "Number of devices by type")
+    for device_type, count in sorted(counts.types.items()):
+        family.add(count, ts, type=device_type)
+
+    # Zone × type breakdown (opt-in, cardinality-limited)
+    if zone_types is not None:
+        family = _family(
+            "zone_type_devices",
+            "Number of devices per zone and type (smaller zones grouped as "
+            f'"{ZONE_TYPE_OTHER}")',
         )
+        for (zone, device_type), count in sorted(
+            _zone_type_counts(counts.zone_types, zone_types).items()
+        ):
+            family.add(count, ts, zone=zone, type=device_type)
+
+    # Devices per AppleTalk network / network range (opt-in)
+    if networks is not None:
+        index = counts.address_index
+        if networks.per_network:
+            family = _family("network_devices", "Number of devices per network")
+            for network, count in index.network_counts().items():
+                family.add(count, ts, network=str(network))
+        if networks.ranges:
+            family = _family(
+                "network_range_devices", "Number of devices per network range"
+            )
+            for first, last in networks.ranges:
+                family.add(index.count_range(first, last), ts, range=f"{first}-{last}")
 
     # Multi-homed devices (more than one endpoint registered for a single address)
-    nodes_per_device = collections.Counter(
-        node.get("address", "Unknown") for node in nodes
-    )
-    multihomed = sum(1 for count in nodes_per_device.values() if count > 1)
-    _write_meta(
-        output,
-        f"{prefix}_multihomed_devices",
-        "gauge",
+    _family(
+        "multihomed_devices",
         "Number of devices with multiple network endpoints",
-    )
-    output.write(f"{prefix}_multihomed_devices {multihomed}\n")
+    ).add(counts.multihomed_devices, ts)
 
     # jRouter version breakdown
-    jrouter_pattern = re.compile(r"^jrouter\s+(.+)", re.IGNORECASE)
-    jrouter_versions: collections.Counter = collections.Counter()
-    for node in nodes:
-        match = jrouter_pattern.match(node.get("object", ""))
-        if match:
-            jrouter_versions[match.group(1).strip()] += 1
-
-    if jrouter_versions:
-        _write_meta(
-            output,
-            f"{prefix}_jrouter_versions",
-            "gauge",
-            "Count of jRouter instances by version",
+    if counts.jrouter_versions:
+        family = _family("jrouter_versions", "Count of jRouter instances by version")
+        for version, count in sorted(counts.jrouter_versions.items()):
+            family.add(count, ts, version=version)
+
+    # Churn since the previous run (opt-in, see globaltalk.churn)
+    if churn is not None:
+        _family(
+            "nodes_added", "Nodes present now but not in the previous snapshot"
+        ).add(churn.nodes_added, ts)
+        _family(
+            "nodes_removed", "Nodes present in the previous snapshot but not now"
+        ).add(churn.nodes_removed, ts)
+        _family(
+            "zones_changed",
+            "Zones added, removed or with different nodes since the previous snapshot",
+        ).add(churn.zones_changed, ts)
+
+    return families
+
+
+def generate_metrics(
+    data: Union[Snapshot, SnapshotCounts, Dict[str, Any]],
+    output: IO[str],
+    prefix: str = "globaltalk",
+    openmetrics: bool = False,
+    timestamps: bool = False,
+    zone_types: Optional[ZoneTypeLimits] = None,
+    churn: Optional[Churn] = None,
+    networks: Optional[NetworkBreakdown] = None,
+) -> None:
+    """Write Prometheus metrics derived from *data* to *output*.
+
+    The exposition is assembled in memory and written with a single
+    ``write()`` call.
+
+    Args:
+        data: As for :func:`collect_metrics`.
+        output: A writable text stream.
+        prefix: Metric name prefix (default: ``globaltalk``).
+        openmetrics: When ``True`` write OpenMetrics instead of the classic
+            Prometheus text format.
+        timestamps: When ``True`` stamp every sample with the snapshot's
+            ``generated_at`` time.  Note that node_exporter's textfile
+            collector rejects timestamped samples.
+        zone_types: When given, also emit the cardinality-limited
+            ``zone_type_devices{zone,type}`` breakdown.
+        churn: When given, also emit the node churn gauges.
+        networks: When given, also emit per-network device counts.
+    """
+    with phase("aggregate"):
+        families = collect_metrics(
+            data,
+            prefix=prefix,
+            timestamps=timestamps,
+            zone_types=zone_types,
+            churn=churn,
+            networks=networks,
         )
-        for version, count in sorted(jrouter_versions.items()):
-            output.write(
-                f'{prefix}_jrouter_versions{{version="{escape_label_value(version)}"}} {count}\n'
-            )
+    with phase("render"):
+        content = render(families, openmetrics=openmetrics)
+    with phase("write"):
+        output.write(content)
 
 
 def _write_metrics_output(
-    data: Dict[str, Any],
+    data: Union[Snapshot, SnapshotCounts, Dict[str, Any]],
     output: IO[str],
     prefix: str = "globaltalk",
+    openmetrics: bool = False,
+    timestamps: bool = False,
+    zone_types: Optional[ZoneTypeLimits] = None,
+    churn: Optional[Churn] = None,
+    networks: Optional[NetworkBreakdown] = None,
 ) -> None:
     """Write metrics to *output*, using an atomic replace when *output* is a
     real file path rather than stdout.
@@ -214,22 +517,172 @@ def _write_metrics_output(
         "<stdin>",
     )
 
+    options = {
+        "prefix": prefix,
+        "openmetrics": openmetrics,
+        "timestamps": timestamps,
+        "zone_types": zone_types,
+        "churn": churn,
+        "networks": networks,
+    }
+
     if is_real_file:
-        tmp_path = output_path + ".tmp"
+        # On failure the temp file is removed and the error re-raised, so the
+        # caller can handle/log it.
+        with phase("write"), atomic_writer(output_path) as tmp:
+            generate_metrics(data, tmp, **options)
+    else:
+        generate_metrics(data, output, **options)
+
+
+def _push_metrics(
+    data: Union[Snapshot, SnapshotCounts, Dict[str, Any]],
+    args: Any,
+    zone_types: Optional[ZoneTypeLimits],
+    churn: Optional[Churn] = None,
+    networks: Optional[NetworkBreakdown] = None,
+) -> bool:
+    """Deliver metrics to ``--push-url`` as configured on the command line.
+
+    Returns:
+        ``True`` on success, ``False`` if the push failed (the error is
+        logged).  Exits the process with status 1 if a ``--push-label`` is
+        malformed.
+    """
+    from globaltalk.push import (
+        MetricsPusher,
+        PushError,
+        push_batches,
+        push_to_gateway,
+    )
+
+    grouping = {}
+    for item in args.push_label:
+        name, sep, value = item.partition("=")
+        if not sep or not name:
+            logging.error("Invalid --push-label %r, expected NAME=VALUE", item)
+            sys.exit(1)
+        grouping[name] = value
+
+    with phase("aggregate"):
+        families = collect_metrics(
+            data,
+            prefix=args.prefix,
+            timestamps=args.timestamps,
+            zone_types=zone_types,
+            churn=churn,
+            networks=networks,
+        )
+
+    try:
+        with (
+            phase("push"),
+            MetricsPusher(
+                args.push_url,
+                timeout=args.push_timeout,
+                retries=args.push_retries,
+                compress=not args.push_no_gzip,
+            ) as pusher,
+        ):
+            if args.push_mode == "pushgateway":
+                if args.timestamps:
+                    logging.warning("The Pushgateway rejects timestamps; omitting them")
+                push_to_gateway(pusher, families, job=args.push_job, grouping=grouping)
+            else:
+                push_batches(pusher, families, batch_size=args.push_batch_size)
+    except (PushError, ValueError) as exc:
+        logging.error("%s", exc)
+        return False
+    return True
+
+
+def _compare_churn(
+    args: Any,
+    fingerprint: Optional[FingerprintBuilder],
+    data: Union[Snapshot, SnapshotCounts],
+) -> Tuple[Optional[Churn], Optional[Fingerprint]]:
+    """Return the churn since ``--churn-state`` and the fingerprint to save.
+
+    Zone hashes stored in *data* by ``scrape --canonical`` are used rather
+    than recomputed.
+
+    The new fingerprint is only saved, by :func:`_save_churn`, once the
+    metrics have been pushed or written, so a failed run does not advance
+    the state and the next run still reports the churn it missed.
+    """
+    if fingerprint is None:
+        return None, None
+    fields = data.fields if isinstance(data, SnapshotCounts) else data.data
+    with phase("churn"):
+        built = fingerprint.build(fields.get("zone_hashes"))
+        return compare_state(args.churn_state, built), built
+
+
+def _save_churn(args: Any, fingerprint: Optional[Fingerprint]) -> None:
+    """Store *fingerprint* as the new ``--churn-state``."""
+    if fingerprint is not None:
+        save_state(args.churn_state, fingerprint)
+
+
+def _watch_metrics(
+    args: Any,
+    zone_types: Optional[ZoneTypeLimits],
+    networks: Optional[NetworkBreakdown] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """Regenerate the metrics each time ``args.filename`` changes.
+
+    Every change reloads the snapshot into a fresh :class:`Snapshot` and
+    re-aggregates it; aggregation is a single pass over the nodes, so there
+    is nothing worth carrying between runs beyond the warm interpreter.  A
+    snapshot that is missing or invalid, or a push that fails, is logged and
+    the watch carries on, leaving the previous output in place.
+    """
+    to_file = args.output is not sys.stdout
+    if to_file:
+        args.output.close()
+
+    def _regenerate() -> None:
+        fingerprint = FingerprintBuilder() if args.churn_state else None
         try:
-            with open(tmp_path, "w", encoding="utf-8") as tmp:
-                generate_metrics(data, tmp, prefix=prefix)
-            os.replace(tmp_path, output_path)
-        except Exception:
-            # Clean up the temp file if anything went wrong, then re-raise so
-            # the caller can handle/log the error.
+            with phase("load"):
+                data = load_metrics_source(
+                    args.filename, args.stream_threshold, fingerprint
+                )
+        except FileNotFoundError:
+            logging.error("File not found: %s", args.filename)
+            return
+        except ValueError as exc:
+            logging.error("%s", exc)
+            return
+        churn, built = _compare_churn(args, fingerprint, data)
+
+        pushed = True
+        if args.push_url:
+            pushed = _push_metrics(data, args, zone_types, churn, networks)
+        if to_file:
             try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
-            raise
-    else:
-        generate_metrics(data, output, prefix=prefix)
+                _write_metrics_output(
+                    data,
+                    args.output,
+                    prefix=args.prefix,
+                    openmetrics=args.openmetrics,
+                    timestamps=args.timestamps,
+                    zone_types=zone_types,
+                    churn=churn,
+                    networks=networks,
+                )
+            except OSError as exc:
+                logging.error("Failed to write %s: %s", args.output.name, exc)
+                return
+            logging.info("Wrote metrics to %s", args.output.name)
+        if pushed:
+            _save_churn(args, built)
+
+    try:
+        watch_file(args.filename, _regenerate, args.poll_interval, stop=stop)
+    except KeyboardInterrupt:
+        pass
 
 
 def main(argv: Optional[List[str]] = None) -> None:
@@ -261,6 +714,134 @@ def main(argv: Optional[List[str]] = None) -> None:
         default="globaltalk",
         help="Metric name prefix (default: globaltalk)",
     )
+    parser.add_argument(
+        "--openmetrics",
+        action="store_true",
+        help="Write OpenMetrics instead of the Prometheus text format",
+    )
+    parser.add_argument(
+        "--timestamps",
+        action="store_true",
+        help=(
+            "Stamp every sample with the snapshot's generated_at time "
+            "(not accepted by node_exporter's textfile collector)"
+        ),
+    )
+
+    zone_type_group = parser.add_argument_group(
+        "zone × type breakdown",
+        "Optional zone_type_devices{zone,type} family with bounded cardinality",
+    )
+    zone_type_group.add_argument(
+        "--zone-types",
+        action="store_true",
+        help="Emit the zone_type_devices{zone,type} breakdown",
+    )
+    zone_type_group.add_argument(
+        "--zone-types-top-k",
+        type=int,
+        default=20,
+        metavar="K",
+        help=(
+            "Keep the K largest zones and group the rest as "
+            f'"{ZONE_TYPE_OTHER}" (default: 20)'
+        ),
+    )
+    zone_type_group.add_argument(
+        "--zone-types-include",
+        nargs="+",
+        default=None,
+        metavar="TYPE",
+        help="Only count these NBP types in the breakdown",
+    )
+    zone_type_group.add_argument(
+        "--zone-types-exclude",
+        nargs="+",
+        default=None,
+        metavar="TYPE",
+        help="Never count these NBP types in the breakdown",
+    )
+
+    network_group = parser.add_argument_group(
+        "network breakdown",
+        "Optional device counts per AppleTalk network number",
+    )
+    network_group.add_argument(
+        "--networks",
+        action="store_true",
+        help="Emit network_devices{network} for every network",
+    )
+    network_group.add_argument(
+        "--network-range",
+        action="append",
+        type=parse_network_range,
+        default=None,
+        metavar="FIRST-LAST",
+        help="Emit network_range_devices{range} for this range (repeatable)",
+    )
+
+    push_group = parser.add_argument_group(
+        "push delivery",
+        "Send metrics over HTTP instead of (or as well as) writing --output",
+    )
+    push_group.add_argument(
+        "--push-url",
+        default=None,
+        metavar="URL",
+        help=(
+            "Pushgateway base URL, or the full import URL with --push-mode "
+            "import. Metrics go to stdout only if --output is also given"
+        ),
+    )
+    push_group.add_argument(
+        "--push-mode",
+        choices=["pushgateway", "import"],
+        default="pushgateway",
+        help=(
+            "pushgateway: PUT the whole exposition to /metrics/job/<job>; "
+            "import: POST batches to a text-format import endpoint "
+            "(default: pushgateway)"
+        ),
+    )
+    push_group.add_argument(
+        "--push-job",
+        default="globaltalk",
+        metavar="JOB",
+        help="Pushgateway job name (default: globaltalk)",
+    )
+    push_group.add_argument(
+        "--push-label",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Extra Pushgateway grouping label (repeatable)",
+    )
+    push_group.add_argument(
+        "--push-batch-size",
+        type=int,
+        default=5000,
+        metavar="N",
+        help="Maximum samples per request in import mode (default: 5000)",
+    )
+    push_group.add_argument(
+        "--push-retries",
+        type=int,
+        default=3,
+        metavar="N",
+        help="Retries after a failed push, with exponential backoff (default: 3)",
+    )
+    push_group.add_argument(
+        "--push-timeout",
+        type=float,
+        default=10.0,
+        metavar="SECONDS",
+        help="Timeout for each push request (default: 10)",
+    )
+    push_group.add_argument(
+        "--push-no-gzip",
+        action="store_true",
+        help="Send uncompressed request bodies",
+    )
 
     # Live-scrape options — only meaningful when no filename is given.
     scrape_group = parser.add_argument_group(
@@ -274,6 +855,14 @@ def main(argv: Optional[List[str]] = None) -> None:
         metavar="ZONE",
         help="Restrict live scrape to these zone names (default: all zones)",
     )
+    scrape_group.add_argument(
+        "--type",
+        nargs="+",
+        default=None,
+        dest="types",
+        metavar="TYPE",
+        help="Restrict live scrape to these NBP types (default: all types)",
+    )
     scrape_group.add_argument(
         "--workers",
         type=int,
@@ -286,10 +875,58 @@ def main(argv: Optional[List[str]] = None) -> None:
         help="Disable duplicate-node removal during live scrape",
     )
 
+    watch_group = parser.add_argument_group(
+        "watch mode",
+        "Stay running and regenerate the metrics whenever the snapshot changes",
+    )
+    watch_group.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Rewrite --output (and/or push) each time the snapshot file is "
+            "replaced; requires a snapshot file"
+        ),
+    )
+    watch_group.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        metavar="SECONDS",
+        help=(
+            "How often to check the snapshot when inotify is unavailable "
+            f"(default: {DEFAULT_POLL_INTERVAL:g})"
+        ),
+    )
+
+    parser.add_argument(
+        "--churn-state",
+        default=None,
+        metavar="FILE",
+        help=(
+            "Emit nodes_added, nodes_removed and zones_changed relative to the "
+            "previous run, keeping a compact node-digest sidecar in FILE"
+        ),
+    )
+    parser.add_argument(
+        "--stream-threshold",
+        type=int,
+        default=STREAMING_THRESHOLD,
+        metavar="BYTES",
+        help=(
+            "Stream snapshot files of at least BYTES bytes instead of loading "
+            f"them whole; 0 always streams (default: {STREAMING_THRESHOLD})"
+        ),
+    )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
     args = parser.parse_args(argv)
 
+    if args.watch:
+        if args.filename is None:
+            parser.error("--watch requires a snapshot file")
+        if args.output is sys.stdout and not args.push_url:
+            parser.error("--watch requires --output FILE or --push-url")
+
     if args.debug:
         level = logging.DEBUG
     elif args.quiet:
@@ -302,15 +939,37 @@ def main(argv: Optional[List[str]] = None) -> None:
         format="%(asctime)s - %(levelname)s - %(message)s",
     )
 
+    zone_types = None
+    if args.zone_types:
+        zone_types = ZoneTypeLimits(
+            top_k=args.zone_types_top_k,
+            include=args.zone_types_include,
+            exclude=args.zone_types_exclude,
+        )
+
+    networks = None
+    if args.networks or args.network_range:
+        networks = NetworkBreakdown(
+            per_network=args.networks, ranges=args.network_range or ()
+        )
+
+    if args.watch:
+        _watch_metrics(args, zone_types, networks)
+        return
+
+    fingerprint = FingerprintBuilder() if args.churn_state else None
     if args.filename is not None:
         # ── Load from a JSON snapshot file ──────────────────────────────────
-        if args.zone or args.workers != 10 or args.no_dedupe:
+        if args.zone or args.types or args.workers != 10 or args.no_dedupe:
             logging.warning(
-                "Live scrape options (--zone, --workers, --no-dedupe) are "
-                "ignored when a snapshot file is provided"
+                "Live scrape options (--zone, --type, --workers, --no-dedupe) "
+                "are ignored when a snapshot file is provided"
             )
         try:
-            data = load_data(args.filename)
+            with phase("load"):
+                data = load_metrics_source(
+                    args.filename, args.stream_threshold, fingerprint
+                )
         except FileNotFoundError:
             logging.error("File not found: %s", args.filename)
             sys.exit(1)
@@ -322,16 +981,41 @@ def main(argv: Optional[List[str]] = None) -> None:
         from globaltalk.scrape import scrape
 
         try:
-            data = scrape(
-                zones=args.zone,
-                workers=args.workers,
-                dedupe=not args.no_dedupe,
-            )
+            with phase("scrape"):
+                data = Snapshot(
+                    scrape(
+                        zones=args.zone,
+                        workers=args.workers,
+                        dedupe=not args.no_dedupe,
+                        types=args.types,
+                    )
+                )
         except RuntimeError as exc:
             logging.error("%s", exc)
             sys.exit(1)
+        if fingerprint is not None:
+            fingerprint.update(data.nodes)
+    churn, built = _compare_churn(args, fingerprint, data)
 
-    _write_metrics_output(data, args.output, prefix=args.prefix)
+    # Pushing and writing share one Snapshot, so its indexes are built once.
+    if args.push_url:
+        if not _push_metrics(data, args, zone_types, churn, networks):
+            sys.exit(1)
+        if args.output is sys.stdout:
+            _save_churn(args, built)
+            return
+
+    _write_metrics_output(
+        data,
+        args.output,
+        prefix=args.prefix,
+        openmetrics=args.openmetrics,
+        timestamps=args.timestamps,
+        zone_types=zone_types,
+        churn=churn,
+        networks=networks,
+    )
+    _save_churn(args, built)
 
     if args.output is not sys.stdout:
         args.output.close()
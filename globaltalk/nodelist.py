@@ -9,19 +9,32 @@ Router (AIR) used within the GlobalTalk network.
 The YAML output is intentionally kept simple (a single ``peers`` list) so that
 it can be produced without any external dependencies using a small hand-rolled
 emitter.
+
+The output or merge target is only rewritten when the resolved peer set has
+changed, so an unchanged run leaves the file (and its mtime) untouched and
+does not trigger a jrouter reload.
 """
 
 import logging
 import socket
 import sys
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from globaltalk.atomic import write_atomic
+from globaltalk.profiling import phase
+
+# Exit status used with --exit-code when the target file was left unchanged,
+# so that automation can skip reloading jrouter.
+EXIT_UNCHANGED = 3
 
 # ---------------------------------------------------------------------------
 # YAML helpers (no external dependency)
 # ---------------------------------------------------------------------------
 
 
-def _dump_peers_yaml(peers: List[str]) -> str:
+def _dump_peers_yaml(
+    peers: List[str], comments: Optional[Dict[str, str]] = None
+) -> str:
     """Serialise a list of peer IP strings as a minimal YAML document.
 
     Only handles the ``peers`` key with a list of scalar strings — which is
@@ -33,18 +46,73 @@ def _dump_peers_yaml(peers: List[str]) -> str:
         peers:
         - 1.2.3.4
         - 5.6.7.8
+
+    *comments* optionally maps peers to a trailing YAML comment, e.g.
+    ``- 5.6.7.8  # unreachable``.
     """
     if not peers:
         return "peers: []\n"
 
+    comments = comments or {}
     lines = ["peers:"]
     for peer in peers:
-        lines.append(f"- {peer}")
+        if peer in comments:
+            lines.append(f"- {peer}  # {comments[peer]}")
+        else:
+            lines.append(f"- {peer}")
     lines.append("")  # trailing newline
     return "\n".join(lines)
 
 
-def _merge_yaml_peers(path: str, peers: List[str]) -> str:
+def _find_peers_block(lines: List[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Return the ``(start, end)`` line indexes of the ``peers`` block.
+
+    *start* is the index of the ``peers:`` line and *end* the index of the
+    first line after the block.  Both are ``None`` when there is no
+    ``peers`` key.  See :func:`_merge_yaml_peers` for the assumptions made.
+    """
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("peers:"):
+            # The block ends at the next top-level key (line that starts with
+            # a non-space, non-hyphen character after the peers line), or EOF.
+            for j in range(i + 1, len(lines)):
+                next_line = lines[j]
+                if (
+                    next_line
+                    and not next_line[0].isspace()
+                    and not next_line.startswith("-")
+                ):
+                    return i, j
+            return i, len(lines)
+    return None, None
+
+
+def _parse_peers_yaml(content: str) -> Optional[List[str]]:
+    """Return the peer entries of the ``peers`` block in *content*.
+
+    Understands the output of :func:`_dump_peers_yaml` (block list or
+    ``peers: []``).  Returns ``None`` if *content* has no ``peers`` key.
+    """
+    lines = content.splitlines()
+    start, end = _find_peers_block(lines)
+    if start is None:
+        return None
+
+    peers: List[str] = []
+    inline = lines[start].strip()[len("peers:") :].strip()
+    if inline.startswith("[") and inline.endswith("]"):
+        peers.extend(p.strip() for p in inline[1:-1].split(",") if p.strip())
+    for line in lines[start + 1 : end]:
+        stripped = line.strip()
+        if stripped.startswith("-"):
+            peers.append(stripped[1:].split("#", 1)[0].strip())
+    return peers
+
+
+def _merge_yaml_peers(
+    path: str, peers: List[str], comments: Optional[Dict[str, str]] = None
+) -> str:
     """Load a YAML file at *path*, replace (or add) its ``peers`` key, and
     return the updated document as a string.
 
@@ -75,31 +143,9 @@ def _merge_yaml_peers(path: str, peers: List[str]) -> str:
         original = fh.read()
 
     lines = original.splitlines()
+    peers_start, peers_end = _find_peers_block(lines)
 
-    # Find the start of the existing ``peers:`` block (if any).
-    peers_start: Optional[int] = None
-    peers_end: Optional[int] = None
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("peers:"):
-            peers_start = i
-            # The block ends at the next top-level key (line that starts with
-            # a non-space, non-hyphen character after peers_start), or EOF.
-            for j in range(i + 1, len(lines)):
-                next_line = lines[j]
-                if (
-                    next_line
-                    and not next_line[0].isspace()
-                    and not next_line.startswith("-")
-                ):
-                    peers_end = j
-                    break
-            if peers_end is None:
-                peers_end = len(lines)
-            break
-
-    new_peers_block = _dump_peers_yaml(peers).rstrip("\n").splitlines()
+    new_peers_block = _dump_peers_yaml(peers, comments).rstrip("\n").splitlines()
 
     if peers_start is not None:
         updated = lines[:peers_start] + new_peers_block + lines[peers_end:]
@@ -193,21 +239,132 @@ def parse_input_file(path: str) -> List[str]:
     return parse_input(lines)
 
 
-def build_nodelist(
+def dedupe_peers(peers: List[str]) -> List[str]:
+    """Return *peers* with duplicates removed, keeping first occurrences."""
+    return list(dict.fromkeys(peers))
+
+
+def peers_equal(old: List[str], new: List[str], unordered: bool = False) -> bool:
+    """Return ``True`` if the peer lists *old* and *new* are equivalent.
+
+    Args:
+        old: The peers currently configured.
+        new: The freshly resolved peers.
+        unordered: When ``True`` the lists are compared as sets, ignoring
+            both order and duplicates.
+    """
+    if unordered:
+        return set(old) == set(new)
+    return old == new
+
+
+def _current_peers(path: str) -> Optional[List[str]]:
+    """Return the peers configured in *path*, or ``None`` if it has none.
+
+    Raises:
+        FileNotFoundError: if *path* does not exist.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        return _parse_peers_yaml(fh.read())
+
+
+class PeerProbe(NamedTuple):
+    """Reachability probing settings for :func:`update_nodelist`.
+
+    Attributes:
+        mode: ``"aurp"`` (AURP Open-Req over UDP) or ``"tcp"`` (connect).
+        port: Port to probe; defaults to 387 for ``aurp`` and is required
+            for ``tcp``.
+        timeout: Per-probe timeout in seconds.
+        workers: Maximum number of probes in flight at once.
+        keep_unreachable: Keep unreachable peers, annotated with a
+            ``# unreachable`` comment, instead of dropping them.
+        sort_by_rtt: Order reachable peers by round-trip time, fastest first.
+    """
+
+    mode: str = "aurp"
+    port: Optional[int] = None
+    timeout: float = 2.0
+    workers: int = 32
+    keep_unreachable: bool = False
+    sort_by_rtt: bool = False
+
+
+def _apply_probe(
+    peers: List[str], probe: PeerProbe
+) -> Tuple[List[str], Dict[str, str]]:
+    """Probe *peers* and return the peers to keep plus any YAML comments."""
+    from globaltalk.probe import probe_peers
+
+    results = probe_peers(
+        peers,
+        mode=probe.mode,
+        port=probe.port,
+        timeout=probe.timeout,
+        workers=probe.workers,
+    )
+    by_address = {result.address: result for result in results}
+    reachable = [p for p in peers if by_address[p].reachable]
+    unreachable = [p for p in peers if not by_address[p].reachable]
+
+    for peer in unreachable:
+        logging.warning(
+            "Peer %s is unreachable (%s)%s",
+            peer,
+            by_address[peer].error,
+            "" if probe.keep_unreachable else " — dropping",
+        )
+    if probe.sort_by_rtt:
+        reachable.sort(key=lambda p: by_address[p].rtt)
+
+    if not probe.keep_unreachable:
+        return reachable, {}
+    return reachable + unreachable, {p: "unreachable" for p in unreachable}
+
+
+class NodelistUpdate(NamedTuple):
+    """Result of :func:`update_nodelist`.
+
+    Attributes:
+        peers: The resolved (and possibly probed) peer IP addresses.
+        changed: Whether the target file was written.
+        comments: YAML comments for annotated peers, keyed by address.
+    """
+
+    peers: List[str]
+    changed: bool
+    comments: Dict[str, str]
+
+
+def update_nodelist(
     input_path: str,
     output_path: Optional[str] = None,
     merge_path: Optional[str] = None,
-) -> List[str]:
-    """Build a jrouter peer list from *input_path* and write YAML output.
+    dedupe: bool = False,
+    unordered: bool = False,
+    probe: Optional[PeerProbe] = None,
+) -> NodelistUpdate:
+    """Build a jrouter peer list and write it only if it has changed.
+
+    The ``peers`` block currently in the output (or merge) file is compared
+    with the resolved peers; when they are equivalent the file is left
+    untouched.  Otherwise it is replaced atomically.
 
     Args:
         input_path: Path to the text file of hostnames / IP addresses.
         output_path: If given, write a new YAML file at this path.
         merge_path: If given, merge the peer list into an existing YAML file
             at this path (replacing the ``peers`` key in-place).
+        dedupe: Remove duplicate peers, keeping first occurrences.
+        unordered: Compare the old and new peer lists as sets, so that a
+            change in order alone does not cause a rewrite.
+        probe: If given, probe every peer for reachability first and drop
+            (or annotate) the ones that do not answer.  Annotations alone
+            never cause a rewrite; only the peer list is compared.
 
     Returns:
-        The list of resolved peer IP addresses.
+        A :class:`NodelistUpdate`.  *changed* is ``True`` when there is no
+        file target.
 
     Raises:
         ValueError: If both *output_path* and *merge_path* are supplied.
@@ -217,22 +374,87 @@ def build_nodelist(
     if output_path and merge_path:
         raise ValueError("Specify either output_path or merge_path, not both")
 
-    peers = parse_input_file(input_path)
+    with phase("load"):
+        peers = parse_input_file(input_path)
+    if dedupe:
+        peers = dedupe_peers(peers)
 
     if not peers:
         logging.warning("No valid peers found in '%s'", input_path)
 
+    comments: Dict[str, str] = {}
+    if probe is not None and peers:
+        with phase("probe"):
+            peers, comments = _apply_probe(peers, probe)
+
+    target = merge_path or output_path
+    if not target:
+        return NodelistUpdate(peers, True, comments)
+
+    try:
+        current = _current_peers(target)
+    except FileNotFoundError:
+        if merge_path:
+            raise
+        current = None
+
+    if current is not None and peers_equal(current, peers, unordered):
+        logging.info("Peers in '%s' are unchanged — not rewriting", target)
+        return NodelistUpdate(peers, False, comments)
+
+    with phase("render"):
+        if merge_path:
+            content = _merge_yaml_peers(merge_path, peers, comments)
+        else:
+            content = _dump_peers_yaml(peers, comments)
+    with phase("write"):
+        write_atomic(target, content)
+
     if merge_path:
-        content = _merge_yaml_peers(merge_path, peers)
-        with open(merge_path, "w", encoding="utf-8") as fh:
-            fh.write(content)
         logging.info("Merged %d peer(s) into '%s'", len(peers), merge_path)
-    elif output_path:
-        with open(output_path, "w", encoding="utf-8") as fh:
-            fh.write(_dump_peers_yaml(peers))
+    else:
         logging.info("Wrote %d peer(s) to '%s'", len(peers), output_path)
+    return NodelistUpdate(peers, True, comments)
 
-    return peers
+
+def build_nodelist(
+    input_path: str,
+    output_path: Optional[str] = None,
+    merge_path: Optional[str] = None,
+    dedupe: bool = False,
+    unordered: bool = False,
+    probe: Optional[PeerProbe] = None,
+) -> List[str]:
+    """Build a jrouter peer list from *input_path* and write YAML output.
+
+    The file is only rewritten when the peers have changed; see
+    :func:`update_nodelist`, which also reports whether it was.
+
+    Args:
+        input_path: Path to the text file of hostnames / IP addresses.
+        output_path: If given, write a new YAML file at this path.
+        merge_path: If given, merge the peer list into an existing YAML file
+            at this path (replacing the ``peers`` key in-place).
+        dedupe: Remove duplicate peers, keeping first occurrences.
+        unordered: Ignore peer order when deciding whether to rewrite.
+        probe: Reachability probing settings; see :class:`PeerProbe`.
+
+    Returns:
+        The list of resolved peer IP addresses.
+
+    Raises:
+        ValueError: If both *output_path* and *merge_path* are supplied.
+        FileNotFoundError: If *input_path* or *merge_path* (when merging) do
+            not exist.
+    """
+    return update_nodelist(
+        input_path,
+        output_path=output_path,
+        merge_path=merge_path,
+        dedupe=dedupe,
+        unordered=unordered,
+        probe=probe,
+    ).peers
 
 
 # ---------------------------------------------------------------------------
@@ -262,6 +484,72 @@ def main(argv: Optional[List[str]] = None) -> None:
         "--merge",
         help="Merge peer list into an existing YAML file (replaces 'peers' key)",
     )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Remove duplicate peers (keeping the first occurrence)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Ignore peer order when deciding whether the file needs rewriting",
+    )
+    parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help=(
+            f"Exit with status {EXIT_UNCHANGED} when the peers are unchanged and "
+            "the file was not rewritten"
+        ),
+    )
+
+    probe_group = parser.add_argument_group("reachability probing")
+    probe_group.add_argument(
+        "--probe",
+        action="store_true",
+        help="Probe each peer and drop the ones that do not answer",
+    )
+    probe_group.add_argument(
+        "--probe-mode",
+        choices=["aurp", "tcp"],
+        default="aurp",
+        help=(
+            "aurp sends an AURP Open-Req over UDP; tcp opens a TCP connection "
+            "(default: aurp)"
+        ),
+    )
+    probe_group.add_argument(
+        "--probe-port",
+        type=int,
+        default=None,
+        metavar="PORT",
+        help="Port to probe (default: 387 for aurp; required for tcp)",
+    )
+    probe_group.add_argument(
+        "--probe-timeout",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="Per-probe timeout in seconds (default: 2)",
+    )
+    probe_group.add_argument(
+        "--probe-workers",
+        type=int,
+        default=32,
+        metavar="N",
+        help="Maximum number of concurrent probes (default: 32)",
+    )
+    probe_group.add_argument(
+        "--keep-unreachable",
+        action="store_true",
+        help="Keep unreachable peers, annotated with a '# unreachable' comment",
+    )
+    probe_group.add_argument(
+        "--sort-rtt",
+        action="store_true",
+        help="Order reachable peers by measured round-trip time, fastest first",
+    )
+
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
     args = parser.parse_args(argv)
@@ -282,11 +570,28 @@ def main(argv: Optional[List[str]] = None) -> None:
         logging.error("Cannot specify both --output and --merge")
         sys.exit(1)
 
+    probe = None
+    if args.probe:
+        if args.probe_mode == "tcp" and args.probe_port is None:
+            logging.error("--probe-mode tcp requires --probe-port")
+            sys.exit(1)
+        probe = PeerProbe(
+            mode=args.probe_mode,
+            port=args.probe_port,
+            timeout=args.probe_timeout,
+            workers=args.probe_workers,
+            keep_unreachable=args.keep_unreachable,
+            sort_by_rtt=args.sort_rtt,
+        )
+
     try:
-        peers = build_nodelist(
+        result = update_nodelist(
             input_path=args.input,
             output_path=args.output,
             merge_path=args.merge,
+            dedupe=args.dedupe,
+            unordered=args.unordered,
+            probe=probe,
         )
     except FileNotFoundError as exc:
         logging.error("%s", exc)
@@ -297,7 +602,9 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     # No file target — emit to stdout
     if not args.output and not args.merge:
-        sys.stdout.write(_dump_peers_yaml(peers))
+        sys.stdout.write(_dump_peers_yaml(result.peers, result.comments))
+    elif args.exit_code and not result.changed:
+        sys.exit(EXIT_UNCHANGED)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+GlobalTalk Probe
+
+Concurrent reachability checks for jrouter peers.
+
+Two probe styles are supported:
+
+aurp
+    An AURP Open-Req (RFC 1504) is sent over UDP, by default to port 387 — the
+    port jrouter and Apple Internet Router listen on.  Any reply from the peer
+    counts as reachable, including an Open-Rsp that refuses the connection:
+    the router is alive, it just does not know us.  An ICMP port-unreachable
+    or no reply within the timeout counts as unreachable.
+
+tcp
+    A TCP connection is opened to a configurable port and immediately closed.
+
+Probes run in a bounded thread pool, each with its own timeout, and the
+round-trip time of every successful probe is recorded.
+"""
+
+import concurrent.futures
+import ipaddress
+import logging
+import random
+import socket
+import struct
+import time
+from typing import List, NamedTuple, Optional
+
+# UDP port used for AppleTalk-IP (AURP) tunnelling.
+AURP_PORT = 387
+
+PROBE_MODES = ("aurp", "tcp")
+
+# Domain header packet type for AURP routing packets, and AURP command code
+# and version for an Open-Req.
+_DOMAIN_VERSION = 1
+_PACKET_TYPE_ROUTING = 0x0003
+_AURP_OPEN_REQ = 8
+_AURP_VERSION = 1
+
+
+class ProbeResult(NamedTuple):
+    """Outcome of probing a single peer.
+
+    Attributes:
+        address: The peer's IPv4 address.
+        reachable: Whether the peer answered.
+        rtt: Round-trip time in seconds, or ``None`` if unreachable.
+        error: A short description of why the probe failed, if it did.
+    """
+
+    address: str
+    reachable: bool
+    rtt: Optional[float] = None
+    error: Optional[str] = None
+
+
+def _domain_identifier(address: str) -> bytes:
+    """Return the RFC 1504 IP domain identifier for *address*."""
+    # Length (7), authority (1 = IP address), two reserved bytes, address.
+    return bytes([7, 1, 0, 0]) + ipaddress.IPv4Address(address).packed
+
+
+def aurp_open_request(
+    source: str, destination: str, connection_id: Optional[int] = None
+) -> bytes:
+    """Build an AURP Open-Req datagram from *source* to *destination*.
+
+    Args:
+        source: Our own IPv4 address, as seen by the peer.
+        destination: The peer's IPv4 address.
+        connection_id: AURP connection ID; a random non-zero value is used
+            if omitted.
+
+    Returns:
+        The complete UDP payload: domain header, AURP-Tr header, AURP header
+        and the Open-Req body (version 1, no options).
+    """
+    if connection_id is None:
+        connection_id = random.randint(1, 0xFFFF)
+    domain_header = (
+        _domain_identifier(destination)
+        + _domain_identifier(source)
+        + struct.pack(">HHH", _DOMAIN_VERSION, 0, _PACKET_TYPE_ROUTING)
+    )
+    # Connection ID, sequence number, command code, flags.
+    aurp_header = struct.pack(">HHHH", connection_id, 0, _AURP_OPEN_REQ, 0)
+    return domain_header + aurp_header + struct.pack(">HB", _AURP_VERSION, 0)
+
+
+def probe_aurp(
+    address: str, port: int = AURP_PORT, timeout: float = 2.0
+) -> ProbeResult:
+    """Probe *address* with an AURP Open-Req and wait for any reply."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.settimeout(timeout)
+        # Connecting the socket lets the kernel report ICMP port-unreachable
+        # as ConnectionRefusedError, and tells us our own source address.
+        sock.connect((address, port))
+        payload = aurp_open_request(sock.getsockname()[0], address)
+        start = time.monotonic()
+        sock.send(payload)
+        sock.recv(4096)
+        return ProbeResult(address, True, time.monotonic() - start)
+    except socket.timeout:
+        return ProbeResult(address, False, error="timed out")
+    except OSError as exc:
+        return ProbeResult(address, False, error=exc.strerror or str(exc))
+    finally:
+        sock.close()
+
+
+def probe_tcp(address: str, port: int, timeout: float = 2.0) -> ProbeResult:
+    """Probe *address* by opening (and closing) a TCP connection to *port*."""
+    start = time.monotonic()
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return ProbeResult(address, True, time.monotonic() - start)
+    except socket.timeout:
+        return ProbeResult(address, False, error="timed out")
+    except OSError as exc:
+        return ProbeResult(address, False, error=exc.strerror or str(exc))
+
+
+def probe_peers(
+    peers: List[str],
+    mode: str = "aurp",
+    port: Optional[int] = None,
+    timeout: float = 2.0,
+    workers: int = 32,
+) -> List[ProbeResult]:
+    """Probe every address in *peers* concurrently.
+
+    Args:
+        peers: IPv4 addresses to probe.  Duplicates are probed once.
+        mode: ``"aurp"`` or ``"tcp"``.
+        port: Port to probe.  Defaults to :data:`AURP_PORT` for ``aurp``;
+            required for ``tcp``.
+        timeout: Per-probe timeout in seconds.
+        workers: Maximum number of probes in flight at once.
+
+    Returns:
+        One :class:`ProbeResult` per unique address, in the order of
+        *peers*.
+
+    Raises:
+        ValueError: If *mode* is unknown, or ``tcp`` is used without a port.
+    """
+    if mode == "aurp":
+        port = AURP_PORT if port is None else port
+        probe = probe_aurp
+    elif mode == "tcp":
+        if port is None:
+            raise ValueError("A port is required for TCP probes")
+        probe = probe_tcp
+    else:
+        raise ValueError(f"Unknown probe mode: {mode!r}")
+
+    unique = list(dict.fromkeys(peers))
+    results = {}
+    max_workers = max(1, min(workers, len(unique)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(probe, address, port, timeout): address
+            for address in unique
+        }
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results[result.address] = result
+            if result.reachable:
+                logging.debug(
+                    "Probe %s:%d ok in %.1f ms",
+                    result.address,
+                    port,
+                    result.rtt * 1000,
+                )
+            else:
+                logging.debug(
+                    "Probe %s:%d failed: %s", result.address, port, result.error
+                )
+
+    reachable = sum(1 for r in results.values() if r.reachable)
+    logging.info("%d of %d peer(s) reachable", reachable, len(unique))
+    return [results[address] for address in unique]
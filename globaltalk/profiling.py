@@ -0,0 +1,189 @@
+"""
+GlobalTalk Profiling
+
+Opt-in instrumentation for the ``globaltalk`` CLI.
+
+The global ``--profile`` and ``--trace-malloc`` options (handled in
+``globaltalk.__main__``) wrap a subcommand in :mod:`cProfile` and
+:mod:`tracemalloc` via :func:`run_profiled`, then write a report to stderr
+that breaks the run down by phase and lists the top functions and
+allocation sites.
+
+Subcommands mark their phases (load, aggregate, render, write, ...) with the
+:func:`phase` context manager.  When profiling is not enabled a phase costs a
+single global lookup, so the markers can stay in production code paths.
+"""
+
+import contextlib
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import IO, Callable, Dict, Iterator, List, Optional
+
+# Per-phase ``[seconds, calls, peak_bytes]``.  ``None`` while profiling is
+# disabled, which is what makes phase() effectively free.
+_phases: Optional[Dict[str, List[float]]] = None
+
+# Each phase resets tracemalloc's peak so it can measure its own, so the run's
+# peak, and that of every enclosing phase, is kept here instead: before each
+# reset the traced peak so far is folded into _peak and into the open phases
+# on _peak_stack.
+_peak = 0
+_peak_stack: List[int] = []
+
+
+def _fold_peak() -> None:
+    """Fold the traced peak since the last reset into the run and open phases."""
+    global _peak
+    current = tracemalloc.get_traced_memory()[1]
+    _peak = max(_peak, current)
+    for i, value in enumerate(_peak_stack):
+        if current > value:
+            _peak_stack[i] = current
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Mark the enclosed block as the named phase of the current command.
+
+    Time spent in the block (and, under ``--trace-malloc``, its peak traced
+    memory) is accumulated under *name*.  Re-entering a phase adds to its
+    totals; nested phases are each charged for the full nested time.
+    """
+    if _phases is None:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        _fold_peak()
+        _peak_stack.append(0)
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = _phases.setdefault(name, [0.0, 0, 0])
+        stats[0] += elapsed
+        stats[1] += 1
+        if tracing:
+            _fold_peak()
+            stats[2] = max(stats[2], _peak_stack.pop())
+
+
+def run_profiled(
+    func: Callable[[], None],
+    profile_path: Optional[str] = None,
+    trace_malloc: bool = False,
+    report: IO[str] = sys.stderr,
+    top: int = 15,
+) -> None:
+    """Run *func* with phase timing enabled and write a report to *report*.
+
+    The report is written even if *func* exits via ``SystemExit`` or raises,
+    so that slow failing runs can be diagnosed too.
+
+    Args:
+        func: The subcommand entry point to run.
+        profile_path: If given, run under :mod:`cProfile` and dump the raw
+            stats to this path (loadable with :class:`pstats.Stats` or
+            snakeviz).
+        trace_malloc: When ``True`` trace allocations with :mod:`tracemalloc`
+            and include peak memory and the top allocation sites.
+        report: Stream to write the human-readable report to.
+        top: Number of functions / allocation sites to list.
+    """
+    global _phases, _peak
+    _phases = {}
+    _peak = 0
+    _peak_stack.clear()
+
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_malloc:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            func()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+    finally:
+        total = time.perf_counter() - start
+        snapshot = None
+        peak = 0
+        if trace_malloc:
+            _fold_peak()
+            peak = _peak
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        phases, _phases = _phases, None
+
+        if profiler is not None:
+            profiler.dump_stats(profile_path)
+        report.write(_format_report(total, phases, profiler, snapshot, peak, top))
+        report.flush()
+
+
+def _format_report(
+    total: float,
+    phases: Dict[str, List[float]],
+    profiler: Optional[cProfile.Profile],
+    snapshot: Optional[tracemalloc.Snapshot],
+    peak: int,
+    top: int,
+) -> str:
+    """Render the profiling report as a plain-text string."""
+    out = io.StringIO()
+    out.write(f"\n== globaltalk profile: {total:.3f}s total ==\n")
+
+    if phases:
+        out.write("\nphases:\n")
+        for name, (seconds, calls, phase_peak) in phases.items():
+            share = 100.0 * seconds / total if total else 0.0
+            line = f"  {name:<12} {seconds:9.3f}s {share:5.1f}%  x{int(calls)}"
+            if snapshot is not None:
+                line += f"  peak {_format_bytes(phase_peak)}"
+            out.write(line + "\n")
+
+    if profiler is not None:
+        out.write(f"\ntop {top} functions by cumulative time:\n")
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            )
+        )
+        out.write(f"\npeak traced memory: {_format_bytes(peak)}\n")
+        out.write(f"top {top} allocation sites (live at exit):\n")
+        for stat in snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            out.write(
+                f"  {_format_bytes(stat.size):>10} {stat.count:8d} blocks  "
+                f"{frame.filename}:{frame.lineno}\n"
+            )
+
+    return out.getvalue()
+
+
+def _format_bytes(size: float) -> str:
+    """Format a byte count with a binary unit suffix."""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
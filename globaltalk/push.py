@@ -0,0 +1,236 @@
+"""
+GlobalTalk Push
+
+Push-mode delivery of GlobalTalk metrics over HTTP, as an alternative to the
+node_exporter textfile collector.
+
+Two delivery styles are supported:
+
+pushgateway
+    The full exposition is sent with ``PUT /metrics/job/<job>/...`` to a
+    Prometheus Pushgateway (or anything that speaks its API), replacing the
+    previous push for the same grouping key.
+
+import
+    Samples are split into batches and each batch is ``POST``-ed to a
+    text-format import endpoint, such as VictoriaMetrics'
+    ``/api/v1/import/prometheus``.  This is the stdlib-only stand-in for
+    Prometheus remote-write, whose protobuf/snappy encoding would need
+    third-party packages.
+
+Requests go over a single persistent connection, bodies are gzip-compressed,
+and transient failures (connection errors, 429 and 5xx responses) are retried
+with exponential backoff.
+"""
+
+import base64
+import gzip
+import http.client
+import logging
+import time
+import urllib.parse
+from typing import Dict, Iterator, List, Optional
+
+from globaltalk.exposition import CONTENT_TYPE_TEXT, MetricFamily, render
+
+
+class PushError(RuntimeError):
+    """Raised when metrics could not be delivered."""
+
+
+def pushgateway_path(job: str, grouping: Optional[Dict[str, str]] = None) -> str:
+    """Return the Pushgateway URL path for *job* and the *grouping* labels.
+
+    Label values that contain a ``/`` (or are empty) are sent base64-encoded
+    using the Pushgateway's ``<name>@base64`` convention.
+    """
+    parts = ["metrics"]
+    for name, value in [("job", job), *sorted((grouping or {}).items())]:
+        if not value or "/" in value:
+            encoded = base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+            parts += [f"{name}@base64", encoded or "="]
+        else:
+            parts += [name, urllib.parse.quote(value, safe="")]
+    return "/" + "/".join(parts)
+
+
+def split_families(
+    families: List[MetricFamily], batch_size: int
+) -> Iterator[List[MetricFamily]]:
+    """Split *families* into batches of at most *batch_size* samples.
+
+    A family that straddles a batch boundary is split into several families
+    with the same metadata, so every batch is a valid exposition on its own.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    batch: List[MetricFamily] = []
+    room = batch_size
+    for family in families:
+        samples = family.samples
+        while samples:
+            part = MetricFamily(family.name, family.metric_type, family.help_text)
+            part.samples = samples[:room]
+            samples = samples[room:]
+            batch.append(part)
+            room -= len(part.samples)
+            if room == 0:
+                yield batch
+                batch, room = [], batch_size
+    if batch:
+        yield batch
+
+
+class MetricsPusher:
+    """Send request bodies to one HTTP(S) endpoint over a reused connection.
+
+    Use as a context manager, or call :meth:`close` when done.
+
+    Args:
+        url: Base URL of the endpoint, e.g. ``http://pushgateway:9091``.
+            Any path component is used as a prefix for request paths.
+        timeout: Socket timeout in seconds for each attempt.
+        retries: Number of retries after the first attempt fails.
+        backoff: Initial delay between retries in seconds; doubled after each
+            failed attempt.
+        compress: When ``True`` bodies are sent with ``Content-Encoding: gzip``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        compress: bool = True,
+    ) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Unsupported push URL: {url!r}")
+        self.url = url
+        self._https = parsed.scheme == "https"
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.compress = compress
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def __enter__(self) -> "MetricsPusher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying connection, if open."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if self._https
+                else http.client.HTTPConnection
+            )
+            self._conn = cls(self._host, self._port, timeout=self.timeout)
+        return self._conn
+
+    def send(
+        self,
+        method: str,
+        path: str,
+        body: str,
+        content_type: str = CONTENT_TYPE_TEXT,
+    ) -> int:
+        """Send *body* to *path* and return the HTTP status code.
+
+        Raises:
+            PushError: If the endpoint rejects the request (4xx other than
+                429), or every attempt fails.
+        """
+        payload = body.encode("utf-8")
+        headers = {"Content-Type": content_type}
+        if self.compress:
+            payload = gzip.compress(payload)
+            headers["Content-Encoding"] = "gzip"
+
+        delay = self.backoff
+        last_error = "no attempts made"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                logging.warning(
+                    "Push to %s failed (%s); retrying in %.1fs",
+                    self.url,
+                    last_error,
+                    delay,
+                )
+                time.sleep(delay)
+                delay *= 2
+            try:
+                conn = self._connection()
+                conn.request(
+                    method, self._base_path + path, body=payload, headers=headers
+                )
+                response = conn.getresponse()
+                # Drain the body so the connection can be reused.
+                detail = response.read().decode("utf-8", "replace").strip()
+            except (OSError, http.client.HTTPException) as exc:
+                self.close()
+                last_error = str(exc) or type(exc).__name__
+                continue
+
+            if response.will_close:
+                self.close()
+            if response.status < 300:
+                return response.status
+            last_error = f"HTTP {response.status}: {detail[:200]}"
+            if response.status != 429 and response.status < 500:
+                raise PushError(f"Push to {self.url} rejected: {last_error}")
+
+        raise PushError(
+            f"Push to {self.url} failed after {self.retries + 1} attempt(s): {last_error}"
+        )
+
+
+def push_to_gateway(
+    pusher: MetricsPusher,
+    families: List[MetricFamily],
+    job: str = "globaltalk",
+    grouping: Optional[Dict[str, str]] = None,
+) -> None:
+    """Replace the metrics for *job* / *grouping* on a Pushgateway.
+
+    Timestamps are stripped, because the Pushgateway rejects timestamped
+    samples.
+    """
+    plain = []
+    for family in families:
+        copy = MetricFamily(family.name, family.metric_type, family.help_text)
+        copy.samples = [(labels, value, None) for labels, value, _ in family.samples]
+        plain.append(copy)
+    pusher.send("PUT", pushgateway_path(job, grouping), render(plain))
+    logging.info("Pushed %d metric families to %s", len(plain), pusher.url)
+
+
+def push_batches(
+    pusher: MetricsPusher,
+    families: List[MetricFamily],
+    path: str = "",
+    batch_size: int = 5000,
+) -> int:
+    """``POST`` *families* to *path* in batches of at most *batch_size* samples.
+
+    Returns the number of batches sent.
+    """
+    count = 0
+    for batch in split_families(families, batch_size):
+        pusher.send("POST", path, render(batch))
+        count += 1
+    logging.info("Pushed %d batch(es) to %s", count, pusher.url)
+    return count
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Query
+
+Answers questions about a GlobalTalk JSON snapshot without ad-hoc ``jq``.
+
+A snapshot is loaded once into a :class:`NodeIndex`, which builds hash
+indexes on ``zone``, ``type``, ``address`` and ``object``, a sorted index of
+object names for prefix matches, and a sorted index of jrouter versions for
+range comparisons.  Filters are answered from the indexes alone, so the index
+can be kept around (in a REPL, or a long-running process) and queried
+repeatedly at little cost.
+
+Filter expressions
+------------------
+``field=value``
+    Exact match on ``zone``, ``type``, ``address`` or ``object``.
+
+``object^=prefix``
+    Object names starting with *prefix*.
+
+``jrouter<version`` (also ``<=``, ``>``, ``>=``, ``=``, ``!=``)
+    Nodes whose object is a jrouter instance (``jrouter v0.0.12``) with a
+    version in the given range.
+
+``network=first-last`` (or ``network=number``)
+    Nodes whose address is on an AppleTalk network in the given range,
+    answered from a packed, sorted address index.
+
+Filters on different fields must all match; repeating a field matches any of
+its values.  For example::
+
+    globaltalk query scrape.json type=LaserWriter --distinct zone
+    globaltalk query scrape.json address=5311.212
+    globaltalk query scrape.json "jrouter<0.0.13" --distinct object
+    globaltalk query scrape.json network=5000-5999 --distinct address
+"""
+
+import bisect
+import json
+import logging
+import re
+import sys
+from functools import cached_property
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from globaltalk.profiling import phase
+from globaltalk.snapshot import (
+    Snapshot,
+    as_snapshot,
+    pack_address,
+    parse_network_range,
+)
+
+INDEXED_FIELDS = ("zone", "type", "address", "object")
+
+_JROUTER_PATTERN = re.compile(r"^jrouter\s+(.+)", re.IGNORECASE)
+
+_FILTER_PATTERN = re.compile(r"^(\w+)\s*(\^=|<=|>=|!=|==|=|<|>)\s*(.*)$")
+
+_VERSION_OPS = ("<", "<=", ">", ">=", "=", "==", "!=")
+
+
+class QueryFilter(NamedTuple):
+    """A single parsed filter expression.
+
+    Attributes:
+        field: One of :data:`INDEXED_FIELDS`, ``"jrouter"`` or ``"network"``.
+        op: ``"="`` (exact), ``"^="`` (prefix), or a version comparison.
+        value: The value to compare against.
+    """
+
+    field: str
+    op: str
+    value: str
+
+
+def parse_filter(expression: str) -> QueryFilter:
+    """Parse a filter *expression* such as ``zone=Doofnet``.
+
+    Raises:
+        ValueError: If the expression is malformed or uses an unsupported
+            field / operator combination.
+    """
+    match = _FILTER_PATTERN.match(expression.strip())
+    if match is None:
+        raise ValueError(f"Invalid filter expression: {expression!r}")
+    field, op, value = match.groups()
+
+    if field == "jrouter":
+        if op not in _VERSION_OPS:
+            raise ValueError(f"Unsupported operator for jrouter: {op!r}")
+        if not parse_version(value):
+            raise ValueError(f"Invalid jrouter version: {value!r}")
+        return QueryFilter(field, "=" if op == "==" else op, value)
+
+    if field == "network":
+        if op not in ("=", "=="):
+            raise ValueError(f"Unsupported operator for network: {op!r}")
+        parse_network_range(value)
+        return QueryFilter(field, "=", value)
+
+    if field not in INDEXED_FIELDS:
+        raise ValueError(
+            f"Unknown field {field!r}; expected one of "
+            f"{', '.join(INDEXED_FIELDS)}, jrouter or network"
+        )
+    if op == "==":
+        op = "="
+    if op == "^=" and field != "object":
+        raise ValueError("Prefix matches (^=) are only supported on object")
+    if op not in ("=", "^="):
+        raise ValueError(f"Unsupported operator for {field}: {op!r}")
+    return QueryFilter(field, op, value)
+
+
+def parse_version(text: str) -> Tuple[int, ...]:
+    """Return *text* (e.g. ``"v0.0.12"``) as a comparable tuple of integers."""
+    return tuple(int(part) for part in re.findall(r"\d+", text))
+
+
+class NodeIndex:
+    """Hash and sorted indexes over the nodes of a snapshot.
+
+    The ``zone``, ``type``, ``address`` and ``object`` hash indexes are the
+    :class:`~globaltalk.snapshot.Snapshot`'s own cached ``by_*`` views, so a
+    process that also renders the snapshot builds them only once.  As there,
+    nodes lacking a field are indexed under ``Unknown``.  Matches are
+    intersected as sets of positions in :attr:`nodes` and returned in
+    snapshot order.
+
+    Args:
+        nodes: The snapshot to index, or its node records.
+    """
+
+    def __init__(self, nodes: Union[Snapshot, Iterable[Dict[str, str]]]) -> None:
+        if isinstance(nodes, Snapshot):
+            snapshot = nodes
+        else:
+            snapshot = Snapshot({"nodes": list(nodes)}, strict=False)
+        self.snapshot = snapshot
+        self.nodes: List[Dict[str, str]] = snapshot.nodes
+        self._fields: Dict[str, Dict[str, List[Dict[str, str]]]] = {
+            "zone": snapshot.by_zone,
+            "type": snapshot.by_type,
+            "address": snapshot.by_address,
+            "object": snapshot.by_object,
+        }
+        # Node positions by identity, to sort matches back into snapshot order.
+        self._position: Dict[int, int] = {}
+        versions: List[Tuple[Tuple[int, ...], int]] = []
+
+        for position, node in enumerate(self.nodes):
+            self._position[id(node)] = position
+            match = _JROUTER_PATTERN.match(node.get("object", ""))
+            if match:
+                versions.append((parse_version(match.group(1)), position))
+
+        # Sorted unique object names, for bisect prefix lookups.
+        self._objects: List[str] = sorted(self._fields["object"])
+        # (version, position) pairs sorted by version, for range lookups.
+        versions.sort()
+        self._versions = versions
+        self._version_keys = [version for version, _ in versions]
+
+    @classmethod
+    def from_snapshot(cls, data: Union[Snapshot, Dict[str, Any]]) -> "NodeIndex":
+        """Build an index over a snapshot or snapshot dictionary."""
+        return cls(as_snapshot(data))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def values(self, field: str) -> List[str]:
+        """Return the distinct values of an indexed *field*, sorted."""
+        return sorted(self._fields[field])
+
+    def _positions_of(self, nodes: Iterable[Dict[str, str]]) -> Set[int]:
+        position = self._position
+        return {position[id(node)] for node in nodes}
+
+    def _positions(self, query: QueryFilter) -> Set[int]:
+        """Return the positions of the nodes matching a single filter."""
+        if query.field == "jrouter":
+            return self._version_positions(query.op, parse_version(query.value))
+        if query.field == "network":
+            return self._network_positions(*parse_network_range(query.value))
+        if query.op == "^=":
+            return self._prefix_positions(query.value)
+        return self._positions_of(self._fields[query.field].get(query.value, ()))
+
+    def _prefix_positions(self, prefix: str) -> Set[int]:
+        objects = self._objects
+        by_object = self._fields["object"]
+        positions: Set[int] = set()
+        i = bisect.bisect_left(objects, prefix)
+        while i < len(objects) and objects[i].startswith(prefix):
+            positions.update(self._positions_of(by_object[objects[i]]))
+            i += 1
+        return positions
+
+    @cached_property
+    def _spellings(self) -> Dict[int, List[str]]:
+        """The address strings in the snapshot, keyed on their packed value.
+
+        Snapshots may write one address several ways (``"5311.212"`` and
+        ``"05311.212"``), so a packed value is mapped back to every string
+        it was built from rather than to :func:`unpack_address` output.
+        """
+        spellings: Dict[int, List[str]] = {}
+        for address in self._fields["address"]:
+            packed = pack_address(address)
+            if packed is not None:
+                spellings.setdefault(packed, []).append(address)
+        return spellings
+
+    def _network_positions(self, first: int, last: int) -> Set[int]:
+        by_address = self._fields["address"]
+        positions: Set[int] = set()
+        for packed in self.snapshot.address_index.packed_in_range(first, last):
+            for address in self._spellings[packed]:
+                positions.update(self._positions_of(by_address[address]))
+        return positions
+
+    def _version_positions(self, op: str, version: Tuple[int, ...]) -> Set[int]:
+        keys = self._version_keys
+        lo = bisect.bisect_left(keys, version)
+        hi = bisect.bisect_right(keys, version)
+        ranges = {
+            "<": [(0, lo)],
+            "<=": [(0, hi)],
+            ">": [(hi, len(keys))],
+            ">=": [(lo, len(keys))],
+            "=": [(lo, hi)],
+            "!=": [(0, lo), (hi, len(keys))],
+        }[op]
+        return {
+            position
+            for start, end in ranges
+            for _, position in self._versions[start:end]
+        }
+
+    def select(self, filters: Iterable[QueryFilter]) -> List[Dict[str, str]]:
+        """Return the nodes matching every field in *filters*, in snapshot order.
+
+        Filters on the same field are OR-ed together; different fields are
+        AND-ed.  With no filters every node is returned.
+        """
+        by_field: Dict[str, Set[int]] = {}
+        for query in filters:
+            by_field.setdefault(query.field, set()).update(self._positions(query))
+
+        if not by_field:
+            return list(self.nodes)
+
+        # Intersect the smallest candidate sets first.
+        candidates = sorted(by_field.values(), key=len)
+        result = set(candidates[0])
+        for positions in candidates[1:]:
+            result.intersection_update(positions)
+            if not result:
+                break
+        return [self.nodes[position] for position in sorted(result)]
+
+
+def distinct(nodes: Iterable[Dict[str, str]], field: str) -> List[str]:
+    """Return the sorted distinct values of *field* across *nodes*."""
+    return sorted({node[field] for node in nodes if field in node})
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``query`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk query",
+        description="Query the nodes in a GlobalTalk JSON snapshot",
+        epilog=(
+            "filters: zone=NAME, type=NAME, address=NET.NODE, object=NAME, "
+            "object^=PREFIX, jrouter<VERSION (also <=, >, >=, =, !=), "
+            "network=FIRST-LAST. "
+            "Different fields must all match; a repeated field matches any "
+            "of its values."
+        ),
+    )
+    parser.add_argument(
+        "filename",
+        help="Path to a GlobalTalk JSON snapshot",
+    )
+    parser.add_argument(
+        "filters",
+        nargs="*",
+        metavar="filter",
+        help="Filter expressions (default: all nodes)",
+    )
+    parser.add_argument(
+        "--distinct",
+        choices=INDEXED_FIELDS,
+        default=None,
+        metavar="FIELD",
+        help="Print the distinct values of FIELD among the matches instead",
+    )
+    parser.add_argument(
+        "--count",
+        action="store_true",
+        help="Print only the number of matching nodes (or distinct values)",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="File to write output to (default: stdout)",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        filters = [parse_filter(expression) for expression in args.filters]
+    except ValueError as exc:
+        logging.error("%s", exc)
+        sys.exit(1)
+
+    from globaltalk.metrics import load_data
+
+    try:
+        with phase("load"):
+            data = load_data(args.filename)
+    except FileNotFoundError:
+        logging.error("File not found: %s", args.filename)
+        sys.exit(1)
+    except ValueError as exc:
+        logging.error("%s", exc)
+        sys.exit(1)
+
+    with phase("aggregate"):
+        index = NodeIndex.from_snapshot(data)
+        matches = index.select(filters)
+    logging.debug("%d of %d node(s) match", len(matches), len(index))
+
+    with phase("render"):
+        if args.distinct:
+            values = distinct(matches, args.distinct)
+            lines = [str(len(values))] if args.count else values
+        elif args.count:
+            lines = [str(len(matches))]
+        else:
+            lines = [json.dumps(node) for node in matches]
+        content = "".join(f"{line}\n" for line in lines)
+
+    with phase("write"):
+        args.output.write(content)
+
+    if args.output is not sys.stdout:
+        args.output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+GlobalTalk Render Cache
+
+An on-disk cache of rendered zone fragments, shared between runs.
+
+:class:`~globaltalk.snapshot.ZoneCache` only lives as long as one process
+(for example ``visualise --watch``).  A :class:`RenderCache` keeps the same
+per-zone values in a directory, so a fresh ``globaltalk visualise`` run, such
+as one started by a timer after every scrape, renders only the zones that
+changed since any earlier run::
+
+    cache = RenderCache("/var/cache/globaltalk", namespace=("mermaid", None))
+    to_mermaid(snapshot, cache=cache)
+
+Each fragment is stored in its own file, named by a hash of
+
+- the cache *namespace*, which identifies the formatter and every option
+  that affects its output,
+- the zone name, and
+- the zone's content hash: the snapshot's stored ``zone_hashes`` entry
+  when ``scrape --canonical`` wrote one, otherwise a hash of the zone's
+  nodes in their snapshot order (renderers keep that order, and only a
+  canonical snapshot's order follows from its contents alone),
+
+so an entry never has to be invalidated: changed zones simply hash to new
+files.  Reading an entry touches its modification time, and once the
+directory grows beyond *max_bytes* the least recently used files are
+deleted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from globaltalk.atomic import atomic_writer
+from globaltalk.snapshot import ZoneCache
+
+T = TypeVar("T")
+
+# Bump when a formatter's output changes, so fragments rendered by an older
+# version are never reused.
+CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SUFFIX = ".json"
+
+
+def _ordered_hash(nodes: List[Dict[str, Any]]) -> str:
+    """Return a hex digest of *nodes*, sensitive to their order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for node in nodes:
+        digest.update(json.dumps(node, sort_keys=True, separators=(",", ":")).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class RenderCache(ZoneCache):
+    """A :class:`~globaltalk.snapshot.ZoneCache` backed by a directory.
+
+    Cached values must be JSON-serialisable; tuples come back as lists.
+    Unreadable entries are treated as misses and problems writing the cache
+    are logged, so a broken cache never stops a render.
+
+    Args:
+        directory: Cache directory, created if missing.  It may be shared by
+            several namespaces.
+        namespace: A JSON-serialisable value identifying the formatter and
+            its options.  Renders with different output must use different
+            namespaces.
+        max_bytes: Upper bound on the total size of the cache files.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        namespace: Any,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        super().__init__()
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._namespace = json.dumps([CACHE_VERSION, namespace], sort_keys=True)
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries_on_disk())
+
+    def _path(self, zone: str, content_hash: str) -> str:
+        key = hashlib.blake2b(digest_size=16)
+        for part in (self._namespace, zone, content_hash):
+            key.update(part.encode("utf-8"))
+            key.update(b"\0")
+        return os.path.join(self.directory, key.hexdigest() + _SUFFIX)
+
+    def get(
+        self,
+        zone: str,
+        nodes: List[Dict[str, Any]],
+        compute: Callable[[], T],
+        content_hash: Optional[str] = None,
+    ) -> T:
+        """Return the stored value for this zone's contents, or ``compute()``."""
+        if content_hash is None:
+            content_hash = _ordered_hash(nodes)
+        path = self._path(zone, content_hash)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                value = json.load(fh)
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as exc:
+            logging.debug("Ignoring unreadable render cache entry %s: %s", path, exc)
+        else:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        self._store(path, value)
+        return value
+
+    def _store(self, path: str, value: Any) -> None:
+        try:
+            with atomic_writer(path) as fh:
+                json.dump(value, fh, separators=(",", ":"))
+        except OSError as exc:
+            logging.warning("Failed to write render cache entry %s: %s", path, exc)
+
+    def _entries_on_disk(self) -> List[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [e for e in it if e.name.endswith(_SUFFIX) and e.is_file()]
+        except OSError:
+            return []
+
+    def retain(self, zones: Iterable[str]) -> None:
+        """Evict least recently used entries until the cache fits *max_bytes*.
+
+        Renderers call this after every render.  Entries for zones missing
+        from the current snapshot are kept, since another snapshot or
+        namespace may still use them; they age out through eviction.
+        """
+        entries = []
+        total = 0
+        for entry in self._entries_on_disk():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logging.warning("Failed to evict render cache entry %s: %s", path, exc)
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Run
+
+Produces several outputs from one snapshot in a single process.
+
+Running ``globaltalk scrape``, ``globaltalk metrics`` and ``globaltalk
+visualise`` one after another starts a new interpreter for each and parses
+the same snapshot every time.  ``globaltalk run`` scrapes (or loads) the
+snapshot once, wraps it in a :class:`~globaltalk.snapshot.Snapshot` so the
+zone, type and address indexes are shared, and fans it out to every
+requested sink:
+
+snapshot
+    The v1 JSON snapshot, as written by ``globaltalk scrape``.
+
+prom
+    Prometheus metrics, as written by ``globaltalk metrics``.
+
+mermaid
+    A Mermaid mindmap, as written by ``globaltalk visualise mermaid``.
+
+d3
+    D3.js hierarchical JSON, as written by ``globaltalk visualise d3``.
+
+Every sink is written to a sibling ``.tmp`` file and moved into place with
+``os.replace()``, so readers never see a partial file.  A sink that fails is
+reported and the remaining sinks are still written.
+"""
+
+import json
+import logging
+import sys
+from typing import IO, Any, Callable, List, NamedTuple, Optional
+
+from globaltalk.atomic import atomic_writer
+from globaltalk.profiling import phase
+from globaltalk.snapshot import Snapshot
+
+
+class Sink(NamedTuple):
+    """One output of a pipeline run.
+
+    Attributes:
+        name: Short name used in log messages (e.g. ``prom``).
+        path: The file to write.
+        write: Callable that writes the snapshot to an open text stream.
+    """
+
+    name: str
+    path: str
+    write: Callable[[Snapshot, IO[str]], None]
+
+
+def write_snapshot(snapshot: Snapshot, output: IO[str]) -> None:
+    """Write *snapshot* as indented v1 JSON, as ``globaltalk scrape`` does."""
+    json.dump(snapshot.data, output, indent=2)
+    output.write("\n")
+
+
+def run_sinks(snapshot: Snapshot, sinks: List[Sink]) -> int:
+    """Write *snapshot* to every sink in *sinks*, each atomically.
+
+    Returns:
+        The number of sinks that could not be written.  Failures are logged.
+    """
+    failures = 0
+    for sink in sinks:
+        try:
+            with phase("write"), atomic_writer(sink.path) as fh:
+                sink.write(snapshot, fh)
+        except (OSError, ValueError) as exc:
+            logging.error("Failed to write %s output %s: %s", sink.name, sink.path, exc)
+            failures += 1
+            continue
+        logging.info("Wrote %s output to %s", sink.name, sink.path)
+    return failures
+
+
+def _build_sinks(args: Any) -> List[Sink]:
+    """Return the sinks requested on the command line, in a fixed order."""
+    from globaltalk.metrics import ZoneTypeLimits, generate_metrics
+    from globaltalk.visualise import D3Summary, to_mermaid, write_d3
+
+    sinks = []
+    if args.snapshot:
+        sinks.append(Sink("snapshot", args.snapshot, write_snapshot))
+
+    if args.prom:
+        zone_types = ZoneTypeLimits() if args.zone_types else None
+
+        def _prom(snapshot: Snapshot, output: IO[str]) -> None:
+            generate_metrics(
+                snapshot,
+                output,
+                prefix=args.prefix,
+                openmetrics=args.openmetrics,
+                zone_types=zone_types,
+            )
+
+        sinks.append(Sink("prom", args.prom, _prom))
+
+    if args.mermaid:
+
+        def _mermaid(snapshot: Snapshot, output: IO[str]) -> None:
+            output.write(
+                to_mermaid(
+                    snapshot,
+                    max_leaves=args.mermaid_max_leaves,
+                    max_zones=args.mermaid_max_zones,
+                )
+            )
+
+        sinks.append(Sink("mermaid", args.mermaid, _mermaid))
+
+    if args.d3:
+        summary = D3Summary() if args.d3_summary else None
+
+        def _d3(snapshot: Snapshot, output: IO[str]) -> None:
+            write_d3(snapshot, output, compact=args.d3_compact, summary=summary)
+            output.write("\n")
+
+        sinks.append(Sink("d3", args.d3, _d3))
+
+    return sinks
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``run`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk run",
+        description=(
+            "Scrape or load a GlobalTalk snapshot once and write any combination "
+            "of outputs from it"
+        ),
+    )
+    parser.add_argument(
+        "filename",
+        nargs="?",
+        default=None,
+        help="Path to a GlobalTalk JSON snapshot (omit to scrape live)",
+    )
+
+    sink_group = parser.add_argument_group(
+        "outputs", "Each output is written atomically; at least one is required"
+    )
+    sink_group.add_argument(
+        "--snapshot", metavar="FILE", help="Write the JSON snapshot to FILE"
+    )
+    sink_group.add_argument(
+        "--prom", metavar="FILE", help="Write Prometheus metrics to FILE"
+    )
+    sink_group.add_argument(
+        "--mermaid", metavar="FILE", help="Write a Mermaid mindmap to FILE"
+    )
+    sink_group.add_argument(
+        "--d3", metavar="FILE", help="Write D3.js hierarchical JSON to FILE"
+    )
+
+    metrics_group = parser.add_argument_group("metrics options")
+    metrics_group.add_argument(
+        "--prefix",
+        default="globaltalk",
+        help="Metric name prefix (default: globaltalk)",
+    )
+    metrics_group.add_argument(
+        "--openmetrics",
+        action="store_true",
+        help="Write OpenMetrics instead of the Prometheus text format",
+    )
+    metrics_group.add_argument(
+        "--zone-types",
+        action="store_true",
+        help="Include the zone_type_devices{zone,type} breakdown (top 20 zones)",
+    )
+
+    visualise_group = parser.add_argument_group("visualisation options")
+    visualise_group.add_argument(
+        "--mermaid-max-leaves",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Show at most N objects per zone in the mindmap",
+    )
+    visualise_group.add_argument(
+        "--mermaid-max-zones",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Show at most N zones (the largest) in the mindmap",
+    )
+    visualise_group.add_argument(
+        "--d3-summary",
+        action="store_true",
+        help="Write the pre-aggregated zone → type → object D3 tree",
+    )
+    visualise_group.add_argument(
+        "--d3-compact",
+        action="store_true",
+        help="Write minified D3 JSON",
+    )
+
+    scrape_group = parser.add_argument_group(
+        "live scrape options",
+        "Used when no snapshot file is provided (requires netatalk)",
+    )
+    scrape_group.add_argument(
+        "--zone",
+        nargs="*",
+        default=None,
+        metavar="ZONE",
+        help="Restrict live scrape to these zone names (default: all zones)",
+    )
+    scrape_group.add_argument(
+        "--type",
+        nargs="+",
+        default=None,
+        dest="types",
+        metavar="TYPE",
+        help="Restrict live scrape to these NBP types (default: all types)",
+    )
+    scrape_group.add_argument(
+        "--workers",
+        type=int,
+        default=10,
+        help="Number of concurrent lookups for live scrape (default: 10)",
+    )
+    scrape_group.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Disable duplicate-node removal during live scrape",
+    )
+
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    sinks = _build_sinks(args)
+    if not sinks:
+        parser.error(
+            "at least one of --snapshot, --prom, --mermaid or --d3 is required"
+        )
+
+    if args.filename is not None:
+        try:
+            with phase("load"):
+                snapshot = Snapshot.load(args.filename)
+        except FileNotFoundError:
+            logging.error("File not found: %s", args.filename)
+            sys.exit(1)
+        except ValueError as exc:
+            logging.error("%s", exc)
+            sys.exit(1)
+    else:
+        from globaltalk.scrape import scrape
+
+        try:
+            with phase("scrape"):
+                snapshot = Snapshot(
+                    scrape(
+                        zones=args.zone,
+                        workers=args.workers,
+                        dedupe=not args.no_dedupe,
+                        types=args.types,
+                    )
+                )
+        except RuntimeError as exc:
+            logging.error("%s", exc)
+            sys.exit(1)
+
+    if run_sinks(snapshot, sinks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
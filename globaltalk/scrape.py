@@ -7,6 +7,7 @@ network and return structured data about zones and nodes.
 """
 
 import concurrent.futures
+import hashlib
 import json
 import logging
 import os
@@ -15,7 +16,11 @@ import shutil
 import subprocess
 import sys
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from globaltalk.checkpoint import DEFAULT_MAX_AGE, ScrapeJournal
+from globaltalk.profiling import phase
+from globaltalk.snapshot import UNKNOWN, zone_hash
 
 NBPLKUP_RESULTS = re.compile(r"^(.*):(.*)\s(\d*\.\d*:\d*)$")
 
@@ -55,13 +60,33 @@ def getzones() -> List[str]:
         return []
 
 
-def nbplkup(zone: str) -> List[Dict[str, str]]:
+def nbp_pattern(zone: str, nbp_type: Optional[str] = None) -> str:
+    """Return the ``nbplkup`` entity pattern for a zone lookup.
+
+    Without *nbp_type* this is ``@zone``, which matches every object and type
+    in the zone; otherwise ``=:Type@zone`` so that only registrations of that
+    type are returned.
+    """
+    if nbp_type is None:
+        return f"@{zone}"
+    return f"=:{nbp_type}@{zone}"
+
+
+def nbplkup(
+    zone: str, nbp_type: Optional[str] = None
+) -> Optional[List[Dict[str, str]]]:
     """Look up members of a zone and return a list of node dictionaries.
 
     Each node dict contains the keys: ``object``, ``type``, ``address``,
     ``socket``, and ``zone``.
 
-    Returns an empty list if the command fails or times out.
+    Args:
+        zone: The zone to look up.
+        nbp_type: Only look up registrations of this NBP type (e.g.
+            ``AFPServer``).  By default every type is returned.
+
+    Returns ``None`` if the command fails or times out, so that a failed
+    lookup can be told apart from an empty zone.
     """
     zone_results = []
 
@@ -72,7 +97,7 @@ def nbplkup(zone: str) -> List[Dict[str, str]]:
 
     try:
         cmd = subprocess.run(
-            ["nbplkup", f"@{zone}"],
+            ["nbplkup", nbp_pattern(zone, nbp_type)],
             capture_output=True,
             text=True,
             encoding="mac-roman",
@@ -81,11 +106,11 @@ def nbplkup(zone: str) -> List[Dict[str, str]]:
             check=True,
         )
     except subprocess.CalledProcessError as e:
-        logging.error("Failed to lookup zone %s: %s", zone, e)
-        return []
+        logging.error("Failed to lookup %s: %s", nbp_pattern(zone, nbp_type), e)
+        return None
     except subprocess.TimeoutExpired:
-        logging.error("nbplkup timed out for zone %s", zone)
-        return []
+        logging.error("nbplkup timed out for %s", nbp_pattern(zone, nbp_type))
+        return None
 
     for line in cmd.stdout.split("\n"):
         if line.strip() == "":
@@ -115,46 +140,137 @@ def nbplkup(zone: str) -> List[Dict[str, str]]:
     return zone_results
 
 
+def node_key(node: Dict[str, str]) -> Tuple[str, str, str, str]:
+    """Return the ``(address, socket, type, object)`` key that identifies a node.
+
+    Two nodes with the same key describe the same NBP registration, even if
+    they were seen from different zones or vantage points.  Missing fields
+    read as ``UNKNOWN``, so hand-edited or partial snapshots still key.
+    """
+    return tuple(
+        str(node.get(field, UNKNOWN))
+        for field in ("address", "socket", "type", "object")
+    )
+
+
+def node_digest(node: Dict[str, str]) -> int:
+    """Return a 64-bit blake2b digest of the node's :func:`node_key`.
+
+    The digest is a compact, fixed-size stand-in for the full four-string
+    key.  With 64 bits the chance of any collision among a million nodes is
+    around one in fifty million.
+    """
+    key = "\0".join(node_key(node)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+class NodeDeduplicator:
+    """Streaming de-duplication of nodes by :func:`node_digest`.
+
+    Only the 64-bit digest of each node seen so far is kept, not the node or
+    its key, so the deduplicator can sit between a streaming producer and
+    writer without holding the snapshot in memory.
+
+    Example::
+
+        dedupe = NodeDeduplicator()
+        for node in dedupe.filter(nodes):
+            write(node)
+        logging.info("Removed %d duplicates", dedupe.duplicates)
+    """
+
+    __slots__ = ("_seen", "duplicates")
+
+    def __init__(self) -> None:
+        self._seen: Set[int] = set()
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        """Return the number of unique nodes seen."""
+        return len(self._seen)
+
+    def add(self, node: Dict[str, str]) -> bool:
+        """Record *node* and return ``True`` if it has not been seen before."""
+        digest = node_digest(node)
+        if digest in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(digest)
+        return True
+
+    def filter(self, nodes: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        """Yield the nodes from *nodes* that have not been seen before."""
+        add = self.add
+        for node in nodes:
+            if add(node):
+                yield node
+
+
 def deduplicate_nodes(nodes: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], int]:
     """Remove duplicate nodes based on address, socket, type, and object name.
 
     Returns a ``(unique_nodes, duplicate_count)`` tuple.
     """
-    seen: set = set()
-    unique_nodes = []
+    dedupe = NodeDeduplicator()
+    unique_nodes = list(dedupe.filter(nodes))
 
-    for node in nodes:
-        key = (node["address"], node["socket"], node["type"], node["object"])
-        if key not in seen:
-            seen.add(key)
-            unique_nodes.append(node)
-
-    duplicates = len(nodes) - len(unique_nodes)
+    duplicates = dedupe.duplicates
     if duplicates > 0:
         logging.info("Removed %d duplicate node(s)", duplicates)
 
     return unique_nodes, duplicates
 
 
+def normalise_types(types: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """Return *types* sorted, without blanks or case-insensitive repeats.
+
+    NBP type matching is case-insensitive, so ``AFPServer`` and ``afpserver``
+    would return the same registrations twice.  ``None`` (or an empty
+    collection) means "every type" and is returned as ``None``.
+    """
+    if not types:
+        return None
+    unique: Dict[str, str] = {}
+    for nbp_type in types:
+        nbp_type = nbp_type.strip()
+        if nbp_type:
+            unique.setdefault(nbp_type.casefold(), nbp_type)
+    return sorted(unique.values(), key=str.casefold) or None
+
+
 def scrape(
     zones: Optional[List[str]] = None,
     workers: int = 10,
     dedupe: bool = True,
+    journal: Optional[ScrapeJournal] = None,
+    types: Optional[Iterable[str]] = None,
 ) -> Dict:
     """Scrape the GlobalTalk network and return a result dictionary.
 
     Args:
         zones: Optional list of zone names to restrict scanning to. When
             ``None`` all zones discovered by ``getzones`` are scanned.
-        workers: Number of concurrent zone-scan threads.
+        workers: Number of concurrent lookup threads.
         dedupe: When ``True`` duplicate nodes are removed from the results.
+        journal: Optional checkpoint journal.  Zones it already holds
+            (see :attr:`ScrapeJournal.completed`) are not scanned again, and
+            every newly scanned zone is recorded in it as soon as it
+            finishes.  A zone with a failed lookup is not recorded, so a
+            resumed scrape scans it again.
+        types: Optional NBP types (e.g. ``AFPServer``, ``LaserWriter``) to
+            restrict the scrape to.  Each zone is then queried with one
+            targeted ``=:Type@zone`` lookup per type, run concurrently, and
+            the results are merged.  By default a single ``@zone`` lookup
+            returns every type.
 
     Returns:
-        A dictionary with the keys ``format``, ``zones``, and ``nodes``.
+        A dictionary with the keys ``format``, ``zones``, and ``nodes``, plus
+        ``types`` when the scrape was restricted to certain NBP types.
 
     Raises:
         RuntimeError: If required netatalk binaries are missing, no zones are
-            found, or none of the requested zones exist.
+            found, none of the requested zones exist, or *journal* was opened
+            for a different set of *types*.
     """
     missing = check_prerequisites()
     if missing:
@@ -175,32 +291,91 @@ def scrape(
     else:
         zones_to_scan = all_zones
 
+    nbp_types = normalise_types(types)
+    if journal is not None and journal.types != nbp_types:
+        raise RuntimeError(
+            f"Checkpoint journal types {journal.types} do not match {nbp_types}"
+        )
+
     result: Dict = {
         "format": "v1",
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "zones": all_zones,
         "nodes": [],
     }
-
-    def _lookup_zone(zone: str) -> Optional[List[Dict[str, str]]]:
-        logging.info("Scanning %s", zone)
-        nodes = nbplkup(zone)
-        logging.info("Found %d nodes in %s", len(nodes), zone)
+    if nbp_types is not None:
+        result["types"] = nbp_types
+        logging.info("Restricting lookups to types: %s", ", ".join(nbp_types))
+
+    def _lookup(zone: str, nbp_type: Optional[str]) -> Optional[List[Dict[str, str]]]:
+        logging.info("Scanning %s", nbp_pattern(zone, nbp_type))
+        nodes = nbplkup(zone, nbp_type)
+        if nodes is not None:
+            logging.info(
+                "Found %d nodes in %s", len(nodes), nbp_pattern(zone, nbp_type)
+            )
         return nodes
 
+    # Duplicates are dropped as each zone's results arrive, so the full
+    # scrape (duplicates included) is never held in memory at once.
+    deduplicator = NodeDeduplicator() if dedupe else None
+    total_nodes = 0
+
+    def _add(zone_nodes: List[Dict[str, str]]) -> None:
+        nonlocal total_nodes
+        total_nodes += len(zone_nodes)
+        if deduplicator is not None:
+            zone_nodes = deduplicator.filter(zone_nodes)
+        result["nodes"].extend(zone_nodes)
+
+    if journal is not None:
+        resumed = [z for z in zones_to_scan if z in journal.completed]
+        for zone in resumed:
+            _add(journal.completed[zone])
+        if resumed:
+            logging.info("Reusing %d checkpointed zone(s)", len(resumed))
+            zones_to_scan = [z for z in zones_to_scan if z not in journal.completed]
+
+    # One lookup per (zone, type) pair, all sharing the same pool.  A zone is
+    # complete once every one of its lookups has finished; its results are
+    # then merged in type order.
+    lookup_types: List[Optional[str]] = list(nbp_types or [None])
+    pending: Dict[str, Dict[Optional[str], Optional[List[Dict[str, str]]]]] = {
+        zone: {} for zone in zones_to_scan
+    }
+
     completed = 0
     with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {executor.submit(_lookup_zone, zone): zone for zone in zones_to_scan}
+        futures = {
+            executor.submit(_lookup, zone, nbp_type): (zone, nbp_type)
+            for zone in zones_to_scan
+            for nbp_type in lookup_types
+        }
         for future in concurrent.futures.as_completed(futures):
+            zone, nbp_type = futures[future]
+            by_type = pending[zone]
+            by_type[nbp_type] = future.result()
+            if len(by_type) < len(lookup_types):
+                continue
+
+            del pending[zone]
+            failed = any(by_type[t] is None for t in lookup_types)
+            zone_nodes = [node for t in lookup_types for node in by_type[t] or ()]
             completed += 1
-            zone_nodes = future.result()
-            if zone_nodes:
-                result["nodes"].extend(zone_nodes)
+            if failed:
+                if journal is not None:
+                    logging.warning(
+                        "Not checkpointing %s: a lookup failed; it will be "
+                        "scanned again on --resume",
+                        zone,
+                    )
+            elif journal is not None:
+                journal.record(zone, zone_nodes)
+            _add(zone_nodes)
             logging.info("Progress: %d/%d zones scanned", completed, len(zones_to_scan))
 
-    total_nodes = len(result["nodes"])
-    if dedupe:
-        result["nodes"], _ = deduplicate_nodes(result["nodes"])
+    if deduplicator is not None and deduplicator.duplicates:
+        logging.info("Removed %d duplicate node(s)", deduplicator.duplicates)
 
     logging.info(
         "%d zones, %d unique nodes (scanned %d total)",
@@ -212,6 +387,32 @@ def scrape(
     return result
 
 
+def canonicalise(result: Dict) -> Dict:
+    """Return *result* in canonical order, with per-zone content hashes.
+
+    Zone results arrive in whatever order their lookups finish, so two
+    scrapes of an unchanged network otherwise differ byte for byte.  The
+    canonical form sorts ``zones`` by name and ``nodes`` by zone and then by
+    :func:`node_key`, and adds a ``zone_hashes`` map of
+    :func:`~globaltalk.snapshot.zone_hash` digests for every zone with nodes,
+    so consumers can tell which zones changed without comparing nodes.
+
+    The input dictionary is not modified.
+    """
+    nodes = sorted(result["nodes"], key=lambda n: (n.get("zone", UNKNOWN), node_key(n)))
+    by_zone: Dict[str, List[Dict[str, str]]] = {}
+    for node in nodes:
+        by_zone.setdefault(node.get("zone", UNKNOWN), []).append(node)
+
+    canonical = dict(result)
+    canonical["zones"] = sorted(result["zones"])
+    canonical["nodes"] = nodes
+    canonical["zone_hashes"] = {
+        zone: zone_hash(zone_nodes) for zone, zone_nodes in by_zone.items()
+    }
+    return canonical
+
+
 def main(argv: Optional[List[str]] = None) -> None:
     """Entry point for the ``scrape`` CLI subcommand."""
     import argparse
@@ -232,17 +433,60 @@ def main(argv: Optional[List[str]] = None) -> None:
         default=sys.stdout,
         help="File to write JSON output to (default: stdout)",
     )
+    parser.add_argument(
+        "--type",
+        nargs="+",
+        default=None,
+        dest="types",
+        metavar="TYPE",
+        help=(
+            "Only look up these NBP types (e.g. AFPServer LaserWriter), "
+            "with one targeted lookup per type (default: all types)"
+        ),
+    )
     parser.add_argument(
         "--workers",
         type=int,
         default=10,
-        help="Number of concurrent zone scans (default: 10)",
+        help="Number of concurrent lookups (default: 10)",
     )
     parser.add_argument(
         "--no-dedupe",
         action="store_true",
         help="Disable removal of duplicate nodes",
     )
+    parser.add_argument(
+        "--canonical",
+        action="store_true",
+        help=(
+            "Sort zones and nodes into a stable order and add per-zone "
+            "content hashes (zone_hashes)"
+        ),
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        metavar="FILE",
+        help=(
+            "Record each completed zone in this journal file so an interrupted "
+            "scrape can be resumed; removed once the snapshot is written"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse zones already recorded in the --checkpoint journal",
+    )
+    parser.add_argument(
+        "--checkpoint-max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE,
+        metavar="SECONDS",
+        help=(
+            "Only reuse checkpointed zones completed within this many seconds "
+            f"(default: {DEFAULT_MAX_AGE:g})"
+        ),
+    )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
     args = parser.parse_args(argv)
@@ -261,22 +505,53 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     logging.debug("Arguments: %s", args)
 
+    if args.resume and not args.checkpoint:
+        logging.error("--resume requires --checkpoint")
+        sys.exit(1)
+
+    journal = None
+    if args.checkpoint:
+        try:
+            journal = ScrapeJournal(
+                args.checkpoint,
+                resume=args.resume,
+                max_age=args.checkpoint_max_age,
+                types=normalise_types(args.types),
+            )
+        except OSError as exc:
+            logging.error("Cannot open checkpoint journal: %s", exc)
+            sys.exit(1)
+
     try:
-        result = scrape(
-            zones=args.zone,
-            workers=args.workers,
-            dedupe=not args.no_dedupe,
-        )
+        with phase("scrape"):
+            result = scrape(
+                zones=args.zone,
+                workers=args.workers,
+                dedupe=not args.no_dedupe,
+                journal=journal,
+                types=args.types,
+            )
     except RuntimeError as exc:
         logging.error("%s", exc)
         sys.exit(1)
+    finally:
+        if journal is not None:
+            journal.close()
 
-    json.dump(result, args.output, indent=2)
-    args.output.write("\n")
+    if args.canonical:
+        result = canonicalise(result)
+
+    with phase("write"):
+        json.dump(result, args.output, indent=2)
+        args.output.write("\n")
 
     if args.output is not sys.stdout:
         args.output.close()
 
+    # The snapshot is safely written; the journal is no longer needed.
+    if journal is not None:
+        journal.remove()
+
 
 if __name__ == "__main__":
     main()
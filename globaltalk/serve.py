@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+GlobalTalk Serve
+
+A small HTTP API over a snapshot file, for dashboards that poll.
+
+The snapshot is loaded once into a :class:`~globaltalk.snapshot.Snapshot`
+and a :class:`~globaltalk.query.NodeIndex`, and reloaded only when the file
+changes (see :mod:`globaltalk.watch`).  Every response body is serialised
+once per snapshot, gzip-compressed once, and tagged with an ``ETag``, so a
+poll that finds nothing new costs a dictionary lookup and a ``304``.
+
+Endpoints
+---------
+``/snapshot``
+    The snapshot file exactly as it was read.
+
+``/zones``
+    ``{"zones": [{"name", "nodes", "hash"}, ...]}``: every zone with its
+    endpoint count and content hash (see ``scrape --canonical``), so a
+    client can fetch only the zones whose hash changed.
+
+``/zones/<name>``
+    ``{"name", "hash", "nodes": [...]}`` for one zone.
+
+``/nodes?type=...``
+    ``{"nodes": [...]}`` matching ``zone``, ``type``, ``address``,
+    ``object`` and ``network`` parameters, combined as for ``globaltalk
+    query`` (different fields must all match; a repeated field matches any
+    of its values).
+
+``/viz/d3``, ``/viz/mermaid``
+    ``globaltalk visualise d3`` and ``globaltalk visualise mermaid`` output
+    with the default options.  Zone branches are carried over between
+    reloads, so only changed zones are rendered again.
+
+Clients that send ``Accept-Encoding: gzip`` receive the compressed body;
+``If-None-Match`` with the current ``ETag`` receives ``304 Not Modified``.
+"""
+
+import collections
+import gzip
+import hashlib
+import io
+import json
+import logging
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from globaltalk.query import INDEXED_FIELDS, NodeIndex, QueryFilter, parse_filter
+from globaltalk.snapshot import Snapshot, ZoneCache
+from globaltalk.visualise import to_mermaid, write_d3
+from globaltalk.watch import DEFAULT_POLL_INTERVAL, watch_file
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# Upper bound on the distinct /zones/<name> and /nodes responses kept per
+# snapshot; the fixed endpoints are always kept.
+DEFAULT_MAX_CACHED = 256
+
+_JSON = "application/json"
+_MARKDOWN = "text/markdown; charset=utf-8"
+
+_NODE_FIELDS = INDEXED_FIELDS + ("network",)
+
+
+class HTTPError(Exception):
+    """A request that cannot be answered, with its HTTP status code."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Response(NamedTuple):
+    """A fully serialised response body.
+
+    Attributes:
+        body: The uncompressed body.
+        gzipped: *body* compressed with gzip.
+        etag: Quoted strong entity tag derived from *body*.
+        content_type: Value of the ``Content-Type`` header.
+    """
+
+    body: bytes
+    gzipped: bytes
+    etag: str
+    content_type: str
+
+
+def make_response(body: bytes, content_type: str = _JSON) -> Response:
+    """Return a :class:`Response` for *body*, compressing it once."""
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    # mtime=0 keeps the compressed bytes identical across reloads.
+    gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    return Response(body, gzipped, etag, content_type)
+
+
+def _json_response(value: Any) -> Response:
+    return make_response(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _node_filters(query: str) -> Tuple[Tuple[str, str], ...]:
+    """Return the sorted ``(field, value)`` pairs of a ``/nodes`` query string.
+
+    Raises:
+        HTTPError: 400 for an unknown parameter.
+    """
+    pairs = []
+    for field, value in parse_qsl(query, keep_blank_values=True):
+        if field not in _NODE_FIELDS:
+            raise HTTPError(
+                400,
+                f"Unknown parameter {field!r}; expected one of "
+                f"{', '.join(_NODE_FIELDS)}",
+            )
+        pairs.append((field, value))
+    return tuple(sorted(pairs))
+
+
+class Generation:
+    """One loaded snapshot and every response rendered from it.
+
+    The fixed endpoints are rendered when the generation is built; zone and
+    node queries are rendered on first use and kept, least recently used
+    first out, up to *max_cached* entries.
+
+    Args:
+        raw: The snapshot file's bytes.
+        snapshot: The parsed snapshot.
+        mermaid_cache: Zone cache carried over from the previous generation.
+        d3_cache: Zone cache carried over from the previous generation.
+        max_cached: Bound on the lazily rendered responses kept.
+    """
+
+    def __init__(
+        self,
+        raw: bytes,
+        snapshot: Snapshot,
+        mermaid_cache: Optional[ZoneCache] = None,
+        d3_cache: Optional[ZoneCache] = None,
+        max_cached: int = DEFAULT_MAX_CACHED,
+    ) -> None:
+        self.snapshot = snapshot
+        self.index = NodeIndex(snapshot)
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._lazy: "collections.OrderedDict[Any, Response]" = collections.OrderedDict()
+
+        hashes = snapshot.zone_hashes
+        d3 = io.StringIO()
+        write_d3(snapshot, d3, cache=d3_cache)
+        d3.write("\n")
+        self.fixed: Dict[str, Response] = {
+            "/snapshot": make_response(raw),
+            "/zones": _json_response(
+                {
+                    "zones": [
+                        {
+                            "name": zone,
+                            "nodes": len(snapshot.by_zone.get(zone, ())),
+                            "hash": hashes.get(zone),
+                        }
+                        for zone in snapshot.zones
+                    ]
+                }
+            ),
+            "/viz/d3": make_response(d3.getvalue().encode("utf-8")),
+            "/viz/mermaid": make_response(
+                to_mermaid(snapshot, cache=mermaid_cache).encode("utf-8"),
+                _MARKDOWN,
+            ),
+        }
+
+    def response(self, path: str, query: str = "") -> Response:
+        """Return the response for a request *path* and *query* string.
+
+        One trailing slash is ignored on every path except a zone's, whose
+        name is taken verbatim, so zones ending in ``/`` stay reachable.
+
+        Raises:
+            HTTPError: 404 for an unknown path or zone, 400 for a bad query.
+        """
+        route = path[:-1] if path.endswith("/") else path
+        fixed = self.fixed.get(route)
+        if fixed is not None:
+            return fixed
+        if path.startswith("/zones/"):
+            zone = unquote(path[len("/zones/") :])
+            return self._cached(("zone", zone), lambda: self._zone(zone))
+        if route == "/nodes":
+            pairs = _node_filters(query)
+            return self._cached(("nodes", pairs), lambda: self._nodes(pairs))
+        raise HTTPError(404, f"Not found: {path}")
+
+    def _cached(self, key: Any, render: Callable[[], Response]) -> Response:
+        with self._lock:
+            response = self._lazy.get(key)
+            if response is not None:
+                self._lazy.move_to_end(key)
+                return response
+        # Render outside the lock; two threads racing on the same key both
+        # produce the same bytes.
+        response = render()
+        with self._lock:
+            self._lazy[key] = response
+            while len(self._lazy) > self.max_cached:
+                self._lazy.popitem(last=False)
+        return response
+
+    def _zone(self, zone: str) -> Response:
+        nodes = self.snapshot.by_zone.get(zone)
+        if nodes is None and zone not in self.snapshot.zones:
+            raise HTTPError(404, f"Unknown zone: {zone}")
+        return _json_response(
+            {
+                "name": zone,
+                "hash": self.snapshot.zone_hashes.get(zone),
+                "nodes": nodes or [],
+            }
+        )
+
+    def _nodes(self, pairs: Tuple[Tuple[str, str], ...]) -> Response:
+        filters: List[QueryFilter] = []
+        for field, value in pairs:
+            try:
+                filters.append(parse_filter(f"{field}={value}"))
+            except ValueError as exc:
+                raise HTTPError(400, str(exc)) from exc
+        return _json_response({"nodes": self.index.select(filters)})
+
+
+class SnapshotState:
+    """The current :class:`Generation` for a snapshot file.
+
+    :meth:`reload` builds a new generation and swaps it in; requests that
+    already hold the previous one finish with it.  A snapshot that is
+    missing, fails to parse or fails to render is logged and the previous
+    generation stays.
+
+    Args:
+        path: The snapshot file.
+        max_cached: As for :class:`Generation`.
+    """
+
+    def __init__(self, path: str, max_cached: int = DEFAULT_MAX_CACHED) -> None:
+        self.path = path
+        self.max_cached = max_cached
+        self.current: Optional[Generation] = None
+        self._mermaid_cache = ZoneCache()
+        self._d3_cache = ZoneCache()
+
+    def reload(self) -> bool:
+        """Load the snapshot file again; return ``True`` if it was replaced."""
+        try:
+            with open(self.path, "rb") as fh:
+                raw = fh.read()
+            try:
+                data = json.loads(raw)
+            except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+                raise ValueError(f"Failed to decode JSON: {exc}") from exc
+            snapshot = Snapshot(data)
+        except FileNotFoundError:
+            logging.error("File not found: %s", self.path)
+            return False
+        except (OSError, ValueError) as exc:
+            logging.error("Keeping the previous snapshot: %s", exc)
+            return False
+
+        self._mermaid_cache.reset_stats()
+        self._d3_cache.reset_stats()
+        try:
+            generation = Generation(
+                raw, snapshot, self._mermaid_cache, self._d3_cache, self.max_cached
+            )
+        except Exception as exc:
+            # A structurally valid snapshot can still trip up a renderer (a
+            # node without an object, say).  reload() runs as the watch_file
+            # callback, so letting this escape would stop all later reloads.
+            logging.error(
+                "Keeping the previous snapshot: failed to render %s: %r",
+                self.path,
+                exc,
+            )
+            return False
+        self.current = generation
+        logging.info(
+            "Serving %s: %d node(s) in %d zone(s), %d zone(s) re-rendered",
+            self.path,
+            len(snapshot),
+            len(snapshot.zones),
+            self._mermaid_cache.misses,
+        )
+        return True
+
+
+def _accepts_gzip(header: Optional[str]) -> bool:
+    """Return ``True`` if an ``Accept-Encoding`` header allows gzip."""
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Return ``True`` if an ``If-None-Match`` header matches *etag*."""
+    if not header:
+        return False
+    for item in header.split(","):
+        item = item.strip()
+        if item == "*" or item.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Answers GET and HEAD requests from the server's :class:`SnapshotState`."""
+
+    server: "SnapshotHTTPServer"
+    server_version = "globaltalk"
+    # Every response carries a Content-Length, so polling clients can keep
+    # their connection open.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self._respond(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self._respond(send_body=False)
+
+    def _respond(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        generation = self.server.state.current
+        try:
+            if generation is None:
+                raise HTTPError(503, "No snapshot loaded yet")
+            response = generation.response(url.path, url.query)
+        except HTTPError as exc:
+            self._send_error(exc.status, str(exc), send_body)
+            return
+
+        if _etag_matches(self.headers.get("If-None-Match"), response.etag):
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        body = response.body
+        self.send_response(200)
+        self.send_header("Content-Type", response.content_type)
+        if _accepts_gzip(self.headers.get("Accept-Encoding")):
+            body = response.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str, send_body: bool) -> None:
+        body = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", _JSON)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class SnapshotHTTPServer(ThreadingHTTPServer):
+    """A threading HTTP server bound to a :class:`SnapshotState`."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], state: SnapshotState) -> None:
+        super().__init__(address, RequestHandler)
+        self.state = state
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the ``serve`` CLI subcommand."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="globaltalk serve",
+        description="Serve a GlobalTalk JSON snapshot over HTTP",
+        epilog=(
+            "endpoints: /snapshot, /zones, /zones/NAME, "
+            "/nodes?type=NAME (also zone, address, object, network), "
+            "/viz/d3, /viz/mermaid"
+        ),
+    )
+    parser.add_argument(
+        "filename",
+        help="Path to a GlobalTalk JSON snapshot; reloaded whenever it changes",
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"Address to listen on (default: {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        metavar="SECONDS",
+        help=(
+            "How often to check the snapshot when inotify is unavailable "
+            f"(default: {DEFAULT_POLL_INTERVAL:g})"
+        ),
+    )
+    parser.add_argument(
+        "--max-cached",
+        type=int,
+        default=DEFAULT_MAX_CACHED,
+        metavar="N",
+        help=(
+            "Keep at most N rendered zone and node-query responses "
+            f"(default: {DEFAULT_MAX_CACHED})"
+        ),
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--quiet", action="store_true", help="Suppress info logging")
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.ERROR
+    else:
+        level = logging.INFO
+    logging.basicConfig(
+        level=level,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    if args.max_cached < 0:
+        logging.error("--max-cached must not be negative")
+        sys.exit(1)
+
+    state = SnapshotState(args.filename, max_cached=args.max_cached)
+    try:
+        server = SnapshotHTTPServer((args.host, args.port), state)
+    except OSError as exc:
+        logging.error("Cannot listen on %s:%d: %s", args.host, args.port, exc)
+        sys.exit(1)
+
+    stop = threading.Event()
+    watcher = threading.Thread(
+        target=watch_file,
+        args=(args.filename, state.reload, args.poll_interval),
+        kwargs={"stop": stop},
+        daemon=True,
+    )
+    watcher.start()
+
+    host, port = server.server_address[:2]
+    logging.info("Listening on http://%s:%d/", host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
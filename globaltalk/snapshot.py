@@ -0,0 +1,408 @@
+"""
+GlobalTalk Snapshot
+
+A validated GlobalTalk JSON snapshot with lazily built, cached indexes.
+
+Most subcommands need the same group-by views of a snapshot's nodes: nodes
+per zone, per type, per address, and the devices derived from them.  A
+:class:`Snapshot` validates the raw dictionary once and computes each view
+the first time it is used, so however many formatters consume the same
+snapshot, each index is built at most once::
+
+    snapshot = Snapshot.load("scrape.json")
+    generate_metrics(snapshot, sys.stdout)
+    print(to_mermaid(snapshot))       # reuses snapshot.by_zone
+
+Functions that accept a snapshot also still accept the raw dictionary; see
+:func:`as_snapshot`.  Indexed nodes are the original node dictionaries, so
+the views must be treated as read-only.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+from array import array
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar("T")
+
+# Key used for nodes that lack the field being indexed.
+UNKNOWN = "Unknown"
+
+# AppleTalk network numbers are 16 bits and node IDs 8 bits, so a packed
+# address fits comfortably in an unsigned 32-bit integer.
+MAX_NETWORK = 0xFFFF
+MAX_NODE = 0xFF
+
+
+def validate(data: Any) -> Dict[str, Any]:
+    """Return *data* if it has the structure of a GlobalTalk snapshot.
+
+    Raises:
+        ValueError: If *data* is not an object with ``nodes`` and ``zones``
+            fields.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("JSON root must be an object")
+
+    if "nodes" not in data or "zones" not in data:
+        raise ValueError("JSON must contain 'nodes' and 'zones' fields")
+
+    if "format" in data and data["format"] != "v1":
+        logging.warning("Unknown format version '%s', expected 'v1'", data["format"])
+
+    return data
+
+
+def _is_number(text: str) -> bool:
+    """Return ``True`` if *text* is a non-empty run of ASCII digits."""
+    return text.isascii() and text.isdigit()
+
+
+def pack_address(address: str) -> Optional[int]:
+    """Return ``"network.node"`` as one integer, ``network << 8 | node``.
+
+    Packed addresses sort in network order, then node order.  Returns
+    ``None`` if *address* is not a valid AppleTalk address.
+    """
+    network, sep, node = address.partition(".")
+    # isdigit() alone also accepts superscripts and non-ASCII digits.
+    if not sep or not _is_number(network) or not _is_number(node):
+        return None
+    network_number, node_id = int(network), int(node)
+    if network_number > MAX_NETWORK or node_id > MAX_NODE:
+        return None
+    return network_number << 8 | node_id
+
+
+def unpack_address(packed: int) -> str:
+    """Return the ``"network.node"`` string for a :func:`pack_address` value."""
+    return f"{packed >> 8}.{packed & MAX_NODE}"
+
+
+def parse_network_range(text: str) -> Tuple[int, int]:
+    """Parse ``"first-last"`` (or a single ``"network"``) into a range.
+
+    Raises:
+        ValueError: If *text* is not a valid range of AppleTalk networks.
+    """
+    first, sep, last = text.partition("-")
+    try:
+        bounds = (int(first), int(last) if sep else int(first))
+    except ValueError:
+        raise ValueError(f"Invalid network range: {text!r}") from None
+    if not 0 <= bounds[0] <= bounds[1] <= MAX_NETWORK:
+        raise ValueError(f"Invalid network range: {text!r}")
+    return bounds
+
+
+class AddressIndex:
+    """A sorted, packed index of distinct AppleTalk addresses.
+
+    Each address is stored as a :func:`pack_address` integer in one
+    ``array('I')``, so per-network counts and network-range lookups are
+    bisections and linear scans over machine integers rather than repeated
+    string splitting.
+
+    Args:
+        addresses: Address strings; duplicates are counted once.  Strings
+            that are not valid addresses are counted in :attr:`invalid` and
+            otherwise ignored.
+
+    Attributes:
+        packed: The distinct packed addresses, ascending.
+        invalid: The number of distinct strings that could not be packed.
+    """
+
+    def __init__(self, addresses: Iterable[str]) -> None:
+        packed = set()
+        invalid = set()
+        for address in addresses:
+            value = pack_address(address)
+            if value is None:
+                invalid.add(address)
+            else:
+                packed.add(value)
+        self.packed = array("I", sorted(packed))
+        self.invalid = len(invalid)
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    def _bounds(self, first: int, last: int) -> Tuple[int, int]:
+        lo = bisect.bisect_left(self.packed, first << 8)
+        hi = bisect.bisect_right(self.packed, last << 8 | MAX_NODE)
+        return lo, hi
+
+    def count_range(self, first: int, last: int) -> int:
+        """Return the number of addresses on networks *first* to *last* inclusive."""
+        lo, hi = self._bounds(first, last)
+        return max(0, hi - lo)
+
+    def packed_in_range(self, first: int, last: int) -> array:
+        """Return the packed addresses on networks *first* to *last* inclusive."""
+        lo, hi = self._bounds(first, last)
+        return self.packed[lo:hi]
+
+    def addresses_in_range(self, first: int, last: int) -> List[str]:
+        """Return the addresses on networks *first* to *last* inclusive, ascending.
+
+        The addresses are re-formatted by :func:`unpack_address`, so they may
+        differ from the strings they were built from (``"05311.212"``).
+        """
+        return [unpack_address(value) for value in self.packed_in_range(first, last)]
+
+    def network_counts(self) -> Dict[int, int]:
+        """Return ``{network: number of addresses}``, in ascending network order."""
+        counts: Dict[int, int] = {}
+        for value in self.packed:
+            network = value >> 8
+            counts[network] = counts.get(network, 0) + 1
+        return counts
+
+    def iter_networks(self) -> Iterator[Tuple[int, List[str]]]:
+        """Yield ``(network, addresses)`` for each network, ascending."""
+        packed = self.packed
+        start = 0
+        while start < len(packed):
+            network = packed[start] >> 8
+            end = bisect.bisect_right(packed, network << 8 | MAX_NODE, start)
+            yield network, [unpack_address(value) for value in packed[start:end]]
+            start = end
+
+
+def record_digest(node: Dict[str, Any]) -> int:
+    """Return a 64-bit BLAKE2b digest of *node*'s full record.
+
+    The node is serialised as compact JSON with sorted keys, so every field
+    counts, unlike :func:`globaltalk.scrape.node_digest`, which covers only
+    the identifying key.
+    """
+    line = json.dumps(node, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def zone_hash_of_digests(digests: Iterable[int]) -> str:
+    """Return the :func:`zone_hash` of nodes given their :func:`record_digest`."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in sorted(set(digests)):
+        digest.update(value.to_bytes(8, "big"))
+    return digest.hexdigest()
+
+
+def zone_hash(nodes: Iterable[Dict[str, Any]]) -> str:
+    """Return a hex digest of the set of *nodes*, independent of their order.
+
+    The distinct :func:`record_digest` values of the nodes are hashed in
+    ascending order with 128-bit BLAKE2b.  Two zones have the same hash
+    exactly when they hold the same node records (barring a 64-bit digest
+    collision).  This is the hash stored by ``scrape --canonical`` and the
+    one :mod:`globaltalk.churn` compares between runs.
+    """
+    return zone_hash_of_digests(record_digest(node) for node in nodes)
+
+
+class Snapshot:
+    """A validated snapshot with cached ``by_zone``/``by_type``/``by_address`` views.
+
+    Args:
+        data: A GlobalTalk snapshot dictionary, as produced by
+            ``globaltalk scrape``.
+        strict: When ``True``, *data* is checked with :func:`validate`.
+            When ``False`` it is wrapped as is, and missing ``nodes`` or
+            ``zones`` fields read as empty lists.
+
+    Raises:
+        ValueError: If *strict* and *data* is not a valid snapshot.
+    """
+
+    def __init__(self, data: Dict[str, Any], strict: bool = True) -> None:
+        self.data = validate(data) if strict else data
+
+    @classmethod
+    def load(cls, path: str) -> "Snapshot":
+        """Load and validate the snapshot at *path*.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the JSON is malformed or the structure is invalid.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Failed to decode JSON: {exc}") from exc
+        return cls(data)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def nodes(self) -> List[Dict[str, Any]]:
+        """The node records, in snapshot order."""
+        return self.data.get("nodes", [])
+
+    @property
+    def zones(self) -> List[str]:
+        """The zone names, in snapshot order."""
+        return self.data.get("zones", [])
+
+    def _group_by(self, field: str) -> Dict[str, List[Dict[str, Any]]]:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for node in self.nodes:
+            groups.setdefault(node.get(field, UNKNOWN), []).append(node)
+        return groups
+
+    @cached_property
+    def by_zone(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Nodes grouped by ``zone``, each group in snapshot order."""
+        return self._group_by("zone")
+
+    @cached_property
+    def by_type(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Nodes grouped by NBP ``type``, each group in snapshot order."""
+        return self._group_by("type")
+
+    @cached_property
+    def by_address(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Nodes (endpoints) grouped by AppleTalk ``address``."""
+        return self._group_by("address")
+
+    @cached_property
+    def by_object(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Nodes grouped by NBP ``object`` name, each group in snapshot order."""
+        return self._group_by("object")
+
+    @property
+    def unique_devices(self) -> int:
+        """The number of distinct device addresses."""
+        return len(self.by_address)
+
+    @property
+    def stored_zone_hashes(self) -> Dict[str, str]:
+        """The snapshot's own ``zone_hashes`` field, or ``{}`` if it has none.
+
+        Only snapshots written by ``globaltalk scrape --canonical`` carry
+        the field; the hashes are trusted as written.
+        """
+        stored = self.data.get("zone_hashes")
+        return stored if isinstance(stored, dict) else {}
+
+    @cached_property
+    def zone_hashes(self) -> Dict[str, str]:
+        """``{zone: zone_hash(nodes)}`` for every zone with nodes.
+
+        Taken from :attr:`stored_zone_hashes` when present, otherwise
+        computed from :attr:`by_zone`.
+        """
+        if "zone_hashes" in self.data:
+            return self.stored_zone_hashes
+        return {zone: zone_hash(nodes) for zone, nodes in self.by_zone.items()}
+
+    @cached_property
+    def address_index(self) -> AddressIndex:
+        """The distinct device addresses as a packed :class:`AddressIndex`."""
+        return AddressIndex(self.by_address)
+
+    @cached_property
+    def multihomed_devices(self) -> List[str]:
+        """Addresses with more than one endpoint registered, in snapshot order."""
+        return [
+            address
+            for address, endpoints in self.by_address.items()
+            if len(endpoints) > 1
+        ]
+
+
+class ZoneCache:
+    """Values derived from each zone's nodes, reused while those nodes are unchanged.
+
+    Long-running consumers (see ``--watch``) keep a cache across successive
+    snapshots so that only zones whose contents changed are re-rendered.  An
+    entry is valid while the zone's node list compares equal to the list it
+    was computed from; comparing lists is far cheaper than rendering them.
+    When the caller knows the zone's :func:`zone_hash`, the hashes are
+    compared instead.
+
+    :class:`globaltalk.rendercache.RenderCache` offers the same interface
+    backed by files, so rendered zones also survive between processes.
+
+    Attributes:
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that had to compute a value.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[List[Dict[str, Any]], Optional[str], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        zone: str,
+        nodes: List[Dict[str, Any]],
+        compute: Callable[[], T],
+        content_hash: Optional[str] = None,
+    ) -> T:
+        """Return the cached value for *zone*, or ``compute()`` if *nodes* changed.
+
+        Args:
+            zone: Zone name.
+            nodes: The zone's current nodes.
+            compute: Called to produce the value on a miss.
+            content_hash: The zone's :func:`zone_hash`, if already known.
+                When given, it is compared instead of *nodes*.
+        """
+        entry = self._entries.get(zone)
+        if entry is not None:
+            if content_hash is not None and entry[1] is not None:
+                valid = entry[1] == content_hash
+            else:
+                valid = entry[0] == nodes
+            if valid:
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        value = compute()
+        self._entries[zone] = (nodes, content_hash, value)
+        return value
+
+    def retain(self, zones: Iterable[str]) -> None:
+        """Drop the entries for every zone not in *zones*."""
+        keep = set(zones)
+        for zone in [z for z in self._entries if z not in keep]:
+            del self._entries[zone]
+
+    def reset_stats(self) -> None:
+        """Set :attr:`hits` and :attr:`misses` back to zero."""
+        self.hits = self.misses = 0
+
+
+def as_snapshot(data: Union[Snapshot, Dict[str, Any]]) -> Snapshot:
+    """Return *data* as a :class:`Snapshot`, wrapping a raw dictionary if needed.
+
+    A :class:`Snapshot` is returned unchanged, keeping its cached indexes.
+    A dictionary is wrapped without validation, as the formatters have
+    always accepted partial snapshots; loaders validate with
+    :class:`Snapshot` or :func:`validate` instead.
+    """
+    if isinstance(data, Snapshot):
+        return data
+    return Snapshot(data, strict=False)
@@ -0,0 +1,163 @@
+"""
+GlobalTalk Stream
+
+An incremental reader for v1 JSON snapshots.
+
+``json.load()`` turns a snapshot into one list holding a dictionary for
+every node before anything can be counted.  :func:`iter_nodes` instead reads
+the file in fixed-size chunks and decodes the ``nodes`` array one record at
+a time with :meth:`json.JSONDecoder.raw_decode`, so a consumer that only
+aggregates (such as ``globaltalk metrics``) never holds more than one node
+and one chunk of text::
+
+    fields = {}
+    for node in iter_nodes(fh, fields):
+        counts[node["zone"]] += 1
+    zones = fields["zones"]
+
+Every other top-level member (``zones``, ``generated_at``, …) is decoded
+whole and stored in the caller's *fields* dictionary.  Members may appear in
+any order, so *fields* is only complete once the iterator is exhausted.
+"""
+
+import json
+import logging
+from typing import IO, Any, Dict, Iterator, Tuple
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """A sliding window over a text stream, refilled on demand."""
+
+    def __init__(self, fh: IO[str], chunk_size: int) -> None:
+        self._fh = fh
+        self._chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read more text; return ``False`` at end of file."""
+        if self.eof:
+            return False
+        # Drop consumed text so the buffer stays around one chunk in size, and
+        # read at least as much as is already buffered so that a value larger
+        # than a chunk is retried a logarithmic number of times.
+        self.text = self.text[self.pos :]
+        self.pos = 0
+        chunk = self._fh.read(max(self._chunk_size, len(self.text)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.text += chunk
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character, or ``""`` at end of file."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"Failed to decode JSON: expected {char!r}, found "
+                f"{found or 'end of file'!r}"
+            )
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """Decode and consume the JSON value at the current position."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as exc:
+                if self._fill():
+                    continue
+                raise ValueError(f"Failed to decode JSON: {exc}") from exc
+            # A number or literal ending exactly at the end of the buffer may
+            # continue in the next chunk.
+            if end == len(self.text) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _members(buf: _Buffer, decoder: json.JSONDecoder) -> Iterator[Tuple[str, Any]]:
+    """Yield ``(key, value)`` for each member of the root object.
+
+    The ``nodes`` value is left unread for the caller, and ``None`` is yielded
+    in its place.
+    """
+    first = buf.peek()
+    if not first:
+        raise ValueError("Failed to decode JSON: the file is empty")
+    if first != "{":
+        raise ValueError("JSON root must be an object")
+    buf.pos += 1
+    if buf.peek() == "}":
+        buf.pos += 1
+        return
+    while True:
+        key = buf.decode(decoder)
+        if not isinstance(key, str):
+            raise ValueError("Failed to decode JSON: object keys must be strings")
+        buf.expect(":")
+        yield key, None if key == "nodes" else buf.decode(decoder)
+        if buf.peek() == "}":
+            buf.pos += 1
+            return
+        buf.expect(",")
+
+
+def iter_nodes(
+    fh: IO[str], fields: Dict[str, Any], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Yield the node records of the v1 snapshot in *fh*, one at a time.
+
+    Args:
+        fh: A text stream positioned at the start of the snapshot.
+        fields: Dictionary that receives every top-level member other than
+            ``nodes``.  It is complete once the iterator is exhausted.
+        chunk_size: Number of characters read from *fh* at a time.
+
+    Raises:
+        ValueError: If the JSON is malformed or the structure is invalid,
+            as for :func:`globaltalk.snapshot.validate`.  Nodes before the
+            error may already have been yielded.
+    """
+    buf = _Buffer(fh, chunk_size)
+    decoder = json.JSONDecoder()
+    seen_nodes = False
+
+    for key, value in _members(buf, decoder):
+        if key != "nodes":
+            fields[key] = value
+            continue
+        seen_nodes = True
+        buf.expect("[")
+        if buf.peek() == "]":
+            buf.pos += 1
+            continue
+        while True:
+            yield buf.decode(decoder)
+            if buf.peek() == "]":
+                buf.pos += 1
+                break
+            buf.expect(",")
+
+    if buf.peek():
+        raise ValueError("Failed to decode JSON: extra data after the root object")
+    if not seen_nodes or "zones" not in fields:
+        raise ValueError("JSON must contain 'nodes' and 'zones' fields")
+    if "format" in fields and fields["format"] != "v1":
+        logging.warning("Unknown format version '%s', expected 'v1'", fields["format"])
@@ -17,9 +17,38 @@ d3
     such as a sunburst or tree chart.
 """
 
+import collections
 import json
+import os
+import re
 import sys
-from typing import Any, Dict, List, Optional
+import threading
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from globaltalk.atomic import atomic_writer
+from globaltalk.profiling import phase
+from globaltalk.rendercache import DEFAULT_MAX_BYTES, RenderCache
+from globaltalk.snapshot import (
+    UNKNOWN,
+    Snapshot,
+    ZoneCache,
+    as_snapshot,
+    pack_address,
+)
+from globaltalk.watch import DEFAULT_POLL_INTERVAL, watch_file
 
 # ---------------------------------------------------------------------------
 # Mermaid formatter
@@ -29,55 +58,189 @@ from typing import Any, Dict, List, Optional
 # clutter the diagram without adding much meaning for most viewers.
 _MERMAID_EXCLUDED_TYPES = {"netatalk", "AppleRouter", "TimeLord"}
 
+# Files written by ``visualise mermaid --split``.
+_SPLIT_FILE = re.compile(r"^mindmap-\d+\.md$")
 
-def to_mermaid(data: Dict[str, Any], exclude_types: Optional[List[str]] = None) -> str:
+
+def _mermaid_label(name: str) -> str:
+    """Quote *name* for use as a Mermaid mindmap node label.
+
+    Mermaid mindmap node labels cannot contain unescaped parentheses, quotes,
+    or backticks — wrap in double-quotes and escape any internal
+    double-quotes.
+    """
+    escaped = name.replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _mermaid_zones(
+    data: Union[Snapshot, Dict[str, Any]],
+    exclude_types: Optional[List[str]],
+    max_leaves: Optional[int] = None,
+    cache: Optional[ZoneCache] = None,
+) -> List[Tuple[str, int, str]]:
+    """Return ``(zone, object count, rendered branch)`` for every non-empty zone.
+
+    Zones keep the order of the snapshot's ``zones`` list.  With *cache*,
+    zones whose nodes are unchanged since the previous call reuse their
+    rendered branch.
+    """
+    if exclude_types is None:
+        excluded = _MERMAID_EXCLUDED_TYPES
+    else:
+        excluded = set(exclude_types)
+
+    def _render(zone: str, nodes: List[Dict[str, Any]]) -> Tuple[int, str]:
+        # Deduplicate by object name within the zone so multi-endpoint
+        # devices appear only once as a leaf.
+        objects = list(
+            dict.fromkeys(
+                node["object"] for node in nodes if node.get("type") not in excluded
+            )
+        )
+        if not objects:
+            return 0, ""
+        return len(objects), _mermaid_zone(zone, objects, max_leaves)
+
+    snapshot = as_snapshot(data)
+    hashes = snapshot.stored_zone_hashes
+    zones = []
+    for zone in snapshot.zones:
+        nodes = snapshot.by_zone.get(zone, [])
+        if cache is None:
+            count, branch = _render(zone, nodes)
+        else:
+            count, branch = cache.get(
+                zone, nodes, lambda: _render(zone, nodes), hashes.get(zone)
+            )
+        if count:
+            zones.append((zone, count, branch))
+    if cache is not None:
+        cache.retain(snapshot.zones)
+    return zones
+
+
+def _mermaid_zone(zone: str, objects: List[str], max_leaves: Optional[int]) -> str:
+    """Render one zone branch, collapsing leaves beyond *max_leaves*."""
+    shown = objects if max_leaves is None else objects[:max_leaves]
+    lines = [f"    {_mermaid_label(zone)}"]
+    lines.extend(f"      {_mermaid_label(obj)}" for obj in shown)
+    hidden = len(objects) - len(shown)
+    if hidden:
+        lines.append(f"      {_mermaid_label(f'+{hidden} more')}")
+    return "\n".join(lines) + "\n"
+
+
+def _mermaid_document(body: str, title: str = "GlobalTalk") -> str:
+    return f"```mermaid\nmindmap\n  root){title}(\n{body}```\n"
+
+
+def _check_limit(name: str, value: Optional[int]) -> None:
+    if value is not None and value < 1:
+        raise ValueError(f"{name} must be at least 1")
+
+
+def to_mermaid(
+    data: Union[Snapshot, Dict[str, Any]],
+    exclude_types: Optional[List[str]] = None,
+    max_leaves: Optional[int] = None,
+    max_zones: Optional[int] = None,
+    cache: Optional[ZoneCache] = None,
+) -> str:
     """Render a GlobalTalk snapshot as a Mermaid mindmap string.
 
     The output is a fenced Mermaid code block ready to paste into Markdown.
     Each AppleTalk zone becomes a branch off the root, and the unique device
     objects within each zone are its leaves.
 
+    Mermaid struggles to render mindmaps with more than a few thousand
+    nodes, so the diagram can be bounded with *max_leaves* and *max_zones*;
+    anything beyond the limits is collapsed into a single ``"+N more"`` node.
+
     Args:
-        data: A validated GlobalTalk snapshot dictionary.
+        data: A :class:`~globaltalk.snapshot.Snapshot` or snapshot dictionary.
         exclude_types: NBP type strings to omit from the diagram.  Defaults to
             ``{"netatalk", "AppleRouter", "TimeLord"}`` — infrastructure nodes
             that are rarely interesting in a topology overview.  Pass an empty
             list to include everything.
+        max_leaves: Maximum number of object leaves per zone.  ``None``
+            (the default) shows every object.
+        max_zones: Maximum number of zone branches.  The zones with the most
+            objects are kept, in snapshot order, and the remainder are
+            summarised as ``"+N more zones"``.  ``None`` shows every zone.
+        cache: Optional :class:`~globaltalk.snapshot.ZoneCache` kept across
+            calls with the same options, so that only zones whose nodes
+            changed are re-rendered.
 
     Returns:
         A string containing the complete fenced Mermaid mindmap block.
+
+    Raises:
+        ValueError: If *max_leaves* or *max_zones* is less than 1.
     """
-    if exclude_types is None:
-        excluded = _MERMAID_EXCLUDED_TYPES
-    else:
-        excluded = set(exclude_types)
+    _check_limit("max_leaves", max_leaves)
+    _check_limit("max_zones", max_zones)
 
-    nodes: List[Dict[str, Any]] = data.get("nodes", [])
-    zones: List[str] = data.get("zones", [])
+    with phase("aggregate"):
+        zones = _mermaid_zones(data, exclude_types, max_leaves, cache)
 
-    body = ""
-    for zone in zones:
-        zone_nodes = [
-            n for n in nodes if n.get("zone") == zone and n.get("type") not in excluded
-        ]
-        if not zone_nodes:
-            continue
+    hidden = 0
+    if max_zones is not None and len(zones) > max_zones:
+        largest = sorted(range(len(zones)), key=lambda i: -zones[i][1])
+        keep = sorted(largest[:max_zones])
+        hidden = len(zones) - max_zones
+        zones = [zones[i] for i in keep]
 
-        # Deduplicate by object name within the zone so multi-endpoint devices
-        # appear only once as a leaf.
-        unique_objects = dict.fromkeys(n["object"] for n in zone_nodes)
+    body = "".join(branch for _, _, branch in zones)
+    if hidden:
+        body += f"    {_mermaid_label(f'+{hidden} more zones')}\n"
 
-        # Mermaid mindmap node labels cannot contain unescaped parentheses,
-        # quotes, or backticks — wrap in double-quotes and escape any internal
-        # double-quotes.
-        def _label(name: str) -> str:
-            escaped = name.replace('"', '\\"')
-            return f'"{escaped}"'
+    return _mermaid_document(body)
 
-        leaves = "\n".join(f"      {_label(obj)}" for obj in unique_objects)
-        body += f"    {_label(zone)}\n{leaves}\n"
 
-    return f"```mermaid\nmindmap\n  root)GlobalTalk(\n{body}```\n"
+def split_mermaid(
+    data: Union[Snapshot, Dict[str, Any]],
+    zones_per_file: int,
+    exclude_types: Optional[List[str]] = None,
+    max_leaves: Optional[int] = None,
+) -> List[str]:
+    """Render a snapshot as several Mermaid mindmaps of at most *zones_per_file* zones.
+
+    Zones are grouped in snapshot order; each mindmap's root is titled
+    ``GlobalTalk i of n`` so the pieces can be told apart.
+
+    Args:
+        data: A :class:`~globaltalk.snapshot.Snapshot` or snapshot dictionary.
+        zones_per_file: Maximum number of zone branches per mindmap.
+        exclude_types: As for :func:`to_mermaid`.
+        max_leaves: As for :func:`to_mermaid`.
+
+    Returns:
+        A list of fenced Mermaid mindmap blocks, one per zone group.  An
+        empty snapshot produces a single mindmap with no branches.
+
+    Raises:
+        ValueError: If *zones_per_file* or *max_leaves* is less than 1.
+    """
+    _check_limit("zones_per_file", zones_per_file)
+    _check_limit("max_leaves", max_leaves)
+
+    with phase("aggregate"):
+        zones = _mermaid_zones(data, exclude_types, max_leaves)
+
+    groups = [
+        zones[i : i + zones_per_file] for i in range(0, len(zones), zones_per_file)
+    ] or [[]]
+
+    documents = []
+    for number, group in enumerate(groups, start=1):
+        body = "".join(branch for _, _, branch in group)
+        # Parentheses would end Mermaid's root)...( shape, so spell it out.
+        title = "GlobalTalk"
+        if len(groups) > 1:
+            title += f" {number} of {len(groups)}"
+        documents.append(_mermaid_document(body, title))
+    return documents
 
 
 # ---------------------------------------------------------------------------
@@ -96,8 +259,26 @@ _D3_INCLUDED_TYPES = {
 }
 
 
+class D3Summary(NamedTuple):
+    """Level-of-detail limits for the summarised D3 tree.
+
+    Attributes:
+        max_leaves: Zones with more object leaves than this (after ``top_n``
+            is applied) are collapsed to one leaf per type carrying the
+            endpoint count.  ``None`` means never collapse.
+        top_n: If given, keep only the N objects with the most endpoints in
+            each zone, across all its types, and sum the rest of each type
+            into a ``"+N more"`` leaf.
+    """
+
+    max_leaves: Optional[int] = 100
+    top_n: Optional[int] = None
+
+
 def to_d3(
-    data: Dict[str, Any], include_types: Optional[List[str]] = None
+    data: Union[Snapshot, Dict[str, Any]],
+    include_types: Optional[List[str]] = None,
+    summary: Optional[D3Summary] = None,
 ) -> Dict[str, Any]:
     """Build a D3-compatible hierarchical data structure from a GlobalTalk snapshot.
 
@@ -120,48 +301,268 @@ def to_d3(
     Zones with no matching nodes are omitted so they don't create empty
     wedges in a sunburst chart.
 
+    With *summary*, the tree is pre-aggregated into zone → type → object
+    levels, where each object leaf's ``value`` is its endpoint count.  Large
+    zones are trimmed or collapsed according to the :class:`D3Summary`
+    limits, so the number of arcs stays bounded however large the network
+    grows::
+
+        {"name": "<zone>", "children": [
+            {"name": "AFPServer", "children": [
+                {"name": "nas-afp", "value": 2},
+                {"name": "+3 more", "value": 3}
+            ]},
+            ...
+        ]}
+
+    A collapsed zone has one ``{"name": "<type>", "value": <count>}`` leaf
+    per type instead.
+
     Args:
-        data: A validated GlobalTalk snapshot dictionary.
+        data: A :class:`~globaltalk.snapshot.Snapshot` or snapshot dictionary.
         include_types: NBP type strings to include.  Defaults to
             ``{"AFPServer", "Workstation", "ImageWriter", "LaserWriter",
             "Darwin"}``.  Pass ``None`` to use the default, or an explicit
             list (including an empty one) to override it.
+        summary: When given, produce the pre-aggregated tree described above.
 
     Returns:
         A plain Python dictionary ready to be serialised with ``json.dumps``.
     """
-    if include_types is None:
-        included = _D3_INCLUDED_TYPES
-    else:
-        included = set(include_types)
+    return {
+        "name": "GlobalTalk",
+        "children": list(_iter_d3_zones(data, _d3_included(include_types), summary)),
+    }
 
-    nodes: List[Dict[str, Any]] = data.get("nodes", [])
-    zones: List[str] = data.get("zones", [])
 
-    zone_children = []
-    for zone in zones:
-        zone_nodes = [
-            n
-            for n in nodes
-            if n.get("zone") == zone and (not included or n.get("type") in included)
-        ]
-        if not zone_nodes:
-            continue
+def to_d3_networks(
+    data: Union[Snapshot, Dict[str, Any]],
+    include_types: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Build a D3 tree grouped by AppleTalk network instead of by zone.
+
+    The tree has network → device address → endpoint levels, with networks
+    and addresses in numeric order, taken from the snapshot's packed
+    :attr:`~globaltalk.snapshot.Snapshot.address_index`::
+
+        {"name": "GlobalTalk", "children": [
+            {"name": "Network 5311", "children": [
+                {"name": "5311.212", "children": [
+                    {"name": "nas-afp - AFPServer", "value": 1},
+                    ...
+                ]},
+            ]},
+        ]}
+
+    Addresses that are not valid ``network.node`` strings are grouped under
+    an ``Unknown`` network at the end.
+
+    Args:
+        data: A :class:`~globaltalk.snapshot.Snapshot` or snapshot dictionary.
+        include_types: As for :func:`to_d3`.
+    """
+    snapshot = as_snapshot(data)
+    included = _d3_included(include_types)
+
+    def _devices(addresses: Iterable[str]) -> List[Dict[str, Any]]:
+        devices = []
+        for address in addresses:
+            endpoints = [
+                {"name": f"{n['object']} - {n['type']}", "value": 1}
+                for n in snapshot.by_address[address]
+                if not included or n.get("type") in included
+            ]
+            if endpoints:
+                devices.append({"name": address, "children": endpoints})
+        return devices
+
+    groups = [
+        (f"Network {network}", addresses)
+        for network, addresses in snapshot.address_index.iter_networks()
+    ]
+    if snapshot.address_index.invalid:
+        groups.append(
+            (UNKNOWN, [a for a in snapshot.by_address if pack_address(a) is None])
+        )
+
+    children = []
+    for name, addresses in groups:
+        devices = _devices(addresses)
+        if devices:
+            children.append({"name": name, "children": devices})
+    return {"name": "GlobalTalk", "children": children}
 
-        zone_children.append(
+
+def _d3_included(include_types: Optional[List[str]]) -> Set[str]:
+    """Resolve the ``include_types`` argument of the D3 formatters."""
+    if include_types is None:
+        return _D3_INCLUDED_TYPES
+    return set(include_types)
+
+
+def _d3_summary_children(
+    zone_nodes: List[Dict[str, Any]], summary: D3Summary
+) -> List[Dict[str, Any]]:
+    """Build the type → object levels of a summarised D3 zone."""
+    by_type: Dict[str, collections.Counter] = {}
+    for n in zone_nodes:
+        by_type.setdefault(n["type"], collections.Counter())[n["object"]] += 1
+
+    # Most endpoints first; ties broken by name so output is stable.
+    top: Optional[Set[Tuple[str, str]]] = None
+    if summary.top_n is not None:
+        by_count = sorted(
+            (-count, device_type, obj)
+            for device_type, objects in by_type.items()
+            for obj, count in objects.items()
+        )
+        top = {(device_type, obj) for _, device_type, obj in by_count[: summary.top_n]}
+
+    type_children = []
+    leaves = 0
+    for device_type in sorted(by_type):
+        ranked = sorted(by_type[device_type].items(), key=lambda i: (-i[1], i[0]))
+        kept, rest = ranked, []
+        if top is not None:
+            kept = [item for item in ranked if (device_type, item[0]) in top]
+            rest = [item for item in ranked if (device_type, item[0]) not in top]
+
+        children = [{"name": obj, "value": count} for obj, count in kept]
+        if rest:
+            children.append(
+                {"name": f"+{len(rest)} more", "value": sum(c for _, c in rest)}
+            )
+        leaves += len(children)
+        type_children.append({"name": device_type, "children": children})
+
+    if summary.max_leaves is not None and leaves > summary.max_leaves:
+        return [
+            {"name": device_type, "value": sum(by_type[device_type].values())}
+            for device_type in sorted(by_type)
+        ]
+    return type_children
+
+
+def _d3_zone(
+    zone: str,
+    zone_nodes: List[Dict[str, Any]],
+    included: Set[str],
+    summary: Optional[D3Summary] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return the D3 child object for one zone, or ``None`` if it is empty."""
+    if included:
+        zone_nodes = [n for n in zone_nodes if n.get("type") in included]
+    if not zone_nodes:
+        return None
+
+    if summary is not None:
+        return {"name": zone, "children": _d3_summary_children(zone_nodes, summary)}
+
+    return {
+        "name": zone,
+        "children": [
             {
-                "name": zone,
-                "children": [
-                    {
-                        "name": f"{n['object']} - {n['type']}",
-                        "value": 1,
-                    }
-                    for n in zone_nodes
-                ],
+                "name": f"{n['object']} - {n['type']}",
+                "value": 1,
             }
-        )
+            for n in zone_nodes
+        ],
+    }
 
-    return {"name": "GlobalTalk", "children": zone_children}
+
+def _iter_d3_zones(
+    data: Union[Snapshot, Dict[str, Any]],
+    included: Set[str],
+    summary: Optional[D3Summary] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the D3 child object for each non-empty zone, in ``zones`` order.
+
+    Each zone object is built from the snapshot's ``by_zone`` index only when
+    it is about to be consumed.  An empty *included* set means all types.
+    """
+    snapshot = as_snapshot(data)
+    for zone in snapshot.zones:
+        child = _d3_zone(zone, snapshot.by_zone.get(zone, []), included, summary)
+        if child is not None:
+            yield child
+
+
+def _iter_d3_zone_text(
+    data: Union[Snapshot, Dict[str, Any]],
+    included: Set[str],
+    summary: Optional[D3Summary],
+    encode: Callable[[Dict[str, Any]], str],
+    cache: ZoneCache,
+) -> Iterator[str]:
+    """Yield each non-empty zone serialised by *encode*, reusing *cache* entries."""
+    snapshot = as_snapshot(data)
+    hashes = snapshot.stored_zone_hashes
+    for zone in snapshot.zones:
+        zone_nodes = snapshot.by_zone.get(zone, [])
+
+        def _compute() -> str:
+            child = _d3_zone(zone, zone_nodes, included, summary)
+            return "" if child is None else encode(child)
+
+        text = cache.get(zone, zone_nodes, _compute, hashes.get(zone))
+        if text:
+            yield text
+    cache.retain(snapshot.zones)
+
+
+def write_d3(
+    data: Union[Snapshot, Dict[str, Any]],
+    output: IO[str],
+    include_types: Optional[List[str]] = None,
+    compact: bool = False,
+    summary: Optional[D3Summary] = None,
+    cache: Optional[ZoneCache] = None,
+) -> None:
+    """Stream the :func:`to_d3` tree for *data* to *output* as JSON.
+
+    Zone objects are serialised and written one at a time as they are
+    produced, so the complete tree is never held in memory.  The default
+    output is byte-for-byte identical to ``json.dump(to_d3(data), output,
+    indent=2)``.
+
+    Args:
+        data: A :class:`~globaltalk.snapshot.Snapshot` or snapshot dictionary.
+        output: A writable text stream.
+        include_types: As for :func:`to_d3`.
+        compact: When ``True`` write minified JSON with no whitespace.
+        summary: As for :func:`to_d3`.
+        cache: Optional :class:`~globaltalk.snapshot.ZoneCache` kept across
+            calls with the same options; each zone's serialised JSON is
+            reused while its nodes are unchanged.
+    """
+    included = _d3_included(include_types)
+
+    def _encode(zone: Dict[str, Any]) -> str:
+        if compact:
+            return json.dumps(zone, separators=(",", ":"))
+        return json.dumps(zone, indent=2).replace("\n", "\n    ")
+
+    if cache is None:
+        zones = (_encode(z) for z in _iter_d3_zones(data, included, summary))
+    else:
+        zones = _iter_d3_zone_text(data, included, summary, _encode, cache)
+
+    if compact:
+        output.write('{"name":"GlobalTalk","children":[')
+        for i, zone in enumerate(zones):
+            if i:
+                output.write(",")
+            output.write(zone)
+        output.write("]}")
+        return
+
+    output.write('{\n  "name": "GlobalTalk",\n  "children": [')
+    empty = True
+    for zone in zones:
+        output.write("\n    " if empty else ",\n    ")
+        output.write(zone)
+        empty = False
+    output.write("]\n}" if empty else "\n  ]\n}")
 
 
 # ---------------------------------------------------------------------------
@@ -169,6 +570,55 @@ def to_d3(
 # ---------------------------------------------------------------------------
 
 
+def _write_split_mermaid(
+    data: Snapshot, args: Any, exclude: Optional[List[str]]
+) -> None:
+    """Write one mindmap file per zone group for ``visualise mermaid --split``.
+
+    Each file is replaced atomically, and ``mindmap-*.md`` files left by an
+    earlier run that produced more groups (or a different number width) are
+    removed, so the directory always holds exactly the current mindmaps.
+    """
+    if not args.output_dir:
+        sys.stderr.write("globaltalk visualise: --split requires --output-dir\n")
+        sys.exit(1)
+    if args.output is not sys.stdout:
+        sys.stderr.write("globaltalk visualise: --split cannot be used with --output\n")
+        sys.exit(1)
+    if args.max_zones is not None:
+        sys.stderr.write(
+            "globaltalk visualise: --split cannot be used with --max-zones\n"
+        )
+        sys.exit(1)
+    try:
+        with phase("render"):
+            documents = split_mermaid(
+                data, args.split, exclude_types=exclude, max_leaves=args.max_leaves
+            )
+    except ValueError as exc:
+        sys.stderr.write(f"globaltalk visualise: {exc}\n")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    width = max(2, len(str(len(documents))))
+    written = set()
+    with phase("write"):
+        for number, document in enumerate(documents, start=1):
+            name = f"mindmap-{number:0{width}d}.md"
+            with atomic_writer(os.path.join(args.output_dir, name)) as fh:
+                fh.write(document)
+            written.add(name)
+
+        for name in os.listdir(args.output_dir):
+            if _SPLIT_FILE.match(name) and name not in written:
+                try:
+                    os.unlink(os.path.join(args.output_dir, name))
+                except OSError as exc:
+                    sys.stderr.write(
+                        f"globaltalk visualise: cannot remove stale {name}: {exc}\n"
+                    )
+
+
 def main(argv: Optional[List[str]] = None) -> None:
     """Entry point for the ``visualise`` CLI subcommand."""
     import argparse
@@ -207,6 +657,36 @@ def main(argv: Optional[List[str]] = None) -> None:
             "that are excluded by default"
         ),
     )
+    mermaid_parser.add_argument(
+        "--max-leaves",
+        type=int,
+        default=None,
+        metavar="N",
+        help='Show at most N objects per zone and summarise the rest as "+N more"',
+    )
+    mermaid_parser.add_argument(
+        "--max-zones",
+        type=int,
+        default=None,
+        metavar="N",
+        help='Show only the N largest zones and summarise the rest as "+N more zones"',
+    )
+    mermaid_parser.add_argument(
+        "--split",
+        type=int,
+        default=None,
+        metavar="ZONES",
+        help=(
+            "Write one mindmap file per group of ZONES zones into --output-dir "
+            "instead of a single mindmap"
+        ),
+    )
+    mermaid_parser.add_argument(
+        "--output-dir",
+        default=None,
+        metavar="DIR",
+        help="Directory for --split output files (created if missing)",
+    )
 
     # ── d3 ───────────────────────────────────────────────────────────────────
     d3_parser = subparsers.add_parser(
@@ -223,6 +703,47 @@ def main(argv: Optional[List[str]] = None) -> None:
         default=sys.stdout,
         help="File to write output to (default: stdout)",
     )
+    d3_parser.add_argument(
+        "--summary",
+        action="store_true",
+        help=(
+            "Pre-aggregate into zone/type/object levels with endpoint counts, "
+            "collapsing large zones (implied by --max-leaves and --top-n)"
+        ),
+    )
+    d3_parser.add_argument(
+        "--max-leaves",
+        type=int,
+        default=None,
+        metavar="N",
+        help=(
+            "With --summary, collapse zones with more than N object leaves "
+            "to per-type counts (default: 100)"
+        ),
+    )
+    d3_parser.add_argument(
+        "--top-n",
+        type=int,
+        default=None,
+        metavar="N",
+        help=(
+            "With --summary, keep the N objects with most endpoints in each "
+            'zone and group the rest of each type as "+N more"'
+        ),
+    )
+    d3_parser.add_argument(
+        "--by-network",
+        action="store_true",
+        help=(
+            "Group devices by AppleTalk network number instead of by zone "
+            "(network → address → endpoint)"
+        ),
+    )
+    d3_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write minified JSON instead of indented output",
+    )
     d3_parser.add_argument(
         "--all-types",
         action="store_true",
@@ -232,32 +753,197 @@ def main(argv: Optional[List[str]] = None) -> None:
         ),
     )
 
+    for sub in (mermaid_parser, d3_parser):
+        sub.add_argument(
+            "--watch",
+            action="store_true",
+            help=(
+                "Keep running and rewrite --output whenever the snapshot file "
+                "changes, re-rendering only the zones that changed"
+            ),
+        )
+        sub.add_argument(
+            "--poll-interval",
+            type=float,
+            default=DEFAULT_POLL_INTERVAL,
+            metavar="SECONDS",
+            help=(
+                "With --watch, how often to check the snapshot when inotify is "
+                f"unavailable (default: {DEFAULT_POLL_INTERVAL:g})"
+            ),
+        )
+        sub.add_argument(
+            "--cache-dir",
+            default=None,
+            metavar="DIR",
+            help=(
+                "Keep rendered zones in DIR and re-render only the zones whose "
+                "contents changed since an earlier run"
+            ),
+        )
+        sub.add_argument(
+            "--cache-size",
+            type=int,
+            default=DEFAULT_MAX_BYTES // (1024 * 1024),
+            metavar="MIB",
+            help=(
+                "Evict the least recently used --cache-dir entries beyond "
+                f"this size (default: {DEFAULT_MAX_BYTES // (1024 * 1024)})"
+            ),
+        )
+
     args = parser.parse_args(argv)
 
+    if args.format == "d3":
+        args.include = None if not args.all_types else []
+        args.d3_summary = None
+        if args.summary or args.max_leaves is not None or args.top_n is not None:
+            args.d3_summary = D3Summary(top_n=args.top_n)
+            if args.max_leaves is not None:
+                args.d3_summary = args.d3_summary._replace(max_leaves=args.max_leaves)
+        if args.by_network and args.d3_summary is not None:
+            sys.stderr.write(
+                "globaltalk visualise: --by-network cannot be used with "
+                "--summary, --max-leaves or --top-n\n"
+            )
+            sys.exit(1)
+
+    if args.cache_size < 0:
+        sys.stderr.write("globaltalk visualise: --cache-size must not be negative\n")
+        sys.exit(1)
+
+    if args.watch:
+        _watch(args)
+        return
+
     # Load the snapshot — shared by both subcommands.
     try:
-        with open(args.filename, encoding="utf-8") as fh:
-            data = json.load(fh)
+        with phase("load"):
+            data = Snapshot.load(args.filename)
     except FileNotFoundError:
         sys.stderr.write(f"globaltalk visualise: file not found: {args.filename}\n")
         sys.exit(1)
-    except json.JSONDecodeError as exc:
-        sys.stderr.write(f"globaltalk visualise: invalid JSON: {exc}\n")
+    except ValueError as exc:
+        sys.stderr.write(f"globaltalk visualise: invalid snapshot: {exc}\n")
         sys.exit(1)
 
-    if args.format == "mermaid":
+    if args.format == "mermaid" and args.split is not None:
         exclude = [] if args.include_infrastructure else None
-        args.output.write(to_mermaid(data, exclude_types=exclude))
-
-    elif args.format == "d3":
-        include = None if not args.all_types else []
-        result = to_d3(data, include_types=include)
-        json.dump(result, args.output, indent=2)
-        args.output.write("\n")
+        _write_split_mermaid(data, args, exclude)
+    else:
+        try:
+            _render(data, args, args.output, _render_cache(args))
+        except ValueError as exc:
+            sys.stderr.write(f"globaltalk visualise: {exc}\n")
+            sys.exit(1)
 
     if args.output is not sys.stdout:
         args.output.close()
 
 
+def _render_cache(args: Any) -> Optional[RenderCache]:
+    """Return the ``--cache-dir`` cache for the formatter options in *args*."""
+    if getattr(args, "cache_dir", None) is None:
+        return None
+    if args.format == "mermaid":
+        namespace = ["mermaid", args.include_infrastructure, args.max_leaves]
+    else:
+        summary = None if args.d3_summary is None else list(args.d3_summary)
+        namespace = ["d3", args.include, args.compact, summary]
+    try:
+        return RenderCache(args.cache_dir, namespace, args.cache_size * 1024 * 1024)
+    except OSError as exc:
+        sys.stderr.write(f"globaltalk visualise: cannot use cache directory: {exc}\n")
+        return None
+
+
+def _render(
+    data: Snapshot, args: Any, output: IO[str], cache: Optional[ZoneCache] = None
+) -> None:
+    """Write the single-document visualisation selected by *args* to *output*."""
+    if args.format == "mermaid":
+        with phase("render"):
+            content = to_mermaid(
+                data,
+                exclude_types=[] if args.include_infrastructure else None,
+                max_leaves=args.max_leaves,
+                max_zones=args.max_zones,
+                cache=cache,
+            )
+        with phase("write"):
+            output.write(content)
+        return
+
+    if args.by_network:
+        with phase("render"):
+            tree = to_d3_networks(data, include_types=args.include)
+        with phase("write"):
+            if args.compact:
+                json.dump(tree, output, separators=(",", ":"))
+            else:
+                json.dump(tree, output, indent=2)
+            output.write("\n")
+        return
+
+    # Rendering and writing are interleaved, one zone at a time.
+    with phase("render"):
+        write_d3(
+            data,
+            output,
+            include_types=args.include,
+            compact=args.compact,
+            summary=args.d3_summary,
+            cache=cache,
+        )
+        output.write("\n")
+
+
+def _watch(args: Any, stop: Optional[threading.Event] = None) -> None:
+    """Rewrite ``args.output`` each time the snapshot file changes.
+
+    The output is replaced atomically, and a :class:`ZoneCache` (or the
+    ``--cache-dir`` :class:`RenderCache`) carried between renders means only
+    zones whose nodes changed are rendered again.
+    A snapshot that is missing or fails to parse is reported and skipped;
+    the previous output is left in place.
+    """
+    if args.output is sys.stdout:
+        sys.stderr.write("globaltalk visualise: --watch requires --output FILE\n")
+        sys.exit(1)
+    if getattr(args, "split", None) is not None:
+        sys.stderr.write("globaltalk visualise: --watch cannot be used with --split\n")
+        sys.exit(1)
+    args.output.close()
+    cache = _render_cache(args) or ZoneCache()
+
+    def _regenerate() -> None:
+        try:
+            with phase("load"):
+                data = Snapshot.load(args.filename)
+        except FileNotFoundError:
+            sys.stderr.write(f"globaltalk visualise: file not found: {args.filename}\n")
+            return
+        except ValueError as exc:
+            sys.stderr.write(f"globaltalk visualise: invalid snapshot: {exc}\n")
+            return
+
+        cache.reset_stats()
+        try:
+            with atomic_writer(args.output.name) as fh:
+                _render(data, args, fh, cache)
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"globaltalk visualise: {exc}\n")
+            return
+        sys.stderr.write(
+            f"globaltalk visualise: wrote {args.output.name} "
+            f"({cache.misses} of {cache.hits + cache.misses} zones re-rendered)\n"
+        )
+
+    try:
+        watch_file(args.filename, _regenerate, args.poll_interval, stop=stop)
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
     main()
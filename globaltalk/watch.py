@@ -0,0 +1,168 @@
+"""
+GlobalTalk Watch
+
+Calls back whenever a snapshot file is replaced or rewritten, so that
+``globaltalk metrics --watch`` and ``globaltalk visualise ... --watch`` can
+stay resident and regenerate their outputs from a warm process.
+
+On Linux the file's directory is watched with inotify (through :mod:`ctypes`,
+so no extra dependency is needed).  The directory rather than the file is
+watched because ``globaltalk scrape`` and ``globaltalk run`` replace the
+snapshot atomically with ``os.replace()``, which swaps in a new inode.
+Elsewhere, or if inotify is unavailable, the file is polled with
+:func:`os.stat`.
+
+Either way a change is only reported when the file's inode, size or
+modification time differs from the last one handled, so duplicate events
+cause no extra work.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify event masks, from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Return ``(inode, mtime_ns, size)`` for *path*, or ``None`` if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class _PollWaiter:
+    """Wait by sleeping; the caller detects changes by comparing signatures."""
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(timeout)
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyWaiter:
+    """Wait for inotify events on the directory containing *path*.
+
+    Raises:
+        OSError: If inotify is not available.
+    """
+
+    def __init__(self, path: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        try:
+            init1 = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except AttributeError as exc:
+            raise OSError("inotify is not available") from exc
+
+        fd = init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if add_watch(fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, os.strerror(err), directory)
+
+        self._fd = fd
+        self._name = os.fsencode(os.path.basename(path))
+
+    def wait(self, timeout: float) -> None:
+        """Block until an event for the file arrives or *timeout* expires."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if ready and self._drain():
+                return
+
+    def _drain(self) -> bool:
+        """Read pending events; return ``True`` if any concern the file."""
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        matched = False
+        while offset + _EVENT_HEADER.size <= len(buf):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+            start = offset + _EVENT_HEADER.size
+            name = buf[start : start + length].rstrip(b"\0")
+            matched = matched or name == self._name
+            offset = start + length
+        return matched
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _make_waiter(path: str, use_inotify: bool):
+    if use_inotify:
+        try:
+            return _InotifyWaiter(path)
+        except OSError as exc:
+            logging.debug("inotify unavailable (%s); falling back to polling", exc)
+    return _PollWaiter()
+
+
+def watch_file(
+    path: str,
+    callback: Callable[[], None],
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    use_inotify: bool = True,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """Call *callback* now, and again each time *path* changes.
+
+    Runs until *stop* is set (checked at least every *poll_interval*
+    seconds) or, without *stop*, until interrupted.  While the file is
+    missing, nothing is called; it is picked up again once it reappears.
+
+    Args:
+        path: The file to watch.
+        callback: Called with no arguments.  Exceptions propagate and end
+            the watch, so callbacks should handle errors they can recover
+            from (such as a snapshot that fails to parse).
+        poll_interval: Polling period in seconds, and the longest inotify
+            wait before the file is re-checked.
+        use_inotify: Use inotify when available.  ``False`` forces polling.
+        stop: Optional event that ends the watch when set.
+    """
+    waiter = _make_waiter(path, use_inotify)
+    try:
+        # Taken before the first callback, so a change made while it runs is
+        # not missed.
+        signature = file_signature(path)
+        callback()
+        while stop is None or not stop.is_set():
+            waiter.wait(poll_interval)
+            current = file_signature(path)
+            if current is None or current == signature:
+                continue
+            signature = current
+            logging.info("%s changed; regenerating", path)
+            callback()
+    finally:
+        waiter.close()
@@ -2,6 +2,7 @@
 Shared test fixtures and sample data for the globaltalk test suite.
 """
 
+import copy
 from typing import Any, Dict, List
 
 # ---------------------------------------------------------------------------
@@ -70,6 +71,19 @@ SNAPSHOT_BASIC: Dict[str, Any] = {
     ],
 }
 
+
+def snapshot_changed() -> Dict[str, Any]:
+    """Return a copy of SNAPSHOT_BASIC with its RetroZone node replaced.
+
+    Doofnet is unchanged, so caches and churn see exactly one changed zone,
+    one node added and one removed.
+    """
+    data = copy.deepcopy(SNAPSHOT_BASIC)
+    retro = next(n for n in data["nodes"] if n["zone"] == "RetroZone")
+    retro["object"] = "other-mac"
+    return data
+
+
 # A snapshot with no generated_at field — tests graceful degradation of the
 # snapshot_age_seconds metric.
 SNAPSHOT_NO_TIMESTAMP: Dict[str, Any] = {
@@ -0,0 +1,268 @@
+"""
+Tests for globaltalk.archive
+
+Covers:
+  - compute_delta / apply_delta (adds, removes, zone moves, zone list changes
+    including order and duplicates, stored zone hashes dropped)
+  - SnapshotArchive (keyframe placement, reconstruction at any point, time
+                     lookups, ordering errors, reopening, index version,
+                     storage size)
+  - main (add / get / list, error paths)
+"""
+
+import copy
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from globaltalk.archive import (
+    SnapshotArchive,
+    apply_delta,
+    compute_delta,
+    main,
+)
+from globaltalk.scrape import canonicalise
+from tests.fixtures import SNAPSHOT_BASIC
+
+# 2025-01-15T12:00:00Z
+_BASIC_TS = 1736942400.0
+
+
+def _node(i, zone="RetroZone"):
+    return {
+        "object": f"mac{i}",
+        "type": "Workstation",
+        "address": f"7000.{i}",
+        "socket": "4",
+        "zone": zone,
+    }
+
+
+def _series(count):
+    """Return *count* snapshots five minutes apart, each changing a little."""
+    snapshots = []
+    data = copy.deepcopy(SNAPSHOT_BASIC)
+    for i in range(count):
+        data = copy.deepcopy(data)
+        when = datetime.fromtimestamp(_BASIC_TS + i * 300, timezone.utc)
+        data["generated_at"] = when.isoformat()
+        data["nodes"].append(_node(i))
+        if i % 3 == 2:
+            data["nodes"].pop(0)
+        snapshots.append(data)
+    return snapshots
+
+
+def _as_set(data):
+    return sorted(json.dumps(node, sort_keys=True) for node in data["nodes"])
+
+
+class TestDelta(unittest.TestCase):
+    def test_round_trip(self):
+        old = copy.deepcopy(SNAPSHOT_BASIC)
+        new = copy.deepcopy(SNAPSHOT_BASIC)
+        new["generated_at"] = "2025-01-15T12:05:00+00:00"
+        new["zones"] = ["Doofnet", "NewZone"]
+        removed = new["nodes"].pop(1)
+        new["nodes"].append(_node(1, zone="NewZone"))
+
+        delta = compute_delta(old, new)
+        self.assertEqual(delta["zones_added"], ["NewZone"])
+        self.assertEqual(delta["zones_removed"], ["RetroZone"])
+        self.assertEqual(delta["nodes_added"], [_node(1, zone="NewZone")])
+        self.assertEqual(
+            delta["nodes_removed"],
+            [
+                [
+                    removed["address"],
+                    removed["socket"],
+                    removed["type"],
+                    removed["object"],
+                ]
+            ],
+        )
+        self.assertEqual(delta["meta"]["generated_at"], new["generated_at"])
+
+        rebuilt = apply_delta(old, delta)
+        self.assertEqual(rebuilt["zones"], new["zones"])
+        self.assertEqual(_as_set(rebuilt), _as_set(new))
+        self.assertEqual(old, SNAPSHOT_BASIC)
+
+    def test_zone_move_replaces_in_place(self):
+        old = {"zones": ["A", "B"], "nodes": [_node(1, "A"), _node(2, "A")]}
+        new = {"zones": ["A", "B"], "nodes": [_node(1, "B"), _node(2, "A")]}
+        delta = compute_delta(old, new)
+        self.assertEqual(delta["nodes_added"], [_node(1, "B")])
+        self.assertEqual(delta["nodes_removed"], [])
+        self.assertEqual(apply_delta(old, delta)["nodes"], new["nodes"])
+
+    def test_identical_snapshots_give_empty_delta(self):
+        delta = compute_delta(SNAPSHOT_BASIC, SNAPSHOT_BASIC)
+        for key in ("zones_added", "zones_removed", "nodes_added", "nodes_removed"):
+            self.assertEqual(delta[key], [])
+        self.assertNotIn("zones", delta)
+
+    def test_zone_list_order_and_duplicates_kept(self):
+        old = {"zones": ["A", "C"], "nodes": []}
+        for zones in (["A", "B", "C"], ["C", "A"], ["A", "A", "C"]):
+            with self.subTest(zones=zones):
+                new = {"zones": zones, "nodes": []}
+                delta = compute_delta(old, new)
+                self.assertEqual(delta["zones"], zones)
+                rebuilt = apply_delta(old, delta)
+                self.assertEqual(rebuilt["zones"], new["zones"])
+
+    def test_stored_zone_hashes_dropped(self):
+        new = canonicalise(SNAPSHOT_BASIC)
+        delta = compute_delta(SNAPSHOT_BASIC, new)
+        self.assertNotIn("zone_hashes", delta["meta"])
+        # Deltas written before zone hashes were dropped still carry them.
+        delta["meta"]["zone_hashes"] = new["zone_hashes"]
+        self.assertNotIn("zone_hashes", apply_delta(SNAPSHOT_BASIC, delta))
+
+
+class _ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, "archive")
+
+
+class TestSnapshotArchive(_ArchiveTestCase):
+    def test_keyframes_every_interval(self):
+        archive = SnapshotArchive(self.path, keyframe_interval=4)
+        for data in _series(9):
+            archive.add(data)
+        self.assertEqual([e.seq for e in archive.entries if e.keyframe], [0, 4, 8])
+        self.assertTrue(archive.entries[1].file.endswith(".delta.json.gz"))
+
+    def test_keyframe_drops_stored_zone_hashes(self):
+        archive = SnapshotArchive(self.path)
+        archive.add(canonicalise(SNAPSHOT_BASIC))
+        self.assertNotIn("zone_hashes", archive.reconstruct(0))
+
+    def test_every_snapshot_reconstructed(self):
+        snapshots = _series(10)
+        archive = SnapshotArchive(self.path, keyframe_interval=4)
+        for data in snapshots:
+            archive.add(data)
+
+        reopened = SnapshotArchive(self.path)
+        self.assertEqual(reopened.keyframe_interval, 4)
+        for seq, expected in enumerate(snapshots):
+            with self.subTest(seq=seq):
+                rebuilt = reopened.reconstruct(seq)
+                self.assertEqual(rebuilt["generated_at"], expected["generated_at"])
+                self.assertEqual(rebuilt["zones"], expected["zones"])
+                self.assertEqual(_as_set(rebuilt), _as_set(expected))
+
+    def test_get_by_time(self):
+        archive = SnapshotArchive(self.path)
+        for data in _series(3):
+            archive.add(data)
+        self.assertEqual(
+            archive.get(_BASIC_TS + 400)["generated_at"], "2025-01-15T12:05:00+00:00"
+        )
+        self.assertEqual(archive.get()["generated_at"], "2025-01-15T12:10:00+00:00")
+        with self.assertRaises(LookupError):
+            archive.get(_BASIC_TS - 1)
+
+    def test_appending_after_reopen(self):
+        snapshots = _series(3)
+        SnapshotArchive(self.path).add(snapshots[0])
+        archive = SnapshotArchive(self.path)
+        archive.add(snapshots[1])
+        archive.add(snapshots[2])
+        self.assertEqual(
+            _as_set(SnapshotArchive(self.path).get()), _as_set(snapshots[2])
+        )
+
+    def test_out_of_order_rejected(self):
+        snapshots = _series(2)
+        archive = SnapshotArchive(self.path)
+        archive.add(snapshots[1])
+        with self.assertRaises(ValueError):
+            archive.add(snapshots[0])
+
+    def test_missing_timestamp_rejected(self):
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        del data["generated_at"]
+        with self.assertRaises(ValueError):
+            SnapshotArchive(self.path).add(data)
+        SnapshotArchive(self.path).add(data, timestamp=_BASIC_TS)
+
+    def test_unknown_index_version_rejected(self):
+        SnapshotArchive(self.path).add(SNAPSHOT_BASIC)
+        index_path = os.path.join(self.path, "index.json")
+        with open(index_path, encoding="utf-8") as fh:
+            index = json.load(fh)
+        index["version"] = 2
+        with open(index_path, "w", encoding="utf-8") as fh:
+            json.dump(index, fh)
+        with self.assertRaisesRegex(ValueError, "version"):
+            SnapshotArchive(self.path)
+
+    def test_empty_archive(self):
+        with self.assertRaises(LookupError):
+            SnapshotArchive(self.path).get()
+
+    def test_deltas_much_smaller_than_keyframes(self):
+        base = copy.deepcopy(SNAPSHOT_BASIC)
+        base["nodes"] = [_node(i) for i in range(2000)]
+        archive = SnapshotArchive(self.path)
+        for minute in range(0, 30, 5):
+            data = copy.deepcopy(base)
+            data["generated_at"] = f"2025-01-15T12:{minute:02d}:00+00:00"
+            data["nodes"].append(_node(5000 + minute))
+            archive.add(data)
+
+        sizes = [
+            os.path.getsize(os.path.join(self.path, e.file)) for e in archive.entries
+        ]
+        full = len(json.dumps(base, indent=2))
+        self.assertLess(max(sizes[1:]) * 100, full)
+
+
+class TestArchiveMain(_ArchiveTestCase):
+    def _write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        return path
+
+    def _run(self, *args):
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            main([*args, "--quiet"])
+        return out.getvalue()
+
+    def test_add_get_list(self):
+        paths = [self._write(f"{i}.json", d) for i, d in enumerate(_series(3))]
+        self._run("add", self.path, *paths, "--keyframe-interval", "2")
+
+        rows = [line.split("\t") for line in self._run("list", self.path).splitlines()]
+        self.assertEqual([row[2] for row in rows], ["keyframe", "delta", "keyframe"])
+        self.assertEqual(rows[1][1], "2025-01-15T12:05:00+00:00")
+
+        snapshot = json.loads(
+            self._run("get", self.path, "--at", "2025-01-15T12:07:00Z")
+        )
+        self.assertEqual(snapshot["generated_at"], "2025-01-15T12:05:00+00:00")
+
+    def test_get_before_first_snapshot_exits(self):
+        self._run("add", self.path, self._write("a.json", SNAPSHOT_BASIC))
+        with self.assertRaises(SystemExit):
+            self._run("get", self.path, "--at", str(_BASIC_TS - 60))
+
+    def test_missing_snapshot_exits(self):
+        with self.assertRaises(SystemExit):
+            self._run("add", self.path, os.path.join(self.dir, "missing.json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for globaltalk.atomic
+
+Covers:
+  - atomic_writer (replace on success, original kept on failure, text and
+    binary modes)
+  - write_atomic (text and bytes, no temporary file left behind)
+"""
+
+import os
+import tempfile
+import unittest
+
+from globaltalk.atomic import atomic_writer, write_atomic
+
+
+class _AtomicTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, "out")
+
+
+class TestAtomicWriter(_AtomicTestCase):
+    def _read(self):
+        with open(self.path, encoding="utf-8") as fh:
+            return fh.read()
+
+    def test_replaces_target(self):
+        with atomic_writer(self.path) as fh:
+            fh.write("new")
+        self.assertEqual(self._read(), "new")
+        self.assertEqual(os.listdir(self.dir), ["out"])
+
+    def test_failure_keeps_original(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write("old")
+        with self.assertRaises(RuntimeError):
+            with atomic_writer(self.path) as fh:
+                fh.write("partial")
+                raise RuntimeError("boom")
+        self.assertEqual(self._read(), "old")
+        self.assertEqual(os.listdir(self.dir), ["out"])
+
+    def test_binary_failure_keeps_original(self):
+        write_atomic(self.path, b"old")
+        with self.assertRaises(RuntimeError):
+            with atomic_writer(self.path, binary=True) as fh:
+                fh.write(b"partial")
+                raise RuntimeError("boom")
+        with open(self.path, "rb") as fh:
+            self.assertEqual(fh.read(), b"old")
+        self.assertEqual(os.listdir(self.dir), ["out"])
+
+
+class TestWriteAtomic(_AtomicTestCase):
+    def test_text_and_bytes(self):
+        write_atomic(self.path, "café\n")
+        with open(self.path, encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), "café\n")
+        write_atomic(self.path, b"\x00\xff")
+        with open(self.path, "rb") as fh:
+            self.assertEqual(fh.read(), b"\x00\xff")
+        self.assertEqual(os.listdir(self.dir), ["out"])
+
+    def test_missing_directory_raises(self):
+        with self.assertRaises(OSError):
+            write_atomic(os.path.join(self.dir, "missing", "out"), "x")
+
+
+if __name__ == "__main__":
+    unittest.main()
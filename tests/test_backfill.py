@@ -0,0 +1,211 @@
+"""
+Tests for globaltalk.backfill
+
+Covers:
+  - find_snapshots (files, directories)
+  - process_snapshot (timestamps, age gauge dropped, mtime fallback, errors,
+    malformed contents)
+  - backfill (ordering, skipped files, in-process and process-pool runs)
+  - write_csv / write_json / write_openmetrics
+  - main (end-to-end)
+"""
+
+import copy
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from globaltalk.backfill import (
+    backfill,
+    find_snapshots,
+    main,
+    process_snapshot,
+    write_csv,
+    write_json,
+    write_openmetrics,
+)
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_NO_TIMESTAMP
+
+# 2025-01-15T12:00:00Z
+_BASIC_TS = 1736942400.0
+
+
+def _snapshot_at(generated_at, extra_nodes=0):
+    data = copy.deepcopy(SNAPSHOT_BASIC)
+    data["generated_at"] = generated_at
+    for i in range(extra_nodes):
+        data["nodes"].append(
+            {
+                "object": f"mac{i}",
+                "type": "Workstation",
+                "address": f"7000.{i}",
+                "socket": "4",
+                "zone": "RetroZone",
+            }
+        )
+    return data
+
+
+class _ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def _write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            if isinstance(data, str):
+                fh.write(data)
+            else:
+                json.dump(data, fh)
+        return path
+
+    def _archive(self):
+        # Written out of order; results must come back by generated_at.
+        return [
+            self._write("b.json", _snapshot_at("2025-01-15T12:05:00+00:00", 2)),
+            self._write("a.json", _snapshot_at("2025-01-15T12:00:00+00:00")),
+        ]
+
+
+class TestFindSnapshots(_ArchiveTestCase):
+    def test_directory_expanded_to_json_files(self):
+        self._archive()
+        self._write("notes.txt", "ignore me")
+        found = find_snapshots([self.dir])
+        self.assertEqual([os.path.basename(p) for p in found], ["a.json", "b.json"])
+
+    def test_files_passed_through(self):
+        self.assertEqual(find_snapshots(["z.json", "y.json"]), ["y.json", "z.json"])
+
+
+class TestProcessSnapshot(_ArchiveTestCase):
+    def test_samples_stamped_with_generated_at(self):
+        path = self._write("a.json", SNAPSHOT_BASIC)
+        metrics, error = process_snapshot(path)
+        self.assertIsNone(error)
+        self.assertEqual(metrics.timestamp, _BASIC_TS)
+        for family in metrics.families:
+            for _, _, timestamp in family.samples:
+                self.assertEqual(timestamp, _BASIC_TS)
+
+    def test_age_gauge_dropped(self):
+        metrics, _ = process_snapshot(self._write("a.json", SNAPSHOT_BASIC))
+        names = [family.name for family in metrics.families]
+        self.assertNotIn("globaltalk_snapshot_age_seconds", names)
+        self.assertIn("globaltalk_total_nodes", names)
+
+    def test_mtime_used_without_generated_at(self):
+        path = self._write("a.json", SNAPSHOT_NO_TIMESTAMP)
+        os.utime(path, (1_700_000_000, 1_700_000_000))
+        metrics, _ = process_snapshot(path)
+        self.assertEqual(metrics.timestamp, 1_700_000_000)
+
+    def test_errors_returned_not_raised(self):
+        metrics, error = process_snapshot(self._write("bad.json", "{not json"))
+        self.assertIsNone(metrics)
+        self.assertIn("bad.json", error)
+
+    def test_malformed_contents_returned_not_raised(self):
+        for name, data in (
+            ("nodes.json", {"zones": ["A"], "nodes": [1]}),
+            ("zones.json", {"zones": 5, "nodes": []}),
+        ):
+            with self.subTest(name=name):
+                metrics, error = process_snapshot(self._write(name, data))
+                self.assertIsNone(metrics)
+                self.assertIn(name, error)
+
+
+class TestBackfill(_ArchiveTestCase):
+    def test_results_sorted_by_timestamp(self):
+        results = backfill(self._archive(), workers=1)
+        self.assertEqual(
+            [os.path.basename(r.path) for r in results], ["a.json", "b.json"]
+        )
+
+    def test_process_pool_matches_in_process(self):
+        paths = self._archive()
+        serial = backfill(paths, workers=1)
+        parallel = backfill(paths, workers=2)
+        out_serial, out_parallel = io.StringIO(), io.StringIO()
+        write_csv(serial, out_serial)
+        write_csv(parallel, out_parallel)
+        self.assertEqual(out_serial.getvalue(), out_parallel.getvalue())
+
+    def test_bad_files_skipped(self):
+        paths = self._archive() + [self._write("bad.json", "[]")]
+        with self.assertLogs("root", level="WARNING") as log:
+            results = backfill(paths, workers=1)
+        self.assertEqual(len(results), 2)
+        self.assertIn("bad.json", log.output[0])
+
+
+class TestWriters(_ArchiveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.results = backfill(self._archive(), workers=1)
+
+    def test_csv_rows(self):
+        out = io.StringIO()
+        write_csv(self.results, out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "timestamp,metric,labels,value")
+        self.assertIn("2025-01-15T12:00:00+00:00,globaltalk_total_nodes,,7", lines)
+        self.assertIn("2025-01-15T12:05:00+00:00,globaltalk_total_nodes,,9", lines)
+        self.assertIn(
+            '2025-01-15T12:00:00+00:00,globaltalk_zone_devices,"zone=""Doofnet""",6',
+            lines,
+        )
+
+    def test_json_records(self):
+        out = io.StringIO()
+        write_json(self.results, out)
+        records = json.loads(out.getvalue())
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[1]["series"]["globaltalk_total_nodes"], 9)
+        self.assertEqual(
+            records[0]["series"]['globaltalk_zone_devices{zone="Doofnet"}'], 6
+        )
+
+    def test_openmetrics_groups_families_and_series(self):
+        out = io.StringIO()
+        write_openmetrics(self.results, out)
+        text = out.getvalue()
+        self.assertTrue(text.endswith("# EOF\n"))
+        self.assertEqual(text.count("# TYPE globaltalk_total_nodes gauge"), 1)
+        lines = [
+            line
+            for line in text.splitlines()
+            if line.startswith("globaltalk_zone_devices{")
+        ]
+        self.assertEqual(
+            lines,
+            [
+                'globaltalk_zone_devices{zone="Doofnet"} 6 1736942400.0',
+                'globaltalk_zone_devices{zone="Doofnet"} 6 1736942700.0',
+                'globaltalk_zone_devices{zone="RetroZone"} 1 1736942400.0',
+                'globaltalk_zone_devices{zone="RetroZone"} 3 1736942700.0',
+            ],
+        )
+
+
+class TestBackfillMain(_ArchiveTestCase):
+    def test_directory_to_openmetrics_file(self):
+        self._archive()
+        output = os.path.join(self.dir, "out.om")
+        main([self.dir, "--format", "openmetrics", "--output", output, "--quiet"])
+        with open(output, encoding="utf-8") as fh:
+            self.assertIn("globaltalk_total_nodes 9 1736942700.0", fh.read())
+
+    def test_no_loadable_snapshots_exits(self):
+        path = self._write("bad.json", "[]")
+        with self.assertRaises(SystemExit):
+            main([path, "--workers", "1", "--quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+Tests for globaltalk.checkpoint
+
+Covers:
+  - read_journal (missing file, latest record wins, torn lines, stale records,
+                  records scraped with different types)
+  - ScrapeJournal (fresh start, resume, torn tail repair, remove)
+  - scrape with a journal (checkpointed zones skipped, new zones recorded,
+    failed lookups not recorded and scanned again on resume)
+  - scrape main (--checkpoint removed after success, --resume validation)
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from globaltalk.checkpoint import ScrapeJournal, read_journal
+from globaltalk.scrape import main, scrape
+
+_NODE_A = {
+    "object": "nas-afp",
+    "type": "AFPServer",
+    "address": "5311.212",
+    "socket": "128",
+    "zone": "A",
+}
+_NODE_B = {
+    "object": "retro-mac",
+    "type": "Workstation",
+    "address": "7000.1",
+    "socket": "4",
+    "zone": "B",
+}
+
+
+def _record(zone, nodes, completed_at=None, types=None):
+    if completed_at is None:
+        completed_at = time.time()
+    return json.dumps(
+        {"zone": zone, "completed_at": completed_at, "types": types, "nodes": nodes}
+    )
+
+
+class _JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, "scrape.journal")
+
+    def _write(self, *lines, tail="\n"):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + tail)
+
+
+class TestReadJournal(_JournalTestCase):
+    def test_missing_file_is_empty(self):
+        self.assertEqual(read_journal(self.path), {})
+
+    def test_latest_record_per_zone_wins(self):
+        self._write(_record("A", []), _record("B", [_NODE_B]), _record("A", [_NODE_A]))
+        self.assertEqual(read_journal(self.path), {"A": [_NODE_A], "B": [_NODE_B]})
+
+    def test_torn_record_ignored(self):
+        torn = _record("B", [_NODE_B])[:20]
+        self._write(_record("A", [_NODE_A]), torn, tail="")
+        with self.assertLogs("root", level="WARNING") as log:
+            completed = read_journal(self.path)
+        self.assertEqual(completed, {"A": [_NODE_A]})
+        self.assertIn("line 2", log.output[0])
+
+    def test_stale_records_ignored(self):
+        self._write(_record("A", [_NODE_A], 1000.0), _record("B", [_NODE_B], 1900.0))
+        self.assertEqual(read_journal(self.path, 600, now=2000.0), {"B": [_NODE_B]})
+        self.assertEqual(len(read_journal(self.path, None, now=2000.0)), 2)
+
+    def test_records_with_other_types_ignored(self):
+        self._write(
+            _record("A", [_NODE_A]),
+            _record("B", [_NODE_B], types=["Workstation"]),
+        )
+        self.assertEqual(read_journal(self.path), {"A": [_NODE_A]})
+        self.assertEqual(
+            read_journal(self.path, types=["Workstation"]), {"B": [_NODE_B]}
+        )
+
+
+class TestScrapeJournal(_JournalTestCase):
+    def test_records_are_readable_lines(self):
+        with ScrapeJournal(self.path) as journal:
+            journal.record("A", [_NODE_A])
+            journal.record("B", [])
+        self.assertEqual(read_journal(self.path), {"A": [_NODE_A], "B": []})
+
+    def test_fresh_start_truncates(self):
+        self._write(_record("A", [_NODE_A]))
+        with self.assertLogs("root", level="WARNING"):
+            journal = ScrapeJournal(self.path)
+        with journal:
+            self.assertEqual(journal.completed, {})
+        self.assertEqual(read_journal(self.path), {})
+
+    def test_resume_appends_after_torn_tail(self):
+        self._write(_record("A", [_NODE_A]), '{"zone": "B", "comp', tail="")
+        with self.assertLogs("root", level="WARNING"):
+            journal = ScrapeJournal(self.path, resume=True)
+        with journal:
+            self.assertEqual(journal.completed, {"A": [_NODE_A]})
+            journal.record("B", [_NODE_B])
+        with self.assertLogs("root", level="WARNING"):
+            completed = read_journal(self.path)
+        self.assertEqual(completed, {"A": [_NODE_A], "B": [_NODE_B]})
+
+    def test_remove_deletes_file(self):
+        journal = ScrapeJournal(self.path)
+        journal.record("A", [])
+        journal.remove()
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestScrapeWithJournal(_JournalTestCase):
+    def _scrape(self, journal, lookup):
+        with patch("globaltalk.scrape.shutil.which", return_value="/usr/bin/x"):
+            with patch("globaltalk.scrape.getzones", return_value=["A", "B"]):
+                with patch("globaltalk.scrape.nbplkup", side_effect=lookup) as mock:
+                    result = scrape(workers=2, journal=journal)
+        return result, [call.args[0] for call in mock.call_args_list]
+
+    def test_checkpointed_zones_skipped(self):
+        self._write(_record("A", [_NODE_A]))
+        with ScrapeJournal(self.path, resume=True) as journal:
+            result, looked_up = self._scrape(
+                journal, lambda zone, nbp_type=None: [_NODE_B]
+            )
+        self.assertEqual(looked_up, ["B"])
+        self.assertEqual(result["nodes"], [_NODE_A, _NODE_B])
+        self.assertEqual(read_journal(self.path), {"A": [_NODE_A], "B": [_NODE_B]})
+
+    def test_journal_types_must_match(self):
+        with ScrapeJournal(self.path, types=["AFPServer"]) as journal:
+            with self.assertRaises(RuntimeError):
+                self._scrape(journal, lambda zone, nbp_type=None: [])
+
+    def test_every_zone_recorded(self):
+        nodes = {"A": [_NODE_A], "B": []}
+        with ScrapeJournal(self.path) as journal:
+            _, looked_up = self._scrape(journal, nodes.get)
+        self.assertEqual(sorted(looked_up), ["A", "B"])
+        self.assertEqual(read_journal(self.path), nodes)
+
+    def test_failed_lookup_scanned_again_on_resume(self):
+        nodes = {"A": [_NODE_A], "B": None}
+        with ScrapeJournal(self.path) as journal:
+            with self.assertLogs("root", level="WARNING"):
+                result, _ = self._scrape(journal, nodes.get)
+        self.assertEqual(result["nodes"], [_NODE_A])
+        self.assertEqual(read_journal(self.path), {"A": [_NODE_A]})
+
+        with ScrapeJournal(self.path, resume=True) as journal:
+            result, looked_up = self._scrape(
+                journal, lambda zone, nbp_type=None: [_NODE_B]
+            )
+        self.assertEqual(looked_up, ["B"])
+        self.assertEqual(result["nodes"], [_NODE_A, _NODE_B])
+
+
+class TestScrapeMainCheckpoint(_JournalTestCase):
+    def test_journal_removed_after_snapshot_written(self):
+        output = os.path.join(self.dir, "scrape.json")
+        with patch("globaltalk.scrape.shutil.which", return_value="/usr/bin/x"):
+            with patch("globaltalk.scrape.getzones", return_value=["A"]):
+                with patch("globaltalk.scrape.nbplkup", return_value=[_NODE_A]):
+                    main(["--output", output, "--checkpoint", self.path, "--quiet"])
+        with open(output, encoding="utf-8") as fh:
+            self.assertEqual(json.load(fh)["nodes"], [_NODE_A])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_journal_kept_when_scrape_fails(self):
+        with patch("globaltalk.scrape.shutil.which", return_value=None):
+            with self.assertRaises(SystemExit):
+                main(["--checkpoint", self.path, "--quiet"])
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_resume_requires_checkpoint(self):
+        with self.assertRaises(SystemExit):
+            main(["--resume", "--quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+Tests for globaltalk.churn
+
+Covers:
+  - Fingerprint (sorted unique digests, order-independent zone hashes taken
+    from snapshot.zone_hash or the stored zone_hashes)
+  - sidecar save/load round trip and corrupt files
+  - merge_counts / compute_churn
+  - compare_state / save_state (first run, subsequent run, unreadable state)
+  - metrics --churn-state (gauges emitted from the second run, streamed and
+    loaded snapshots agree, canonical and plain snapshots agree, nodes with
+    missing fields, state kept when the metrics are not delivered)
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from array import array
+from unittest.mock import patch
+
+from globaltalk.churn import (
+    Churn,
+    Fingerprint,
+    compare_state,
+    compute_churn,
+    merge_counts,
+    save_state,
+)
+from globaltalk.metrics import main
+from globaltalk.scrape import canonicalise
+from globaltalk.snapshot import Snapshot
+from tests.fixtures import SNAPSHOT_BASIC, snapshot_changed
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_digests_sorted_and_unique(self):
+        nodes = SNAPSHOT_BASIC["nodes"]
+        fingerprint = Fingerprint.from_nodes(nodes + nodes)
+        self.assertEqual(list(fingerprint.digests), sorted(set(fingerprint.digests)))
+        self.assertEqual(len(fingerprint.digests), len(nodes))
+        self.assertEqual(set(fingerprint.zone_hashes), {"Doofnet", "RetroZone"})
+
+    def test_zone_hash_ignores_order(self):
+        nodes = SNAPSHOT_BASIC["nodes"]
+        self.assertEqual(
+            Fingerprint.from_nodes(nodes).zone_hashes,
+            Fingerprint.from_nodes(list(reversed(nodes))).zone_hashes,
+        )
+
+    def test_zone_values_from_snapshot_zone_hash(self):
+        nodes = SNAPSHOT_BASIC["nodes"]
+        hashes = Snapshot(SNAPSHOT_BASIC).zone_hashes
+        fingerprint = Fingerprint.from_nodes(nodes)
+        self.assertEqual(
+            fingerprint.zone_hashes, {z: int(h[:16], 16) for z, h in hashes.items()}
+        )
+
+    def test_stored_zone_hashes_used(self):
+        stored = {"Doofnet": "f" * 32, "RetroZone": "not hex"}
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"], stored)
+        computed = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        self.assertEqual(fingerprint.zone_hashes["Doofnet"], 2**64 - 1)
+        # Unusable stored hashes fall back to the computed ones.
+        self.assertEqual(
+            fingerprint.zone_hashes["RetroZone"], computed.zone_hashes["RetroZone"]
+        )
+
+    def test_save_load_round_trip(self):
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "state")
+            fingerprint.save(path)
+            loaded = Fingerprint.load(path)
+            self.assertEqual(os.listdir(d), ["state"])
+        self.assertEqual(loaded.digests, fingerprint.digests)
+        self.assertEqual(loaded.zone_hashes, fingerprint.zone_hashes)
+
+    def test_load_rejects_invalid_files(self):
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "state")
+            fingerprint.save(path)
+            with open(path, "rb") as fh:
+                data = fh.read()
+            for content in (b"", b"nope" + data[4:], data[:30], data[:-3]):
+                with open(path, "wb") as fh:
+                    fh.write(content)
+                with self.subTest(size=len(content)):
+                    with self.assertRaises(ValueError):
+                        Fingerprint.load(path)
+
+
+class TestChurn(unittest.TestCase):
+    def test_merge_counts(self):
+        old = array("Q", [1, 3, 5, 7])
+        new = array("Q", [2, 3, 7, 8, 9])
+        self.assertEqual(merge_counts(old, new), (3, 2))
+        self.assertEqual(merge_counts(array("Q"), new), (5, 0))
+
+    def test_compute_churn(self):
+        old = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        self.assertEqual(compute_churn(old, old), Churn(0, 0, 0))
+
+        new = Fingerprint.from_nodes(snapshot_changed()["nodes"])
+        self.assertEqual(compute_churn(old, new), Churn(1, 1, 1))
+
+        # A zone disappearing counts as a changed zone.
+        doofnet = [n for n in SNAPSHOT_BASIC["nodes"] if n["zone"] == "Doofnet"]
+        self.assertEqual(
+            compute_churn(old, Fingerprint.from_nodes(doofnet)), Churn(0, 1, 1)
+        )
+
+
+class TestState(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "state")
+
+    def test_first_then_next_run(self):
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        with self.assertLogs("root", level="INFO"):
+            self.assertIsNone(compare_state(self.path, fingerprint))
+        self.assertFalse(os.path.exists(self.path))
+        save_state(self.path, fingerprint)
+        churn = compare_state(
+            self.path, Fingerprint.from_nodes(snapshot_changed()["nodes"])
+        )
+        self.assertEqual(churn, Churn(1, 1, 1))
+
+    def test_unreadable_state_replaced(self):
+        with open(self.path, "wb") as fh:
+            fh.write(b"garbage")
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        with self.assertLogs("root", level="WARNING"):
+            self.assertIsNone(compare_state(self.path, fingerprint))
+        save_state(self.path, fingerprint)
+        self.assertEqual(Fingerprint.load(self.path).digests, fingerprint.digests)
+
+    def test_save_failure_logged(self):
+        fingerprint = Fingerprint.from_nodes(SNAPSHOT_BASIC["nodes"])
+        with self.assertLogs("root", level="ERROR"):
+            save_state(os.path.join(self.path, "missing", "state"), fingerprint)
+
+
+class TestMetricsChurnState(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.snapshot = os.path.join(self.dir, "snapshot.json")
+        self.state = os.path.join(self.dir, "churn.state")
+
+    def _run(self, data, *extra):
+        with open(self.snapshot, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            main([self.snapshot, "--churn-state", self.state, "--quiet", *extra])
+        return stdout.getvalue()
+
+    def test_gauges_from_second_run(self):
+        first = self._run(SNAPSHOT_BASIC)
+        self.assertNotIn("globaltalk_nodes_added", first)
+        self.assertTrue(os.path.exists(self.state))
+
+        second = self._run(snapshot_changed())
+        self.assertIn("globaltalk_nodes_added 1\n", second)
+        self.assertIn("globaltalk_nodes_removed 1\n", second)
+        self.assertIn("globaltalk_zones_changed 1\n", second)
+
+    def test_streamed_snapshot(self):
+        self._run(SNAPSHOT_BASIC, "--stream-threshold", "0")
+        output = self._run(snapshot_changed(), "--stream-threshold", "0")
+        self.assertIn("globaltalk_nodes_added 1\n", output)
+        self.assertIn("globaltalk_zones_changed 1\n", output)
+
+    def test_canonical_and_plain_snapshots_agree(self):
+        for threshold in ("0", "1000000"):
+            with self.subTest(threshold=threshold):
+                self._run(SNAPSHOT_BASIC, "--stream-threshold", threshold)
+                output = self._run(
+                    canonicalise(SNAPSHOT_BASIC), "--stream-threshold", threshold
+                )
+                self.assertIn("globaltalk_zones_changed 0\n", output)
+
+    def test_nodes_with_missing_fields(self):
+        node = {"zone": "A", "type": "T", "object": "x", "address": "1.2"}
+        partial = {"zones": ["A"], "nodes": [node]}
+        self._run(partial)
+        self.assertIn("globaltalk_nodes_added 0\n", self._run(partial))
+
+    def test_failed_push_keeps_state(self):
+        self._run(SNAPSHOT_BASIC)
+        with patch("globaltalk.metrics._push_metrics", return_value=False):
+            with self.assertRaises(SystemExit):
+                self._run(snapshot_changed(), "--push-url", "http://localhost:9091")
+        self.assertIn("globaltalk_nodes_added 1\n", self._run(snapshot_changed()))
+
+    def test_failed_write_keeps_state(self):
+        self._run(SNAPSHOT_BASIC)
+        output = os.path.join(self.dir, "metrics.prom")
+        with patch("globaltalk.metrics.generate_metrics", side_effect=OSError("full")):
+            with self.assertRaises(OSError):
+                self._run(snapshot_changed(), "--output", output)
+        self.assertIn("globaltalk_nodes_added 1\n", self._run(snapshot_changed()))
+
+
+if __name__ == "__main__":
+    unittest.main()
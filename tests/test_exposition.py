@@ -0,0 +1,102 @@
+"""
+Tests for globaltalk.exposition
+
+Covers:
+  - MetricFamily (sample storage, cached label sets)
+  - render (text format, OpenMetrics, timestamps, value formatting, escaping)
+"""
+
+import unittest
+
+from globaltalk.exposition import MetricFamily, _label_set, render
+
+
+def _family(name="gt_devices", help_text="Number of devices"):
+    return MetricFamily(name, "gauge", help_text)
+
+
+class TestMetricFamily(unittest.TestCase):
+    def test_add_without_labels(self):
+        family = _family()
+        family.add(3)
+        self.assertEqual(family.samples, [("", 3, None)])
+
+    def test_add_renders_labels_in_order(self):
+        family = _family()
+        family.add(1, zone="Doofnet", type="AFPServer")
+        self.assertEqual(family.samples[0][0], '{zone="Doofnet",type="AFPServer"}')
+
+    def test_label_sets_are_cached(self):
+        _label_set.cache_clear()
+        a, b = _family(), _family("gt_other")
+        a.add(1, zone="Doofnet")
+        b.add(2, zone="Doofnet")
+        self.assertEqual(_label_set.cache_info().hits, 1)
+        self.assertIs(a.samples[0][0], b.samples[0][0])
+
+    def test_label_values_escaped(self):
+        family = _family()
+        family.add(1, zone='a\\b"c\nd')
+        self.assertEqual(family.samples[0][0], '{zone="a\\\\b\\"c\\nd"}')
+
+
+class TestRenderText(unittest.TestCase):
+    def test_help_and_type_lines(self):
+        out = render([_family()])
+        self.assertEqual(
+            out, "# HELP gt_devices Number of devices\n# TYPE gt_devices gauge\n"
+        )
+
+    def test_samples_follow_metadata(self):
+        family = _family()
+        family.add(2, zone="A")
+        family.add(5, zone="B")
+        lines = render([family]).splitlines()
+        self.assertEqual(
+            lines[2:], ['gt_devices{zone="A"} 2', 'gt_devices{zone="B"} 5']
+        )
+
+    def test_no_eof_marker(self):
+        self.assertNotIn("# EOF", render([_family()]))
+
+    def test_timestamp_in_milliseconds(self):
+        family = _family()
+        family.add(1, timestamp=1736942400.5)
+        self.assertIn("gt_devices 1 1736942400500\n", render([family]))
+
+    def test_float_values(self):
+        family = _family()
+        family.add(12.345)
+        family.add(float("inf"))
+        family.add(float("nan"))
+        out = render([family])
+        self.assertIn("gt_devices 12.345\n", out)
+        self.assertIn("gt_devices +Inf\n", out)
+        self.assertIn("gt_devices NaN\n", out)
+
+    def test_help_text_escaped(self):
+        out = render([_family(help_text="line1\nback\\slash")])
+        self.assertIn("# HELP gt_devices line1\\nback\\\\slash\n", out)
+
+    def test_empty_family_list(self):
+        self.assertEqual(render([]), "")
+
+
+class TestRenderOpenMetrics(unittest.TestCase):
+    def test_ends_with_eof(self):
+        family = _family()
+        family.add(1)
+        self.assertTrue(render([family], openmetrics=True).endswith("# EOF\n"))
+
+    def test_empty_exposition_is_just_eof(self):
+        self.assertEqual(render([], openmetrics=True), "# EOF\n")
+
+    def test_timestamp_in_seconds(self):
+        family = _family()
+        family.add(1, timestamp=1736942400.0, zone="A")
+        out = render([family], openmetrics=True)
+        self.assertIn('gt_devices{zone="A"} 1 1736942400.0\n', out)
+
+
+if __name__ == "__main__":
+    unittest.main()
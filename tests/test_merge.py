@@ -0,0 +1,246 @@
+"""
+Tests for globaltalk.merge
+
+Covers:
+  - read_nodes (NDJSON detection, v1 detection and sorting, zone collection,
+                out-of-order and malformed NDJSON, empty files)
+  - merge_nodes (k-way ordering, cross-source deduplication, empty inputs)
+  - write_ndjson / write_v1 (round trip, zones field, empty output)
+  - main (end-to-end merge of mixed inputs)
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from globaltalk.merge import main, merge_nodes, read_nodes, write_ndjson, write_v1
+from globaltalk.scrape import node_key
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_MULTI_JROUTER
+
+
+def _node(address, socket="4", typ="Workstation", obj="mac", zone="TestZone"):
+    return {
+        "object": obj,
+        "type": typ,
+        "address": address,
+        "socket": socket,
+        "zone": zone,
+    }
+
+
+def _write_ndjson(path, nodes):
+    with open(path, "w", encoding="utf-8") as fh:
+        for node in nodes:
+            fh.write(json.dumps(node) + "\n")
+    return path
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# read_nodes
+# ---------------------------------------------------------------------------
+
+
+class TestReadNodes(unittest.TestCase):
+    def test_ndjson_input_read_in_order(self):
+        nodes = [_node("1.1"), _node("1.2"), _node("2.1")]
+        with tempfile.TemporaryDirectory() as d:
+            path = _write_ndjson(os.path.join(d, "a.ndjson"), nodes)
+            result = list(read_nodes(path))
+        self.assertEqual(result, nodes)
+
+    def test_ndjson_blank_lines_skipped(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "a.ndjson")
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write("\n" + json.dumps(_node("1.1")) + "\n\n")
+                fh.write(json.dumps(_node("1.2")) + "\n")
+            result = list(read_nodes(path))
+        self.assertEqual([n["address"] for n in result], ["1.1", "1.2"])
+
+    def test_v1_snapshot_sorted_by_key(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = _write_json(os.path.join(d, "snap.json"), SNAPSHOT_BASIC)
+            result = list(read_nodes(path))
+        keys = [node_key(n) for n in result]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(result), len(SNAPSHOT_BASIC["nodes"]))
+
+    def test_compact_v1_snapshot_detected(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            result = list(read_nodes(path))
+        self.assertEqual(len(result), len(SNAPSHOT_BASIC["nodes"]))
+
+    def test_v1_zones_collected(self):
+        zones = set()
+        with tempfile.TemporaryDirectory() as d:
+            path = _write_json(os.path.join(d, "snap.json"), SNAPSHOT_BASIC)
+            list(read_nodes(path, zones))
+        self.assertEqual(zones, set(SNAPSHOT_BASIC["zones"]))
+
+    def test_out_of_order_ndjson_raises_value_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = _write_ndjson(
+                os.path.join(d, "a.ndjson"), [_node("2.1"), _node("1.1")]
+            )
+            with self.assertRaises(ValueError) as ctx:
+                list(read_nodes(path))
+        self.assertIn("out of order", str(ctx.exception))
+
+    def test_invalid_ndjson_record_raises_value_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "a.ndjson")
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(json.dumps(_node("1.1")) + "\n")
+                fh.write('{"address": "1.2"}\n')
+            with self.assertRaises(ValueError) as ctx:
+                list(read_nodes(path))
+        self.assertIn("line 2", str(ctx.exception))
+
+    def test_empty_file_has_no_nodes(self):
+        with tempfile.TemporaryDirectory() as d:
+            for content in ("", "\n  \n"):
+                with self.subTest(content=content):
+                    path = os.path.join(d, "a.ndjson")
+                    with open(path, "w", encoding="utf-8") as fh:
+                        fh.write(content)
+                    self.assertEqual(list(read_nodes(path)), [])
+
+    def test_missing_file_raises_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            list(read_nodes("/nonexistent/path/a.ndjson"))
+
+
+# ---------------------------------------------------------------------------
+# merge_nodes
+# ---------------------------------------------------------------------------
+
+
+class TestMergeNodes(unittest.TestCase):
+    def test_sources_interleaved_in_key_order(self):
+        a = [_node("1.1"), _node("1.3")]
+        b = [_node("1.2"), _node("1.4")]
+        result = list(merge_nodes([a, b]))
+        self.assertEqual([n["address"] for n in result], ["1.1", "1.2", "1.3", "1.4"])
+
+    def test_duplicates_across_sources_removed(self):
+        a = [_node("1.1", zone="A"), _node("1.2")]
+        b = [_node("1.1", zone="B"), _node("1.3")]
+        result = list(merge_nodes([a, b]))
+        self.assertEqual([n["address"] for n in result], ["1.1", "1.2", "1.3"])
+
+    def test_first_source_wins_on_duplicate(self):
+        a = [_node("1.1", zone="A")]
+        b = [_node("1.1", zone="B")]
+        result = list(merge_nodes([a, b]))
+        self.assertEqual(result[0]["zone"], "A")
+
+    def test_duplicates_logged(self):
+        node = _node("1.1")
+        with self.assertLogs("root", level="INFO") as log:
+            list(merge_nodes([[node], [dict(node)]]))
+        self.assertTrue(any("1 duplicate" in msg for msg in log.output))
+
+    def test_empty_sources(self):
+        self.assertEqual(list(merge_nodes([[], []])), [])
+
+    def test_is_lazy(self):
+        def _source():
+            yield _node("1.1")
+            raise AssertionError("source consumed past the first record")
+
+        merged = merge_nodes([_source()])
+        self.assertEqual(next(merged)["address"], "1.1")
+
+
+# ---------------------------------------------------------------------------
+# write_ndjson / write_v1
+# ---------------------------------------------------------------------------
+
+
+class TestWriters(unittest.TestCase):
+    def test_write_ndjson_one_record_per_line(self):
+        buf = io.StringIO()
+        count = write_ndjson([_node("1.1"), _node("1.2")], buf)
+        lines = buf.getvalue().splitlines()
+        self.assertEqual(count, 2)
+        self.assertEqual(json.loads(lines[1])["address"], "1.2")
+
+    def test_write_v1_is_valid_snapshot(self):
+        buf = io.StringIO()
+        count = write_v1([_node("1.1", zone="B"), _node("1.2", zone="A")], buf)
+        data = json.loads(buf.getvalue())
+        self.assertEqual(count, 2)
+        self.assertEqual(data["format"], "v1")
+        self.assertIn("generated_at", data)
+        self.assertEqual(len(data["nodes"]), 2)
+        self.assertEqual(data["zones"], ["A", "B"])
+
+    def test_write_v1_includes_extra_zones(self):
+        buf = io.StringIO()
+        write_v1([_node("1.1", zone="A")], buf, zones={"Empty"})
+        self.assertEqual(json.loads(buf.getvalue())["zones"], ["A", "Empty"])
+
+    def test_write_v1_empty(self):
+        buf = io.StringIO()
+        self.assertEqual(write_v1([], buf), 0)
+        data = json.loads(buf.getvalue())
+        self.assertEqual(data["nodes"], [])
+        self.assertEqual(data["zones"], [])
+
+
+# ---------------------------------------------------------------------------
+# main
+# ---------------------------------------------------------------------------
+
+
+class TestMain(unittest.TestCase):
+    def test_merges_v1_and_ndjson_inputs(self):
+        extra = sorted(
+            [
+                _node(
+                    "1.1",
+                    zone="ZoneA",
+                    typ="AppleRouter",
+                    obj="jrouter v0.0.12",
+                    socket="253",
+                ),
+                _node("9.9", zone="NewZone"),
+            ],
+            key=node_key,
+        )
+        with tempfile.TemporaryDirectory() as d:
+            snap = _write_json(os.path.join(d, "snap.json"), SNAPSHOT_MULTI_JROUTER)
+            shard = _write_ndjson(os.path.join(d, "shard.ndjson"), extra)
+            out = os.path.join(d, "out.json")
+            main([snap, shard, "--output", out, "--quiet"])
+            with open(out, encoding="utf-8") as fh:
+                data = json.load(fh)
+
+        # 1.1 is already in the snapshot, so only 9.9 is new.
+        self.assertEqual(len(data["nodes"]), len(SNAPSHOT_MULTI_JROUTER["nodes"]) + 1)
+        self.assertEqual(data["zones"], ["NewZone", "ZoneA", "ZoneB"])
+
+    def test_out_of_order_input_exits_non_zero(self):
+        with tempfile.TemporaryDirectory() as d:
+            shard = _write_ndjson(
+                os.path.join(d, "a.ndjson"), [_node("2.1"), _node("1.1")]
+            )
+            out = os.path.join(d, "out.ndjson")
+            with self.assertRaises(SystemExit) as ctx:
+                main([shard, "--output", out, "--format", "ndjson", "--quiet"])
+        self.assertEqual(ctx.exception.code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,11 @@ Covers:
   - escape_label_value
   - load_data (valid, invalid, missing fields, unknown format version)
   - _snapshot_age_seconds
-  - generate_metrics (all metric families, prefix, empty snapshot)
+  - generate_metrics (all metric families, prefix, empty snapshot,
+                      OpenMetrics, timestamps, single buffered write)
+  - zone_type_devices (opt-in, top-K zones, "other" bucket, allow/deny lists)
+  - network_devices / network_range_devices (opt-in, --network-range)
+  - main (live scrape options ignored with a snapshot file)
   - _write_metrics_output (atomic write, stdout passthrough, cleanup on error)
 """
 
@@ -18,11 +22,15 @@ from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 from globaltalk.metrics import (
+    ZONE_TYPE_OTHER,
+    NetworkBreakdown,
+    ZoneTypeLimits,
     _snapshot_age_seconds,
     _write_metrics_output,
     escape_label_value,
     generate_metrics,
     load_data,
+    main,
 )
 from tests.fixtures import (
     SNAPSHOT_BASIC,
@@ -387,6 +395,125 @@ class TestGenerateMetricsLabelEscaping(unittest.TestCase):
         self.assertIn('zone="Zone\\nA"', out)
 
 
+class TestGenerateMetricsFormats(unittest.TestCase):
+    """Verify OpenMetrics output, timestamps and buffered writing."""
+
+    def test_text_format_has_no_eof(self):
+        self.assertNotIn("# EOF", _metrics(SNAPSHOT_BASIC))
+
+    def test_openmetrics_ends_with_eof(self):
+        buf = io.StringIO()
+        generate_metrics(SNAPSHOT_BASIC, buf, openmetrics=True)
+        self.assertTrue(buf.getvalue().endswith("# EOF\n"))
+
+    def test_openmetrics_same_samples_as_text(self):
+        buf = io.StringIO()
+        generate_metrics(SNAPSHOT_NO_TIMESTAMP, buf, openmetrics=True)
+        self.assertEqual(
+            buf.getvalue(), _metrics(SNAPSHOT_NO_TIMESTAMP) + "# EOF\n"
+        )
+
+    def test_timestamps_use_generated_at(self):
+        buf = io.StringIO()
+        generate_metrics(SNAPSHOT_BASIC, buf, timestamps=True)
+        # 2025-01-15T12:00:00+00:00 in milliseconds
+        self.assertIn("globaltalk_zones 2 1736942400000\n", buf.getvalue())
+
+    def test_openmetrics_timestamps_in_seconds(self):
+        buf = io.StringIO()
+        generate_metrics(SNAPSHOT_BASIC, buf, openmetrics=True, timestamps=True)
+        self.assertIn("globaltalk_zones 2 1736942400.0\n", buf.getvalue())
+
+    def test_timestamps_omitted_without_generated_at(self):
+        buf = io.StringIO()
+        generate_metrics(SNAPSHOT_NO_TIMESTAMP, buf, timestamps=True)
+        self.assertIn("globaltalk_zones 1\n", buf.getvalue())
+
+    def test_output_written_in_one_call(self):
+        buf = io.StringIO()
+        with patch.object(buf, "write", wraps=buf.write) as write:
+            generate_metrics(SNAPSHOT_BASIC, buf)
+        self.assertEqual(write.call_count, 1)
+
+
+class TestZoneTypeDevices(unittest.TestCase):
+    """Verify the cardinality-limited zone × type breakdown."""
+
+    def _zone_types(self, data, **limits) -> str:
+        buf = io.StringIO()
+        generate_metrics(data, buf, zone_types=ZoneTypeLimits(**limits))
+        return buf.getvalue()
+
+    def _three_zones(self) -> dict:
+        def _n(zone, typ, address):
+            return {
+                "object": "dev",
+                "type": typ,
+                "address": address,
+                "socket": "4",
+                "zone": zone,
+            }
+
+        return {
+            "format": "v1",
+            "zones": ["Big", "Medium", "Small"],
+            "nodes": [
+                _n("Big", "AFPServer", "1.1"),
+                _n("Big", "AFPServer", "1.2"),
+                _n("Big", "Workstation", "1.3"),
+                _n("Medium", "AFPServer", "2.1"),
+                _n("Medium", "LaserWriter", "2.2"),
+                _n("Small", "AFPServer", "3.1"),
+            ],
+        }
+
+    def test_absent_by_default(self):
+        self.assertNotIn("zone_type_devices", _metrics(SNAPSHOT_BASIC))
+
+    def test_cross_product_counts(self):
+        out = self._zone_types(SNAPSHOT_BASIC, top_k=None)
+        self.assertIn('globaltalk_zone_type_devices{zone="Doofnet",type="AFPServer"} 1', out)
+        self.assertIn(
+            'globaltalk_zone_type_devices{zone="RetroZone",type="Workstation"} 1', out
+        )
+
+    def test_top_k_groups_small_zones_as_other(self):
+        out = self._zone_types(self._three_zones(), top_k=1)
+        self.assertIn('zone_type_devices{zone="Big",type="AFPServer"} 2', out)
+        self.assertIn(
+            f'zone_type_devices{{zone="{ZONE_TYPE_OTHER}",type="AFPServer"}} 2', out
+        )
+        self.assertIn(
+            f'zone_type_devices{{zone="{ZONE_TYPE_OTHER}",type="LaserWriter"}} 1', out
+        )
+        self.assertNotIn('zone="Medium"', out.split("zone_type_devices")[-1])
+
+    def test_top_k_zero_groups_every_zone(self):
+        out = self._zone_types(self._three_zones(), top_k=0)
+        self.assertIn(
+            f'zone_type_devices{{zone="{ZONE_TYPE_OTHER}",type="AFPServer"}} 4', out
+        )
+
+    def test_include_list(self):
+        out = self._zone_types(self._three_zones(), include=["LaserWriter"])
+        lines = [ln for ln in out.splitlines() if ln.startswith("globaltalk_zone_type")]
+        self.assertEqual(
+            lines,
+            ['globaltalk_zone_type_devices{zone="Medium",type="LaserWriter"} 1'],
+        )
+
+    def test_exclude_list(self):
+        out = self._zone_types(self._three_zones(), exclude=["AFPServer"])
+        self.assertNotIn('type="AFPServer"} ', out.split("# TYPE globaltalk_zone_type")[1])
+
+    def test_series_count_bounded(self):
+        out = self._zone_types(self._three_zones(), top_k=2)
+        series = [ln for ln in out.splitlines() if ln.startswith("globaltalk_zone_type")]
+        # 2 kept zones + "other", across at most 3 types
+        self.assertLessEqual(len(series), 9)
+        self.assertEqual(sum(int(ln.rsplit(" ", 1)[1]) for ln in series), 6)
+
+
 # ---------------------------------------------------------------------------
 # _write_metrics_output — atomic writes
 # ---------------------------------------------------------------------------
@@ -447,5 +574,56 @@ class TestWriteMetricsOutput(unittest.TestCase):
         self.assertNotIn("globaltalk_zones", content)
 
 
+class TestNetworkDevices(unittest.TestCase):
+    """Verify the opt-in per-network device families."""
+
+    def _metrics(self, data, networks=None) -> str:
+        buf = io.StringIO()
+        generate_metrics(data, buf, networks=networks)
+        return buf.getvalue()
+
+    def test_off_by_default(self):
+        self.assertNotIn("network_devices", self._metrics(SNAPSHOT_BASIC))
+
+    def test_per_network(self):
+        output = self._metrics(SNAPSHOT_BASIC, NetworkBreakdown())
+        self.assertIn('globaltalk_network_devices{network="5311"} 3\n', output)
+        self.assertIn('globaltalk_network_devices{network="6100"} 1\n', output)
+        self.assertNotIn("network_range_devices", output)
+
+    def test_ranges(self):
+        output = self._metrics(
+            SNAPSHOT_BASIC,
+            NetworkBreakdown(per_network=False, ranges=[(5000, 5999), (7000, 7000)]),
+        )
+        self.assertIn('globaltalk_network_range_devices{range="5000-5999"} 3\n', output)
+        self.assertIn('globaltalk_network_range_devices{range="7000-7000"} 0\n', output)
+        self.assertNotIn("globaltalk_network_devices", output)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snapshot.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                main([path, "--network-range", "6000-6999", "--quiet"])
+            with patch("sys.stderr", io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    main([path, "--network-range", "9-1", "--quiet"])
+        self.assertIn('range="6000-6999"} 1\n', stdout.getvalue())
+
+
+class TestMainLiveOptions(unittest.TestCase):
+    def test_scrape_options_with_file_warn(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snapshot.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            with patch("sys.stdout", new_callable=io.StringIO):
+                with self.assertLogs("root", level="WARNING") as log:
+                    main([path, "--type", "AFPServer", "--quiet"])
+        self.assertIn("--type", log.output[0])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,6 +8,9 @@ Covers:
   - _merge_yaml_peers (existing peers block, no peers block, peers at EOF,
                        blank separator handling)
   - build_nodelist (output to file, merge, stdout path, error paths)
+  - _parse_peers_yaml / peers_equal / dedupe_peers
+  - update_nodelist (change-only rewrites, unordered comparison, dedupe,
+                     atomic replace) and the --exit-code CLI status
 """
 
 import os
@@ -16,11 +19,17 @@ import unittest
 from unittest.mock import patch
 
 from globaltalk.nodelist import (
+    EXIT_UNCHANGED,
     _dump_peers_yaml,
     _merge_yaml_peers,
+    _parse_peers_yaml,
     build_nodelist,
+    dedupe_peers,
+    main,
     parse_input,
+    peers_equal,
     resolve_address,
+    update_nodelist,
 )
 from tests.fixtures import (
     JROUTER_YAML_PEERS_AT_EOF,
@@ -418,5 +427,141 @@ class TestBuildNodelist(unittest.TestCase):
         self.assertEqual(result, ["127.0.0.1"])
 
 
+# ---------------------------------------------------------------------------
+# Change-only rewrites
+# ---------------------------------------------------------------------------
+
+
+def _resolve_ip_only(addr):
+    import socket as _socket
+
+    try:
+        _socket.inet_aton(addr)
+        return addr
+    except OSError:
+        return None
+
+
+class TestParsePeersYaml(unittest.TestCase):
+    def test_block_list(self):
+        self.assertEqual(
+            _parse_peers_yaml(JROUTER_YAML_WITH_PEERS), ["10.0.0.1", "10.0.0.2"]
+        )
+
+    def test_empty_inline_list(self):
+        self.assertEqual(_parse_peers_yaml("peers: []\n"), [])
+
+    def test_no_peers_key(self):
+        self.assertIsNone(_parse_peers_yaml(JROUTER_YAML_WITHOUT_PEERS))
+
+    def test_round_trips_dump(self):
+        peers = ["1.1.1.1", "2.2.2.2"]
+        self.assertEqual(_parse_peers_yaml(_dump_peers_yaml(peers)), peers)
+
+
+class TestPeersEqual(unittest.TestCase):
+    def test_order_matters_by_default(self):
+        self.assertFalse(peers_equal(["1.1.1.1", "2.2.2.2"], ["2.2.2.2", "1.1.1.1"]))
+
+    def test_unordered_ignores_order_and_duplicates(self):
+        self.assertTrue(
+            peers_equal(["1.1.1.1", "2.2.2.2"], ["2.2.2.2", "1.1.1.1", "1.1.1.1"], True)
+        )
+
+    def test_dedupe_keeps_first_occurrence(self):
+        self.assertEqual(
+            dedupe_peers(["2.2.2.2", "1.1.1.1", "2.2.2.2"]), ["2.2.2.2", "1.1.1.1"]
+        )
+
+
+class TestUpdateNodelist(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = self._tmp.name
+        self.input_path = os.path.join(self.dir, "nodes.txt")
+        patcher = patch(
+            "globaltalk.nodelist.resolve_address", side_effect=_resolve_ip_only
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+
+    def _input(self, *peers):
+        with open(self.input_path, "w", encoding="utf-8") as fh:
+            fh.writelines(f"{p}\n" for p in peers)
+
+    def _target(self, content):
+        path = os.path.join(self.dir, "jrouter.yaml")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        # Back-date the file so an unwanted rewrite would change its mtime.
+        os.utime(path, (1_000_000, 1_000_000))
+        return path
+
+    def test_new_output_file_is_written(self):
+        self._input("1.1.1.1")
+        output = os.path.join(self.dir, "out.yaml")
+        peers, changed, _ = update_nodelist(self.input_path, output_path=output)
+        self.assertTrue(changed)
+        self.assertEqual(peers, ["1.1.1.1"])
+        self.assertTrue(os.path.exists(output))
+
+    def test_unchanged_output_not_rewritten(self):
+        self._input("1.1.1.1", "2.2.2.2")
+        output = self._target(_dump_peers_yaml(["1.1.1.1", "2.2.2.2"]))
+        _, changed, _ = update_nodelist(self.input_path, output_path=output)
+        self.assertFalse(changed)
+        self.assertEqual(os.stat(output).st_mtime, 1_000_000)
+
+    def test_reordered_peers_rewritten_unless_unordered(self):
+        self._input("2.2.2.2", "1.1.1.1")
+        output = self._target(_dump_peers_yaml(["1.1.1.1", "2.2.2.2"]))
+        _, changed, _ = update_nodelist(
+            self.input_path, output_path=output, unordered=True
+        )
+        self.assertFalse(changed)
+        _, changed, _ = update_nodelist(self.input_path, output_path=output)
+        self.assertTrue(changed)
+        with open(output, encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), _dump_peers_yaml(["2.2.2.2", "1.1.1.1"]))
+
+    def test_unchanged_merge_not_rewritten(self):
+        self._input("10.0.0.1", "10.0.0.2")
+        merge = self._target(JROUTER_YAML_WITH_PEERS)
+        _, changed, _ = update_nodelist(self.input_path, merge_path=merge)
+        self.assertFalse(changed)
+        with open(merge, encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), JROUTER_YAML_WITH_PEERS)
+
+    def test_dedupe_applies_before_comparison(self):
+        self._input("10.0.0.1", "10.0.0.2", "10.0.0.1")
+        merge = self._target(JROUTER_YAML_WITH_PEERS)
+        peers, changed, _ = update_nodelist(
+            self.input_path, merge_path=merge, dedupe=True
+        )
+        self.assertFalse(changed)
+        self.assertEqual(peers, ["10.0.0.1", "10.0.0.2"])
+
+    def test_changed_write_leaves_no_temp_file(self):
+        self._input("9.9.9.9")
+        merge = self._target(JROUTER_YAML_WITH_PEERS)
+        _, changed, _ = update_nodelist(self.input_path, merge_path=merge)
+        self.assertTrue(changed)
+        self.assertEqual(sorted(os.listdir(self.dir)), ["jrouter.yaml", "nodes.txt"])
+
+    def test_cli_exit_code_when_unchanged(self):
+        self._input("10.0.0.1", "10.0.0.2")
+        merge = self._target(JROUTER_YAML_WITH_PEERS)
+        with self.assertRaises(SystemExit) as ctx:
+            main([self.input_path, "--merge", merge, "--exit-code", "--quiet"])
+        self.assertEqual(ctx.exception.code, EXIT_UNCHANGED)
+
+    def test_cli_exit_code_zero_when_changed(self):
+        self._input("9.9.9.9")
+        merge = self._target(JROUTER_YAML_WITH_PEERS)
+        # Returns normally (status 0) when the file was rewritten.
+        main([self.input_path, "--merge", merge, "--exit-code", "--quiet"])
+
+
 if __name__ == "__main__":
     unittest.main()
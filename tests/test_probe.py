@@ -0,0 +1,237 @@
+"""
+Tests for globaltalk.probe
+
+All probes go to local stand-in responders on the loopback interface.
+127.0.0.1 hosts the responders; 127.0.0.2 is also loopback on Linux but has
+nothing listening, so probes to it are refused.
+
+Covers:
+  - aurp_open_request (domain header, AURP header, Open-Req body)
+  - probe_aurp (reply, refused, timeout)
+  - probe_tcp (accept, refused)
+  - probe_peers (order, duplicate addresses, mode validation)
+  - nodelist update_nodelist / CLI with probing (drop, annotate, RTT sort)
+"""
+
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from globaltalk.nodelist import PeerProbe, main, update_nodelist
+from globaltalk.probe import (
+    ProbeResult,
+    aurp_open_request,
+    probe_aurp,
+    probe_peers,
+    probe_tcp,
+)
+
+
+class _UdpResponder:
+    """Reply to every datagram on 127.0.0.1 with a fixed payload."""
+
+    def __init__(self, reply=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self.reply = reply
+        self.received = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            self.received.append(data)
+            if self.reply:
+                self.sock.sendto(b"\x00" * 8, addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _ResponderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.udp = _UdpResponder()
+        self.addCleanup(self.udp.close)
+        self.tcp = socket.socket()
+        self.tcp.bind(("127.0.0.1", 0))
+        self.tcp.listen(16)
+        self.tcp_port = self.tcp.getsockname()[1]
+        self.addCleanup(self.tcp.close)
+
+
+# ---------------------------------------------------------------------------
+# aurp_open_request
+# ---------------------------------------------------------------------------
+
+
+class TestAurpOpenRequest(unittest.TestCase):
+    def setUp(self):
+        self.packet = aurp_open_request("10.0.0.1", "10.0.0.2", connection_id=5)
+
+    def test_domain_identifiers(self):
+        self.assertEqual(self.packet[:8], bytes([7, 1, 0, 0, 10, 0, 0, 2]))
+        self.assertEqual(self.packet[8:16], bytes([7, 1, 0, 0, 10, 0, 0, 1]))
+
+    def test_domain_header_marks_aurp_packet(self):
+        version, _, packet_type = struct.unpack(">HHH", self.packet[16:22])
+        self.assertEqual((version, packet_type), (1, 3))
+
+    def test_open_req_header_and_body(self):
+        self.assertEqual(struct.unpack(">HHHHHB", self.packet[22:]), (5, 0, 8, 0, 1, 0))
+
+    def test_random_connection_id_is_non_zero(self):
+        packet = aurp_open_request("10.0.0.1", "10.0.0.2")
+        self.assertNotEqual(struct.unpack(">H", packet[22:24])[0], 0)
+
+
+# ---------------------------------------------------------------------------
+# Single probes
+# ---------------------------------------------------------------------------
+
+
+class TestProbeAurp(_ResponderTestCase):
+    def test_reply_is_reachable(self):
+        result = probe_aurp("127.0.0.1", self.udp.port, timeout=1.0)
+        self.assertTrue(result.reachable)
+        self.assertGreaterEqual(result.rtt, 0)
+        # The responder saw a well-formed Open-Req addressed to it.
+        self.assertEqual(self.udp.received[0][4:8], bytes([127, 0, 0, 1]))
+
+    def test_refused_is_unreachable(self):
+        result = probe_aurp("127.0.0.2", self.udp.port, timeout=1.0)
+        self.assertFalse(result.reachable)
+        self.assertIsNone(result.rtt)
+
+    def test_silence_times_out(self):
+        silent = _UdpResponder(reply=False)
+        self.addCleanup(silent.close)
+        result = probe_aurp("127.0.0.1", silent.port, timeout=0.1)
+        self.assertEqual(result, ProbeResult("127.0.0.1", False, error="timed out"))
+
+
+class TestProbeTcp(_ResponderTestCase):
+    def test_accept_is_reachable(self):
+        self.assertTrue(probe_tcp("127.0.0.1", self.tcp_port, timeout=1.0).reachable)
+
+    def test_refused_is_unreachable(self):
+        result = probe_tcp("127.0.0.1", _free_port(), timeout=1.0)
+        self.assertFalse(result.reachable)
+        self.assertTrue(result.error)
+
+
+class TestProbePeers(_ResponderTestCase):
+    def test_results_in_input_order_without_duplicates(self):
+        results = probe_peers(
+            ["127.0.0.2", "127.0.0.1", "127.0.0.2"], port=self.udp.port, timeout=1.0
+        )
+        self.assertEqual(
+            [(r.address, r.reachable) for r in results],
+            [("127.0.0.2", False), ("127.0.0.1", True)],
+        )
+
+    def test_tcp_requires_port(self):
+        with self.assertRaises(ValueError):
+            probe_peers(["127.0.0.1"], mode="tcp")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            probe_peers(["127.0.0.1"], mode="icmp")
+
+    def test_empty_peer_list(self):
+        self.assertEqual(probe_peers([], port=self.udp.port), [])
+
+
+# ---------------------------------------------------------------------------
+# nodelist integration
+# ---------------------------------------------------------------------------
+
+
+class TestNodelistProbe(_ResponderTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.input_path = os.path.join(self.dir, "nodes.txt")
+        with open(self.input_path, "w", encoding="utf-8") as fh:
+            fh.write("127.0.0.2\n127.0.0.1\n")
+        patcher = patch("globaltalk.nodelist.resolve_address", side_effect=str)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _update(self, **probe_options):
+        probe = PeerProbe(port=self.udp.port, timeout=1.0, **probe_options)
+        with self.assertLogs("root", level="WARNING") as log:
+            result = update_nodelist(self.input_path, probe=probe)
+        self.assertIn("127.0.0.2 is unreachable", log.output[0])
+        return result
+
+    def test_unreachable_peers_dropped(self):
+        self.assertEqual(self._update().peers, ["127.0.0.1"])
+
+    def test_unreachable_peers_annotated(self):
+        result = self._update(keep_unreachable=True)
+        self.assertEqual(result.peers, ["127.0.0.1", "127.0.0.2"])
+        self.assertEqual(result.comments, {"127.0.0.2": "unreachable"})
+
+    def test_sort_by_rtt(self):
+        rtts = {"127.0.0.1": 0.2, "127.0.0.3": 0.1}
+
+        def _fake_probe(peers, **kwargs):
+            return [ProbeResult(p, True, rtts[p]) for p in peers]
+
+        with open(self.input_path, "w", encoding="utf-8") as fh:
+            fh.write("127.0.0.1\n127.0.0.3\n")
+        with patch("globaltalk.probe.probe_peers", side_effect=_fake_probe):
+            result = update_nodelist(self.input_path, probe=PeerProbe(sort_by_rtt=True))
+        self.assertEqual(result.peers, ["127.0.0.3", "127.0.0.1"])
+
+    def test_cli_writes_annotated_yaml(self):
+        output = os.path.join(self.dir, "out.yaml")
+        main(
+            [
+                self.input_path,
+                "--output",
+                output,
+                "--probe",
+                "--probe-mode",
+                "tcp",
+                "--probe-port",
+                str(self.tcp_port),
+                "--probe-timeout",
+                "1",
+                "--keep-unreachable",
+                "--quiet",
+            ]
+        )
+        with open(output, encoding="utf-8") as fh:
+            self.assertEqual(
+                fh.read(), "peers:\n- 127.0.0.1\n- 127.0.0.2  # unreachable\n"
+            )
+
+    def test_cli_tcp_without_port_exits(self):
+        with self.assertRaises(SystemExit):
+            main([self.input_path, "--probe", "--probe-mode", "tcp", "--quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
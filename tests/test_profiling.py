@@ -0,0 +1,154 @@
+"""
+Tests for globaltalk.profiling and the global profiling options
+
+Covers:
+  - phase (no-op when disabled, accumulation when enabled)
+  - run_profiled (phase report, pstats dump, tracemalloc report, run and
+                  nested phase peaks, report on SystemExit)
+  - __main__._pop_global_options (option forms, subcommand passthrough)
+"""
+
+import io
+import os
+import pstats
+import re
+import tempfile
+import unittest
+
+from globaltalk import profiling
+from globaltalk.__main__ import _pop_global_options
+from globaltalk.profiling import phase, run_profiled
+
+
+def _work():
+    with phase("load"):
+        data = [str(i) for i in range(2000)]
+    with phase("render"):
+        "".join(data)
+
+
+class TestPhase(unittest.TestCase):
+    def test_phase_is_noop_when_disabled(self):
+        self.assertIsNone(profiling._phases)
+        with phase("load"):
+            pass
+        self.assertIsNone(profiling._phases)
+
+    def test_phase_propagates_exceptions(self):
+        with self.assertRaises(KeyError):
+            with phase("load"):
+                raise KeyError("boom")
+
+
+class TestRunProfiled(unittest.TestCase):
+    def test_report_lists_phases(self):
+        report = io.StringIO()
+        run_profiled(_work, report=report)
+        out = report.getvalue()
+        self.assertIn("phases:", out)
+        self.assertIn("load", out)
+        self.assertIn("render", out)
+
+    def test_phases_disabled_after_run(self):
+        run_profiled(_work, report=io.StringIO())
+        self.assertIsNone(profiling._phases)
+
+    def test_repeated_phase_counts_calls(self):
+        def _twice():
+            for _ in range(2):
+                with phase("write"):
+                    pass
+
+        report = io.StringIO()
+        run_profiled(_twice, report=report)
+        self.assertIn("x2", report.getvalue())
+
+    def test_profile_dumps_pstats(self):
+        report = io.StringIO()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.pstats")
+            run_profiled(_work, profile_path=path, report=report)
+            stats = pstats.Stats(path)
+        self.assertGreater(stats.total_calls, 0)
+        self.assertIn("cumulative time", report.getvalue())
+
+    def test_trace_malloc_reports_allocation_sites(self):
+        report = io.StringIO()
+        run_profiled(_work, trace_malloc=True, report=report)
+        out = report.getvalue()
+        self.assertIn("peak traced memory", out)
+        self.assertIn("allocation sites", out)
+        self.assertIn("peak", out.split("phases:")[1])
+
+    def test_peaks_survive_later_and_nested_phases(self):
+        def _allocate():
+            with phase("outer"):
+                big = bytearray(8 * 1024 * 1024)
+                del big
+                with phase("inner"):
+                    "".join(["x"] * 10)
+            with phase("small"):
+                pass
+
+        report = io.StringIO()
+        run_profiled(_allocate, trace_malloc=True, report=report)
+        out = report.getvalue()
+        mib = r"([\d.]+) MiB"
+        run_peak = re.search(r"peak traced memory: " + mib, out)
+        self.assertIsNotNone(run_peak, out)
+        self.assertGreaterEqual(float(run_peak.group(1)), 8.0)
+        outer = re.search(r"outer .* peak " + mib, out)
+        self.assertIsNotNone(outer, out)
+        self.assertGreaterEqual(float(outer.group(1)), 8.0)
+        self.assertNotRegex(out, r"small .* peak [\d.]+ MiB")
+
+    def test_report_written_on_system_exit(self):
+        def _fail():
+            with phase("load"):
+                raise SystemExit(1)
+
+        report = io.StringIO()
+        with self.assertRaises(SystemExit):
+            run_profiled(_fail, report=report)
+        self.assertIn("load", report.getvalue())
+        self.assertIsNone(profiling._phases)
+
+
+class TestPopGlobalOptions(unittest.TestCase):
+    def test_no_global_options(self):
+        self.assertEqual(
+            _pop_global_options(["metrics", "snap.json"]),
+            (None, False, ["metrics", "snap.json"]),
+        )
+
+    def test_profile_with_separate_value(self):
+        self.assertEqual(
+            _pop_global_options(["--profile", "out.pstats", "scrape"]),
+            ("out.pstats", False, ["scrape"]),
+        )
+
+    def test_profile_with_equals_value(self):
+        self.assertEqual(
+            _pop_global_options(["--profile=out.pstats", "scrape"]),
+            ("out.pstats", False, ["scrape"]),
+        )
+
+    def test_trace_malloc(self):
+        self.assertEqual(
+            _pop_global_options(["--trace-malloc", "--profile", "p", "metrics"]),
+            ("p", True, ["metrics"]),
+        )
+
+    def test_options_after_command_left_alone(self):
+        self.assertEqual(
+            _pop_global_options(["metrics", "--trace-malloc"]),
+            (None, False, ["metrics", "--trace-malloc"]),
+        )
+
+    def test_profile_without_value_exits(self):
+        with self.assertRaises(SystemExit):
+            _pop_global_options(["--profile"])
+
+
+if __name__ == "__main__":
+    unittest.main()
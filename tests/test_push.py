@@ -0,0 +1,285 @@
+"""
+Tests for globaltalk.push
+
+All pushes go to a local stand-in HTTP receiver running in a thread.
+
+Covers:
+  - pushgateway_path (plain and base64-encoded grouping labels)
+  - split_families (batch boundaries, metadata repeated per batch)
+  - MetricsPusher (gzip bodies, connection reuse, retry with backoff,
+                   non-retryable rejection, exhausted retries)
+  - push_to_gateway / push_batches
+  - metrics CLI --push-url
+"""
+
+import gzip
+import http.server
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from globaltalk.exposition import MetricFamily
+from globaltalk.metrics import collect_metrics
+from globaltalk.metrics import main as metrics_main
+from globaltalk.push import (
+    MetricsPusher,
+    PushError,
+    push_batches,
+    push_to_gateway,
+    pushgateway_path,
+    split_families,
+)
+from tests.fixtures import SNAPSHOT_BASIC
+
+
+class _Receiver(http.server.ThreadingHTTPServer):
+    """Records every request; replies with queued status codes, then 200."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests = []
+        self.statuses = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = raw
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(raw)
+        self.server.requests.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "headers": dict(self.headers),
+                "body": body.decode("utf-8"),
+                "client": self.client_address,
+            }
+        )
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        reply = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_PUT = _handle
+    do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class _ReceiverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = _Receiver()
+        thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _pusher(self, **kwargs):
+        kwargs.setdefault("backoff", 0.01)
+        return MetricsPusher(self.server.url, **kwargs)
+
+
+def _families(samples_per_family=(2, 3)):
+    families = []
+    for i, count in enumerate(samples_per_family):
+        family = MetricFamily(f"gt_metric_{i}", "gauge", "Test metric")
+        for j in range(count):
+            family.add(j, zone=f"z{j}")
+        families.append(family)
+    return families
+
+
+# ---------------------------------------------------------------------------
+# Pure helpers
+# ---------------------------------------------------------------------------
+
+
+class TestPushgatewayPath(unittest.TestCase):
+    def test_job_only(self):
+        self.assertEqual(pushgateway_path("globaltalk"), "/metrics/job/globaltalk")
+
+    def test_grouping_labels_sorted(self):
+        self.assertEqual(
+            pushgateway_path("gt", {"vantage": "east", "instance": "a"}),
+            "/metrics/job/gt/instance/a/vantage/east",
+        )
+
+    def test_value_with_slash_base64_encoded(self):
+        self.assertEqual(
+            pushgateway_path("gt", {"path": "a/b"}),
+            "/metrics/job/gt/path@base64/YS9i",
+        )
+
+    def test_empty_value_encoded(self):
+        self.assertEqual(
+            pushgateway_path("gt", {"instance": ""}),
+            "/metrics/job/gt/instance@base64/=",
+        )
+
+
+class TestSplitFamilies(unittest.TestCase):
+    def test_batches_bounded(self):
+        batches = list(split_families(_families((2, 3)), 2))
+        sizes = [sum(len(f.samples) for f in batch) for batch in batches]
+        self.assertEqual(sizes, [2, 2, 1])
+
+    def test_straddling_family_keeps_metadata(self):
+        batches = list(split_families(_families((3,)), 2))
+        self.assertEqual([b[0].name for b in batches], ["gt_metric_0", "gt_metric_0"])
+
+    def test_single_batch_when_large_enough(self):
+        self.assertEqual(len(list(split_families(_families(), 100))), 1)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            list(split_families(_families(), 0))
+
+
+# ---------------------------------------------------------------------------
+# MetricsPusher
+# ---------------------------------------------------------------------------
+
+
+class TestMetricsPusher(_ReceiverTestCase):
+    def test_body_is_gzip_compressed(self):
+        with self._pusher() as pusher:
+            pusher.send("PUT", "/x", "gt_metric 1\n")
+        request = self.server.requests[0]
+        self.assertEqual(request["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(request["body"], "gt_metric 1\n")
+
+    def test_compression_can_be_disabled(self):
+        with self._pusher(compress=False) as pusher:
+            pusher.send("PUT", "/x", "gt_metric 1\n")
+        self.assertNotIn("Content-Encoding", self.server.requests[0]["headers"])
+
+    def test_connection_reused(self):
+        with self._pusher() as pusher:
+            for _ in range(3):
+                pusher.send("POST", "/x", "gt_metric 1\n")
+        clients = {r["client"] for r in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(clients), 1)
+
+    def test_url_path_used_as_prefix(self):
+        pusher = MetricsPusher(self.server.url + "/api/v1/import/prometheus")
+        with pusher:
+            pusher.send("POST", "", "gt_metric 1\n")
+        self.assertEqual(self.server.requests[0]["path"], "/api/v1/import/prometheus")
+
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 500]
+        with self.assertLogs("root", level="WARNING"):
+            with self._pusher(retries=3) as pusher:
+                status = pusher.send("PUT", "/x", "gt_metric 1\n")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_backoff_doubles(self):
+        self.server.statuses = [503, 503]
+        with patch("globaltalk.push.time.sleep") as sleep:
+            with self.assertLogs("root", level="WARNING"):
+                with self._pusher(retries=2, backoff=0.5) as pusher:
+                    pusher.send("PUT", "/x", "gt_metric 1\n")
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+    def test_client_error_not_retried(self):
+        self.server.statuses = [400]
+        with self._pusher(retries=3) as pusher:
+            with self.assertRaises(PushError) as ctx:
+                pusher.send("PUT", "/x", "bad\n")
+        self.assertIn("400", str(ctx.exception))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_gives_up_after_retries(self):
+        self.server.statuses = [503, 503, 503]
+        with self.assertLogs("root", level="WARNING"):
+            with self._pusher(retries=2) as pusher:
+                with self.assertRaises(PushError):
+                    pusher.send("PUT", "/x", "gt_metric 1\n")
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_connection_refused_raises_push_error(self):
+        # Grab a free port and close it again so nothing is listening there.
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+        with self.assertLogs("root", level="WARNING"):
+            with MetricsPusher(url, retries=1, backoff=0.01) as pusher:
+                with self.assertRaises(PushError):
+                    pusher.send("PUT", "/x", "gt_metric 1\n")
+
+    def test_invalid_url(self):
+        with self.assertRaises(ValueError):
+            MetricsPusher("ftp://example.com")
+
+
+# ---------------------------------------------------------------------------
+# push_to_gateway / push_batches
+# ---------------------------------------------------------------------------
+
+
+class TestPushHelpers(_ReceiverTestCase):
+    def test_push_to_gateway_puts_full_exposition(self):
+        families = collect_metrics(SNAPSHOT_BASIC, timestamps=True)
+        with self._pusher() as pusher:
+            push_to_gateway(pusher, families, job="gt", grouping={"instance": "a"})
+        request = self.server.requests[0]
+        self.assertEqual(request["method"], "PUT")
+        self.assertEqual(request["path"], "/metrics/job/gt/instance/a")
+        self.assertIn("globaltalk_zones 2\n", request["body"])
+
+    def test_push_batches_posts_each_batch(self):
+        with self._pusher() as pusher:
+            count = push_batches(pusher, _families((2, 3)), batch_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual([r["method"] for r in self.server.requests], ["POST"] * 3)
+        self.assertTrue(
+            all(r["body"].startswith("# HELP") for r in self.server.requests)
+        )
+
+
+class TestMetricsCliPush(_ReceiverTestCase):
+    def test_push_url_pushes_snapshot(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            metrics_main([path, "--push-url", self.server.url, "--quiet"])
+        self.assertEqual(self.server.requests[0]["path"], "/metrics/job/globaltalk")
+        self.assertIn("globaltalk_total_nodes", self.server.requests[0]["body"])
+
+    def test_invalid_push_label_exits(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            with self.assertRaises(SystemExit):
+                metrics_main(
+                    [path, "--push-url", self.server.url, "--push-label", "bad"]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+"""
+Tests for globaltalk.query
+
+Covers:
+  - parse_filter (fields, operators, invalid expressions)
+  - parse_version
+  - NodeIndex.select (exact, prefix, jrouter version ranges, network
+                      ranges, AND across fields, OR within a field,
+                      snapshot order)
+  - distinct / NodeIndex.values, views shared with Snapshot
+  - main (NDJSON output, --distinct, --count, error paths)
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from globaltalk.query import (
+    NodeIndex,
+    QueryFilter,
+    distinct,
+    main,
+    parse_filter,
+    parse_version,
+)
+from globaltalk.snapshot import Snapshot
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_MULTI_JROUTER
+
+
+def _select(data, *expressions):
+    index = NodeIndex.from_snapshot(data)
+    return index.select([parse_filter(e) for e in expressions])
+
+
+class TestParseFilter(unittest.TestCase):
+    def test_exact_match(self):
+        self.assertEqual(
+            parse_filter("zone=Doofnet"), QueryFilter("zone", "=", "Doofnet")
+        )
+
+    def test_double_equals_normalised(self):
+        self.assertEqual(parse_filter("type==AFPServer").op, "=")
+
+    def test_value_may_contain_spaces_and_operators(self):
+        self.assertEqual(
+            parse_filter("object=HP LJ <Pro>").value,
+            "HP LJ <Pro>",
+        )
+
+    def test_prefix_only_on_object(self):
+        self.assertEqual(parse_filter("object^=nas").op, "^=")
+        with self.assertRaises(ValueError):
+            parse_filter("zone^=Doof")
+
+    def test_jrouter_comparisons(self):
+        self.assertEqual(
+            parse_filter("jrouter<0.0.13"), QueryFilter("jrouter", "<", "0.0.13")
+        )
+        self.assertEqual(parse_filter("jrouter>=v0.0.12").op, ">=")
+
+    def test_comparison_rejected_on_plain_field(self):
+        with self.assertRaises(ValueError):
+            parse_filter("address<5311.1")
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_filter("socket=4")
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            parse_filter("Doofnet")
+
+    def test_invalid_version(self):
+        with self.assertRaises(ValueError):
+            parse_filter("jrouter<latest")
+
+
+class TestParseVersion(unittest.TestCase):
+    def test_numeric_ordering(self):
+        self.assertLess(parse_version("v0.0.9"), parse_version("v0.0.12"))
+
+
+class TestNodeIndexSelect(unittest.TestCase):
+    def test_network_range(self):
+        nodes = _select(SNAPSHOT_BASIC, "network=6000-6999")
+        self.assertEqual([n["object"] for n in nodes], ["retro-mac"])
+        self.assertEqual(len(_select(SNAPSHOT_BASIC, "network=5311")), 6)
+        self.assertEqual(_select(SNAPSHOT_BASIC, "network=1-100"), [])
+
+    def test_network_range_with_non_canonical_addresses(self):
+        nodes = [
+            {"object": "a", "type": "T", "address": "05311.212", "zone": "Z"},
+            {"object": "b", "type": "T", "address": "5311.212", "zone": "Z"},
+            {"object": "c", "type": "T", "address": "5312.1", "zone": "Z"},
+        ]
+        data = {"zones": ["Z"], "nodes": nodes}
+        self.assertEqual(_select(data, "network=5311"), nodes[:2])
+
+    def test_invalid_network_filter(self):
+        for expression in ("network=10-5", "network<5", "network=x"):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    parse_filter(expression)
+
+    def test_no_filters_returns_everything(self):
+        self.assertEqual(_select(SNAPSHOT_BASIC), SNAPSHOT_BASIC["nodes"])
+
+    def test_exact_type(self):
+        nodes = _select(SNAPSHOT_BASIC, "type=LaserWriter")
+        self.assertEqual([n["object"] for n in nodes], ["HP LJ Pro 200 Color"])
+
+    def test_address_lists_all_endpoints(self):
+        nodes = _select(SNAPSHOT_BASIC, "address=5311.212")
+        self.assertEqual(len(nodes), 4)
+
+    def test_no_match(self):
+        self.assertEqual(_select(SNAPSHOT_BASIC, "zone=Nowhere"), [])
+
+    def test_and_across_fields(self):
+        nodes = _select(SNAPSHOT_BASIC, "zone=Doofnet", "type=Workstation")
+        self.assertEqual([n["object"] for n in nodes], ["nas-afp"])
+
+    def test_or_within_field_keeps_snapshot_order(self):
+        nodes = _select(SNAPSHOT_BASIC, "type=Workstation", "type=LaserWriter")
+        self.assertEqual(
+            [n["object"] for n in nodes],
+            ["nas-afp", "HP LJ Pro 200 Color", "retro-mac"],
+        )
+
+    def test_object_prefix(self):
+        nodes = _select(SNAPSHOT_BASIC, "object^=nas", "type=AFPServer")
+        self.assertEqual([n["address"] for n in nodes], ["5311.212"])
+        self.assertEqual(_select(SNAPSHOT_BASIC, "object^=zzz"), [])
+
+    def test_jrouter_below_version(self):
+        nodes = _select(SNAPSHOT_MULTI_JROUTER, "jrouter<0.0.13")
+        self.assertEqual([n["address"] for n in nodes], ["1.1", "1.2"])
+
+    def test_jrouter_version_operators(self):
+        cases = {
+            "jrouter<=0.0.13": 3,
+            "jrouter>0.0.12": 1,
+            "jrouter>=0.0.12": 3,
+            "jrouter=v0.0.13": 1,
+            "jrouter!=0.0.13": 2,
+            "jrouter<0.0.12": 0,
+        }
+        for expression, expected in cases.items():
+            with self.subTest(expression=expression):
+                self.assertEqual(
+                    len(_select(SNAPSHOT_MULTI_JROUTER, expression)), expected
+                )
+
+    def test_jrouter_ignores_other_objects(self):
+        nodes = _select(SNAPSHOT_BASIC, "jrouter>=0")
+        self.assertEqual([n["object"] for n in nodes], ["jrouter v0.0.12"])
+
+
+class TestDistinct(unittest.TestCase):
+    def test_distinct_zones_for_type(self):
+        nodes = _select(SNAPSHOT_BASIC, "type=Workstation")
+        self.assertEqual(distinct(nodes, "zone"), ["Doofnet", "RetroZone"])
+
+    def test_index_values(self):
+        index = NodeIndex.from_snapshot(SNAPSHOT_BASIC)
+        self.assertEqual(index.values("zone"), ["Doofnet", "RetroZone"])
+
+    def test_shares_snapshot_views(self):
+        snapshot = Snapshot(SNAPSHOT_BASIC)
+        index = NodeIndex(snapshot)
+        self.assertIs(index.nodes, snapshot.nodes)
+        self.assertIs(index._fields["zone"], snapshot.by_zone)
+        self.assertEqual(
+            index.select([parse_filter("zone=RetroZone")]),
+            snapshot.by_zone["RetroZone"],
+        )
+        # Nodes lacking a field are indexed under Unknown, as in Snapshot.
+        self.assertEqual(NodeIndex([{"object": "x"}]).values("zone"), ["Unknown"])
+
+
+class TestQueryMain(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "snap.json")
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(SNAPSHOT_BASIC, fh)
+
+    def _run(self, *args):
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            main([self.path, *args, "--quiet"])
+        return out.getvalue()
+
+    def test_prints_ndjson(self):
+        lines = self._run("type=LaserWriter").splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["address"], "5311.100")
+
+    def test_distinct(self):
+        self.assertEqual(
+            self._run("type=Workstation", "--distinct", "zone"), "Doofnet\nRetroZone\n"
+        )
+
+    def test_count(self):
+        self.assertEqual(self._run("zone=Doofnet", "--count"), "6\n")
+
+    def test_distinct_count(self):
+        self.assertEqual(
+            self._run("zone=Doofnet", "--distinct", "object", "--count"), "3\n"
+        )
+
+    def test_invalid_filter_exits(self):
+        with self.assertRaises(SystemExit):
+            main([self.path, "bogus", "--quiet"])
+
+    def test_missing_file_exits(self):
+        with self.assertRaises(SystemExit):
+            main(["/nonexistent/snap.json", "--quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Tests for globaltalk.rendercache
+
+Covers:
+  - RenderCache (hits across instances, namespaces kept apart, stored zone
+    hashes used, unreadable entries treated as misses)
+  - LRU eviction beyond max_bytes
+  - cached to_mermaid / write_d3 output identical to uncached output
+  - visualise --cache-dir
+"""
+
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from globaltalk import visualise
+from globaltalk.rendercache import RenderCache
+from globaltalk.scrape import canonicalise
+from globaltalk.snapshot import Snapshot
+from globaltalk.visualise import D3Summary, to_mermaid, write_d3
+from tests.fixtures import SNAPSHOT_BASIC, snapshot_changed
+
+
+class _CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+
+class TestRenderCache(_CacheTestCase):
+    def test_hit_across_instances(self):
+        nodes = [{"object": "a", "zone": "Z"}]
+        first = RenderCache(self.dir, "ns")
+        self.assertEqual(first.get("Z", nodes, lambda: [1, "a"]), [1, "a"])
+        self.assertEqual((first.hits, first.misses), (0, 1))
+
+        second = RenderCache(self.dir, "ns")
+        self.assertEqual(second.get("Z", list(nodes), lambda: [2, "b"]), [1, "a"])
+        self.assertEqual((second.hits, second.misses), (1, 0))
+        self.assertEqual(len(second), 1)
+
+    def test_changed_nodes_and_namespaces_miss(self):
+        cache = RenderCache(self.dir, ["mermaid", 1])
+        cache.get("Z", [{"object": "a"}], lambda: "a")
+        self.assertEqual(cache.get("Z", [{"object": "b"}], lambda: "b"), "b")
+        other = RenderCache(self.dir, ["mermaid", 2])
+        self.assertEqual(other.get("Z", [{"object": "a"}], lambda: "c"), "c")
+        self.assertEqual(len(other), 3)
+
+    def test_content_hash_used_when_given(self):
+        cache = RenderCache(self.dir, "ns")
+        cache.get("Z", [{"object": "a"}], lambda: "a", "hash")
+        # The stored hash is trusted; the nodes themselves are not compared.
+        self.assertEqual(cache.get("Z", [], lambda: "b", "hash"), "a")
+
+    def test_unreadable_entry_is_a_miss(self):
+        cache = RenderCache(self.dir, "ns")
+        cache.get("Z", [], lambda: "a")
+        (name,) = os.listdir(self.dir)
+        with open(os.path.join(self.dir, name), "w", encoding="utf-8") as fh:
+            fh.write("{")
+        self.assertEqual(cache.get("Z", [], lambda: "b"), "b")
+        self.assertEqual(RenderCache(self.dir, "ns").get("Z", [], lambda: "c"), "b")
+
+    def test_negative_size_rejected(self):
+        with self.assertRaises(ValueError):
+            RenderCache(self.dir, "ns", max_bytes=-1)
+
+
+class TestEviction(_CacheTestCase):
+    def test_least_recently_used_evicted(self):
+        cache = RenderCache(self.dir, "ns", max_bytes=25)
+        for zone in ("A", "B", "C"):
+            cache.get(zone, [], lambda: "x" * 8)  # 10 bytes on disk each
+            time.sleep(0.01)
+        cache.get("A", [], lambda: "unused")  # A is now the most recent
+        cache.retain([])
+
+        self.assertEqual(len(cache), 2)
+        cache.reset_stats()
+        cache.get("A", [], lambda: "x")
+        cache.get("C", [], lambda: "x")
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_within_bound_keeps_everything(self):
+        cache = RenderCache(self.dir, "ns")
+        cache.get("A", [], lambda: "a")
+        cache.retain([])
+        self.assertEqual(len(cache), 1)
+
+
+class TestCachedRenderers(_CacheTestCase):
+    def test_mermaid_matches_uncached(self):
+        for data in (SNAPSHOT_BASIC, snapshot_changed()):
+            cache = RenderCache(self.dir, "mermaid")
+            self.assertEqual(to_mermaid(data, cache=cache), to_mermaid(data))
+        # Only RetroZone changed.
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_node_order_is_part_of_the_key(self):
+        to_mermaid(SNAPSHOT_BASIC, cache=RenderCache(self.dir, "mermaid"))
+        # Reversing the nodes changes Doofnet's leaf order, so it is
+        # rendered again; single-node RetroZone is served from the cache.
+        reordered = dict(SNAPSHOT_BASIC, nodes=SNAPSHOT_BASIC["nodes"][::-1])
+        cache = RenderCache(self.dir, "mermaid")
+        self.assertEqual(to_mermaid(reordered, cache=cache), to_mermaid(reordered))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_stored_zone_hashes_are_the_key(self):
+        # A canonical snapshot is keyed by its stored zone hashes, so a
+        # second render is served entirely from the cache.
+        data = canonicalise(SNAPSHOT_BASIC)
+        for expected in ((0, 2), (2, 0)):
+            cache = RenderCache(self.dir, "mermaid")
+            self.assertEqual(to_mermaid(data, cache=cache), to_mermaid(data))
+            self.assertEqual((cache.hits, cache.misses), expected)
+
+    def test_d3_matches_uncached(self):
+        for options in ({}, {"compact": True}, {"summary": D3Summary()}):
+            namespace = sorted(options)
+            for data in (SNAPSHOT_BASIC, snapshot_changed()):
+                cache = RenderCache(self.dir, namespace)
+                cached, plain = io.StringIO(), io.StringIO()
+                write_d3(data, cached, include_types=[], cache=cache, **options)
+                write_d3(data, plain, include_types=[], **options)
+                self.assertEqual(cached.getvalue(), plain.getvalue())
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_snapshot_hashes_match_canonical(self):
+        self.assertEqual(
+            Snapshot(SNAPSHOT_BASIC).zone_hashes,
+            Snapshot(canonicalise(SNAPSHOT_BASIC)).stored_zone_hashes,
+        )
+
+
+class TestVisualiseCacheDir(_CacheTestCase):
+    def _run(self, *argv):
+        path = os.path.join(self.dir, "snapshot.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(SNAPSHOT_BASIC, fh)
+        out = os.path.join(self.dir, "out")
+        cache_dir = os.path.join(self.dir, "cache")
+        visualise.main([*argv, path, "--output", out, "--cache-dir", cache_dir])
+        with open(out, encoding="utf-8") as fh:
+            return fh.read(), os.listdir(cache_dir)
+
+    def test_mermaid_and_d3(self):
+        first, entries = self._run("mermaid")
+        self.assertEqual(first, to_mermaid(SNAPSHOT_BASIC))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(self._run("mermaid")[0], first)
+
+        d3, entries = self._run("d3", "--compact")
+        self.assertIn('"name":"GlobalTalk"', d3)
+        # The d3 fragments are stored alongside the mermaid ones.
+        self.assertEqual(len(entries), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
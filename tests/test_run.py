@@ -0,0 +1,124 @@
+"""
+Tests for globaltalk.run
+
+Covers:
+  - run_sinks (every sink written, failures counted and skipped)
+  - main (outputs match the single-purpose commands, live scrape, errors)
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from globaltalk.metrics import generate_metrics
+from globaltalk.run import Sink, main, run_sinks, write_snapshot
+from globaltalk.snapshot import Snapshot
+from globaltalk.visualise import to_d3, to_mermaid
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_NO_TIMESTAMP
+
+
+class _RunTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _read(self, name):
+        with open(self._path(name), encoding="utf-8") as fh:
+            return fh.read()
+
+
+class TestRunSinks(_RunTestCase):
+    def test_failed_sink_does_not_stop_others(self):
+        sinks = [
+            Sink("bad", self._path("missing/dir/out.json"), write_snapshot),
+            Sink("snapshot", self._path("out.json"), write_snapshot),
+        ]
+        with self.assertLogs("root", level="ERROR"):
+            failures = run_sinks(Snapshot(SNAPSHOT_BASIC), sinks)
+        self.assertEqual(failures, 1)
+        self.assertEqual(json.loads(self._read("out.json")), SNAPSHOT_BASIC)
+
+
+class TestRunMain(_RunTestCase):
+    def _input(self, data):
+        path = self._path("input.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+        return path
+
+    def test_outputs_match_single_commands(self):
+        path = self._input(SNAPSHOT_NO_TIMESTAMP)
+        main(
+            [
+                path,
+                "--snapshot",
+                self._path("snap.json"),
+                "--prom",
+                self._path("out.prom"),
+                "--mermaid",
+                self._path("map.md"),
+                "--d3",
+                self._path("tree.json"),
+                "--quiet",
+            ]
+        )
+
+        self.assertEqual(json.loads(self._read("snap.json")), SNAPSHOT_NO_TIMESTAMP)
+        expected_prom = io.StringIO()
+        generate_metrics(SNAPSHOT_NO_TIMESTAMP, expected_prom)
+        self.assertEqual(self._read("out.prom"), expected_prom.getvalue())
+        self.assertEqual(self._read("map.md"), to_mermaid(SNAPSHOT_NO_TIMESTAMP))
+        self.assertEqual(
+            json.loads(self._read("tree.json")), to_d3(SNAPSHOT_NO_TIMESTAMP)
+        )
+
+    def test_live_scrape_feeds_sinks(self):
+        with patch("globaltalk.scrape.scrape", return_value=SNAPSHOT_BASIC) as scrape:
+            main(
+                ["--snapshot", self._path("snap.json"), "--zone", "Doofnet", "--quiet"]
+            )
+        self.assertEqual(scrape.call_args.kwargs["zones"], ["Doofnet"])
+        self.assertEqual(json.loads(self._read("snap.json")), SNAPSHOT_BASIC)
+
+    def test_output_required(self):
+        with patch("sys.stderr", io.StringIO()):
+            with self.assertRaises(SystemExit):
+                main([self._input(SNAPSHOT_BASIC), "--quiet"])
+
+    def test_invalid_snapshot_exits(self):
+        with self.assertRaises(SystemExit):
+            main(
+                [
+                    self._input({"nodes": []}),
+                    "--prom",
+                    self._path("out.prom"),
+                    "--quiet",
+                ]
+            )
+        self.assertFalse(os.path.exists(self._path("out.prom")))
+
+    def test_failed_output_exits_nonzero(self):
+        path = self._input(SNAPSHOT_BASIC)
+        with self.assertRaises(SystemExit):
+            main(
+                [
+                    path,
+                    "--snapshot",
+                    self._path("missing/snap.json"),
+                    "--mermaid",
+                    self._path("map.md"),
+                    "--quiet",
+                ]
+            )
+        self.assertTrue(os.path.exists(self._path("map.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
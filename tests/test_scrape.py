@@ -4,22 +4,34 @@ Tests for globaltalk.scrape
 Covers the pure-function logic that can be exercised without netatalk:
   - NBPLKUP_RESULTS regex parsing (via nbplkup line processing)
   - deduplicate_nodes
+  - node_digest / NodeDeduplicator (streaming de-duplication)
   - check_prerequisites (mocked)
   - scrape() error paths (mocked)
+  - nbp_pattern / normalise_types / type-filtered scrape() (mocked)
+  - canonicalise (stable order, per-zone content hashes)
 """
 
+import copy
 import unittest
 from unittest.mock import MagicMock, patch
 
 from globaltalk.scrape import (
     NBPLKUP_RESULTS,
+    NodeDeduplicator,
+    canonicalise,
     check_prerequisites,
     deduplicate_nodes,
+    nbp_pattern,
+    nbplkup,
+    node_digest,
+    normalise_types,
     scrape,
 )
+from globaltalk.snapshot import Snapshot
 from tests.fixtures import (
     NBPLKUP_INVALID_LINES,
     NBPLKUP_VALID_LINES,
+    SNAPSHOT_BASIC,
 )
 
 
@@ -210,6 +222,61 @@ class TestDeduplicateNodes(unittest.TestCase):
         self.assertEqual(dupes, 1)
 
 
+class TestNodeDeduplicator(unittest.TestCase):
+    """Tests for node_digest() and the streaming NodeDeduplicator."""
+
+    def _node(self, address="1.1", socket="4", typ="Workstation", obj="mac"):
+        return {
+            "address": address,
+            "socket": socket,
+            "type": typ,
+            "object": obj,
+            "zone": "TestZone",
+        }
+
+    def test_digest_is_64_bit(self):
+        self.assertLess(node_digest(self._node()), 2**64)
+
+    def test_digest_ignores_zone(self):
+        self.assertEqual(
+            node_digest({**self._node(), "zone": "A"}),
+            node_digest({**self._node(), "zone": "B"}),
+        )
+
+    def test_digest_fields_not_ambiguous(self):
+        # Shifting text between fields must change the digest.
+        self.assertNotEqual(
+            node_digest(self._node(typ="AFP", obj="Server")),
+            node_digest(self._node(typ="AFPS", obj="erver")),
+        )
+
+    def test_filter_yields_first_occurrences_lazily(self):
+        dedupe = NodeDeduplicator()
+        stream = dedupe.filter(
+            iter([self._node(), self._node(address="1.2"), self._node()])
+        )
+        self.assertEqual(next(stream)["address"], "1.1")
+        self.assertEqual(len(dedupe), 1)
+        self.assertEqual([n["address"] for n in stream], ["1.2"])
+        self.assertEqual(dedupe.duplicates, 1)
+
+    def test_state_shared_across_batches(self):
+        dedupe = NodeDeduplicator()
+        list(dedupe.filter([self._node()]))
+        self.assertEqual(list(dedupe.filter([self._node()])), [])
+        self.assertEqual(dedupe.duplicates, 1)
+
+    def test_scrape_dedupes_across_zones(self):
+        def _lookup(zone, nbp_type=None):
+            return [{**self._node(), "zone": zone}]
+
+        with patch("globaltalk.scrape.shutil.which", return_value="/usr/bin/x"):
+            with patch("globaltalk.scrape.getzones", return_value=["A", "B"]):
+                with patch("globaltalk.scrape.nbplkup", side_effect=_lookup):
+                    result = scrape(workers=1)
+        self.assertEqual(len(result["nodes"]), 1)
+
+
 class TestCheckPrerequisites(unittest.TestCase):
     """Tests for check_prerequisites()."""
 
@@ -347,5 +414,112 @@ class TestScrapeErrorPaths(unittest.TestCase):
         self.assertEqual(result["zones"], all_zones)
 
 
+class TestTypeFilteredScrape(unittest.TestCase):
+    """Tests for targeted =:Type@zone lookups."""
+
+    @staticmethod
+    def _node(zone, nbp_type):
+        return {
+            "object": f"{nbp_type} in {zone}",
+            "type": nbp_type,
+            "address": "1.1",
+            "socket": "4",
+            "zone": zone,
+        }
+
+    def test_nbp_pattern(self):
+        self.assertEqual(nbp_pattern("Doofnet"), "@Doofnet")
+        self.assertEqual(nbp_pattern("Doofnet", "AFPServer"), "=:AFPServer@Doofnet")
+
+    def test_nbplkup_uses_targeted_pattern(self):
+        completed = MagicMock(stdout="nas-afp:AFPServer 5311.212:128\n")
+        with patch("globaltalk.scrape.subprocess.run", return_value=completed) as run:
+            nodes = nbplkup("Doofnet", "AFPServer")
+        self.assertEqual(run.call_args.args[0], ["nbplkup", "=:AFPServer@Doofnet"])
+        self.assertEqual(nodes[0]["type"], "AFPServer")
+
+    def test_normalise_types(self):
+        self.assertEqual(
+            normalise_types(["LaserWriter", "afpserver", "AFPServer", " "]),
+            ["afpserver", "LaserWriter"],
+        )
+        self.assertIsNone(normalise_types([]))
+        self.assertIsNone(normalise_types(None))
+
+    def test_one_lookup_per_zone_and_type(self):
+        lookup = MagicMock(side_effect=lambda zone, t: [self._node(zone, t)])
+        with patch("globaltalk.scrape.shutil.which", return_value="/usr/bin/x"):
+            with patch("globaltalk.scrape.getzones", return_value=["A", "B"]):
+                with patch("globaltalk.scrape.nbplkup", lookup):
+                    result = scrape(workers=4, types=["LaserWriter", "AFPServer"])
+
+        self.assertEqual(
+            sorted(call.args for call in lookup.call_args_list),
+            [
+                ("A", "AFPServer"),
+                ("A", "LaserWriter"),
+                ("B", "AFPServer"),
+                ("B", "LaserWriter"),
+            ],
+        )
+        self.assertEqual(result["types"], ["AFPServer", "LaserWriter"])
+        # Each zone's results are merged in type order.
+        for zone in ("A", "B"):
+            self.assertEqual(
+                [n["type"] for n in result["nodes"] if n["zone"] == zone],
+                ["AFPServer", "LaserWriter"],
+            )
+
+    def test_unfiltered_scrape_has_no_types(self):
+        with patch("globaltalk.scrape.shutil.which", return_value="/usr/bin/x"):
+            with patch("globaltalk.scrape.getzones", return_value=["A"]):
+                with patch("globaltalk.scrape.nbplkup", return_value=[]) as lookup:
+                    result = scrape()
+        self.assertEqual(lookup.call_args.args, ("A", None))
+        self.assertNotIn("types", result)
+
+
+class TestCanonicalise(unittest.TestCase):
+    """Tests for canonicalise()."""
+
+    def _shuffled(self):
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        data["zones"].reverse()
+        data["nodes"].reverse()
+        return data
+
+    def test_order_independent(self):
+        self.assertEqual(canonicalise(SNAPSHOT_BASIC), canonicalise(self._shuffled()))
+
+    def test_sorted_by_zone_then_key(self):
+        result = canonicalise(self._shuffled())
+        self.assertEqual(result["zones"], sorted(SNAPSHOT_BASIC["zones"]))
+        zones = [n["zone"] for n in result["nodes"]]
+        self.assertEqual(zones, sorted(zones))
+        self.assertEqual(len(result["nodes"]), len(SNAPSHOT_BASIC["nodes"]))
+
+    def test_input_not_modified(self):
+        data = self._shuffled()
+        before = copy.deepcopy(data)
+        canonicalise(data)
+        self.assertEqual(data, before)
+
+    def test_zone_hashes_track_changes(self):
+        before = canonicalise(SNAPSHOT_BASIC)["zone_hashes"]
+        self.assertEqual(set(before), {"Doofnet", "RetroZone"})
+
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        next(n for n in data["nodes"] if n["zone"] == "RetroZone")["object"] = "x"
+        after = canonicalise(data)["zone_hashes"]
+        self.assertEqual(after["Doofnet"], before["Doofnet"])
+        self.assertNotEqual(after["RetroZone"], before["RetroZone"])
+
+    def test_snapshot_uses_stored_hashes(self):
+        canonical = canonicalise(SNAPSHOT_BASIC)
+        self.assertEqual(
+            Snapshot(canonical).zone_hashes, Snapshot(SNAPSHOT_BASIC).zone_hashes
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
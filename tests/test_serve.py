@@ -0,0 +1,302 @@
+"""
+Tests for globaltalk.serve
+
+Covers:
+  - make_response / _accepts_gzip / _etag_matches
+  - Generation (fixed endpoints, zone and node responses, trailing slashes,
+    errors, bounded cache of lazily rendered responses)
+  - SnapshotState.reload (invalid or unrenderable snapshot keeps the
+    previous generation, and the watcher keeps reloading after one)
+  - the HTTP server (status codes, gzip, ETag revalidation, reload)
+"""
+
+import copy
+import gzip
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from globaltalk.serve import (
+    Generation,
+    HTTPError,
+    SnapshotHTTPServer,
+    SnapshotState,
+    _accepts_gzip,
+    _etag_matches,
+    make_response,
+)
+from globaltalk.snapshot import Snapshot
+from globaltalk.visualise import to_mermaid
+from globaltalk.watch import watch_file
+from tests.fixtures import SNAPSHOT_BASIC
+
+
+def _generation(data=SNAPSHOT_BASIC, **kwargs):
+    raw = json.dumps(data).encode("utf-8")
+    return Generation(raw, Snapshot(copy.deepcopy(data)), **kwargs)
+
+
+class TestHelpers(unittest.TestCase):
+    def test_make_response(self):
+        response = make_response(b"{}")
+        self.assertEqual(gzip.decompress(response.gzipped), b"{}")
+        self.assertEqual(response.etag, make_response(b"{}").etag)
+        self.assertNotEqual(response.etag, make_response(b"[]").etag)
+        # Compression is deterministic, so reloads do not churn the bytes.
+        self.assertEqual(response.gzipped, make_response(b"{}").gzipped)
+
+    def test_accepts_gzip(self):
+        for header, expected in (
+            (None, False),
+            ("identity", False),
+            ("gzip", True),
+            ("deflate, gzip;q=0.5", True),
+            ("gzip;q=0", False),
+            ("*", True),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(_accepts_gzip(header), expected)
+
+    def test_etag_matches(self):
+        self.assertTrue(_etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(_etag_matches('W/"b"', '"b"'))
+        self.assertTrue(_etag_matches("*", '"b"'))
+        self.assertFalse(_etag_matches('"a"', '"b"'))
+        self.assertFalse(_etag_matches(None, '"b"'))
+
+
+class TestGeneration(unittest.TestCase):
+    def _json(self, generation, path, query=""):
+        return json.loads(generation.response(path, query).body)
+
+    def test_fixed_endpoints(self):
+        generation = _generation()
+        self.assertEqual(self._json(generation, "/snapshot"), SNAPSHOT_BASIC)
+        zones = self._json(generation, "/zones")["zones"]
+        self.assertEqual(
+            [(z["name"], z["nodes"]) for z in zones], [("Doofnet", 6), ("RetroZone", 1)]
+        )
+        self.assertTrue(all(z["hash"] for z in zones))
+        self.assertEqual(
+            generation.response("/viz/mermaid").body.decode(),
+            to_mermaid(SNAPSHOT_BASIC),
+        )
+        self.assertEqual(self._json(generation, "/viz/d3")["name"], "GlobalTalk")
+
+    def test_zone(self):
+        generation = _generation()
+        zone = self._json(generation, "/zones/RetroZone")
+        self.assertEqual(zone["name"], "RetroZone")
+        self.assertEqual(len(zone["nodes"]), 1)
+        with self.assertRaises(HTTPError) as cm:
+            generation.response("/zones/Nowhere")
+        self.assertEqual(cm.exception.status, 404)
+
+    def test_zone_name_is_unquoted(self):
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        data["zones"].append("Back Room")
+        zone = self._json(_generation(data), "/zones/Back%20Room")
+        self.assertEqual(zone, {"name": "Back Room", "hash": None, "nodes": []})
+
+    def test_trailing_slash(self):
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        data["zones"].append("Net/")
+        generation = _generation(data)
+        self.assertIs(generation.response("/zones/"), generation.response("/zones"))
+        self.assertEqual(self._json(generation, "/nodes/")["nodes"], data["nodes"])
+        # A zone name is taken verbatim, trailing slashes included.
+        self.assertEqual(self._json(generation, "/zones/Net/")["name"], "Net/")
+        self.assertEqual(self._json(generation, "/zones/Net%2F")["name"], "Net/")
+
+    def test_nodes(self):
+        generation = _generation()
+        nodes = self._json(generation, "/nodes", "type=LaserWriter&zone=Doofnet")
+        self.assertEqual(
+            nodes["nodes"],
+            [
+                n
+                for n in SNAPSHOT_BASIC["nodes"]
+                if n["type"] == "LaserWriter" and n["zone"] == "Doofnet"
+            ],
+        )
+        everything = self._json(generation, "/nodes")["nodes"]
+        self.assertEqual(everything, SNAPSHOT_BASIC["nodes"])
+
+        # Parameter order does not create a second entry.
+        first = generation.response("/nodes", "type=Workstation&zone=Doofnet")
+        second = generation.response("/nodes", "zone=Doofnet&type=Workstation")
+        self.assertIs(first, second)
+
+    def test_network_filter_with_non_canonical_address(self):
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        data["nodes"][-1]["address"] = "06100.5"
+        nodes = self._json(_generation(data), "/nodes", "network=6100")["nodes"]
+        self.assertEqual(nodes, [data["nodes"][-1]])
+
+    def test_bad_requests(self):
+        generation = _generation()
+        for path, query, status in (
+            ("/nodes", "colour=beige", 400),
+            ("/nodes", "network=nope", 400),
+            ("/elsewhere", "", 404),
+        ):
+            with self.subTest(path=path, query=query):
+                with self.assertRaises(HTTPError) as cm:
+                    generation.response(path, query)
+                self.assertEqual(cm.exception.status, status)
+
+    def test_lazy_responses_bounded(self):
+        generation = _generation(max_cached=1)
+        first = generation.response("/zones/Doofnet")
+        self.assertIs(generation.response("/zones/Doofnet"), first)
+        generation.response("/zones/RetroZone")
+        self.assertIsNot(generation.response("/zones/Doofnet"), first)
+
+
+class _StateTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "snapshot.json")
+        self.state = SnapshotState(self.path)
+
+    def _write(self, data):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh)
+
+
+class TestSnapshotState(_StateTestCase):
+    def test_reload_keeps_previous_on_error(self):
+        with self.assertLogs("root", level="ERROR"):
+            self.assertFalse(self.state.reload())
+        self.assertIsNone(self.state.current)
+
+        self._write(SNAPSHOT_BASIC)
+        with self.assertLogs("root", level="INFO"):
+            self.assertTrue(self.state.reload())
+        current = self.state.current
+
+        self._write({"nodes": []})
+        with self.assertLogs("root", level="ERROR"):
+            self.assertFalse(self.state.reload())
+        self.assertIs(self.state.current, current)
+
+    def _unrenderable(self):
+        # Valid structure, but the renderers need every node's object.
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        del data["nodes"][0]["object"]
+        return data
+
+    def test_render_failure_keeps_previous(self):
+        self._write(SNAPSHOT_BASIC)
+        with self.assertLogs("root", level="INFO"):
+            self.state.reload()
+        current = self.state.current
+
+        self._write(self._unrenderable())
+        with self.assertLogs("root", level="ERROR"):
+            self.assertFalse(self.state.reload())
+        self.assertIs(self.state.current, current)
+
+    def test_watcher_survives_render_failure(self):
+        self._write(self._unrenderable())
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch_file,
+            args=(self.path, self.state.reload, 0.02),
+            kwargs={"use_inotify": False, "stop": stop},
+            daemon=True,
+        )
+        with self.assertLogs("root", level="INFO"):
+            thread.start()
+            self.addCleanup(thread.join, 5)
+            self.addCleanup(stop.set)
+            time.sleep(0.1)
+            self.assertIsNone(self.state.current)
+
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            os.replace(tmp, self.path)
+            deadline = time.monotonic() + 5
+            while self.state.current is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIsNotNone(self.state.current)
+        self.assertTrue(thread.is_alive())
+
+
+class TestServer(_StateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = SnapshotHTTPServer(("127.0.0.1", 0), self.state)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+        def _stop():
+            self.server.shutdown()
+            self.server.server_close()
+            thread.join()
+
+        self.addCleanup(_stop)
+
+    def _get(self, path, headers=None, method="GET"):
+        host, port = self.server.server_address[:2]
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def test_unavailable_before_first_load(self):
+        response, body = self._get("/zones")
+        self.assertEqual(response.status, 503)
+        self.assertIn("error", json.loads(body))
+
+    def test_get_gzip_and_revalidation(self):
+        self._write(SNAPSHOT_BASIC)
+        with self.assertLogs("root", level="INFO"):
+            self.state.reload()
+
+        response, body = self._get("/zones")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "application/json")
+        etag = response.getheader("ETag")
+        self.assertEqual(len(json.loads(body)["zones"]), 2)
+
+        response, compressed = self._get("/zones", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(compressed), body)
+
+        response, body = self._get("/zones", {"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+
+        response, body = self._get("/zones", method="HEAD")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+
+        response, _ = self._get("/zones/Nowhere")
+        self.assertEqual(response.status, 404)
+
+    def test_reload_changes_etag(self):
+        self._write(SNAPSHOT_BASIC)
+        with self.assertLogs("root", level="INFO"):
+            self.state.reload()
+        etag = self._get("/zones/RetroZone")[0].getheader("ETag")
+
+        data = copy.deepcopy(SNAPSHOT_BASIC)
+        next(n for n in data["nodes"] if n["zone"] == "RetroZone")["object"] = "x"
+        self._write(data)
+        with self.assertLogs("root", level="INFO"):
+            self.state.reload()
+
+        response, body = self._get("/zones/RetroZone", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body)["nodes"][0]["object"], "x")
+
+
+if __name__ == "__main__":
+    unittest.main()
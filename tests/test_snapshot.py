@@ -0,0 +1,198 @@
+"""
+Tests for globaltalk.snapshot
+
+Covers:
+  - validate / Snapshot.load (valid, invalid, missing fields)
+  - by_zone / by_type / by_address / unique_devices / multihomed_devices
+  - index caching (each view built once, shared across formatters)
+  - as_snapshot (partial dictionaries wrapped without validation)
+  - pack_address / unpack_address / parse_network_range / AddressIndex
+  - Snapshot and dict inputs give identical metrics, mermaid and D3 output
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from globaltalk.exposition import render
+from globaltalk.metrics import collect_metrics
+from globaltalk.snapshot import (
+    AddressIndex,
+    Snapshot,
+    as_snapshot,
+    pack_address,
+    parse_network_range,
+    unpack_address,
+    validate,
+)
+from globaltalk.visualise import to_d3, to_mermaid
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_EMPTY, SNAPSHOT_NO_TIMESTAMP
+
+
+class TestValidate(unittest.TestCase):
+    def test_valid_snapshot_returned(self):
+        self.assertIs(validate(SNAPSHOT_BASIC), SNAPSHOT_BASIC)
+
+    def test_non_object_rejected(self):
+        with self.assertRaises(ValueError):
+            Snapshot([])
+
+    def test_missing_fields_rejected(self):
+        with self.assertRaises(ValueError):
+            Snapshot({"nodes": []})
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            self.assertEqual(len(Snapshot.load(path)), 7)
+
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write("{not json")
+            with self.assertRaises(ValueError):
+                Snapshot.load(path)
+
+
+class TestViews(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = Snapshot(SNAPSHOT_BASIC)
+
+    def test_by_zone(self):
+        self.assertEqual(
+            {zone: len(nodes) for zone, nodes in self.snapshot.by_zone.items()},
+            {"Doofnet": 6, "RetroZone": 1},
+        )
+
+    def test_by_type_keeps_snapshot_order(self):
+        self.assertEqual(
+            [n["object"] for n in self.snapshot.by_type["Workstation"]],
+            ["nas-afp", "retro-mac"],
+        )
+
+    def test_by_address(self):
+        self.assertEqual(len(self.snapshot.by_address["5311.212"]), 4)
+
+    def test_devices(self):
+        self.assertEqual(self.snapshot.unique_devices, 4)
+        self.assertEqual(self.snapshot.multihomed_devices, ["5311.212"])
+
+    def test_missing_field_grouped_as_unknown(self):
+        snapshot = Snapshot({"zones": [], "nodes": [{"object": "x"}]})
+        self.assertEqual(list(snapshot.by_zone), ["Unknown"])
+
+    def test_empty_snapshot(self):
+        snapshot = Snapshot(SNAPSHOT_EMPTY)
+        self.assertEqual(snapshot.by_zone, {})
+        self.assertEqual(snapshot.unique_devices, 0)
+
+
+class TestCaching(unittest.TestCase):
+    def test_views_cached(self):
+        snapshot = Snapshot(SNAPSHOT_BASIC)
+        self.assertIs(snapshot.by_zone, snapshot.by_zone)
+
+    def test_each_index_built_once_across_formatters(self):
+        snapshot = Snapshot(SNAPSHOT_BASIC)
+        with patch.object(
+            Snapshot, "_group_by", autospec=True, side_effect=Snapshot._group_by
+        ) as group_by:
+            collect_metrics(snapshot)
+            to_mermaid(snapshot)
+            to_d3(snapshot)
+        fields = sorted(call.args[1] for call in group_by.call_args_list)
+        self.assertEqual(fields, ["address", "type", "zone"])
+
+    def test_as_snapshot(self):
+        snapshot = Snapshot(SNAPSHOT_BASIC)
+        self.assertIs(as_snapshot(snapshot), snapshot)
+        self.assertIs(as_snapshot(SNAPSHOT_BASIC).data, SNAPSHOT_BASIC)
+
+    def test_as_snapshot_is_lenient(self):
+        with self.assertNoLogs("root", level="WARNING"):
+            snapshot = as_snapshot({"format": "v2", "zones": ["A"]})
+        self.assertEqual((snapshot.nodes, snapshot.zones), ([], ["A"]))
+        self.assertEqual(as_snapshot({"nodes": []}).zones, [])
+        with self.assertRaises(ValueError):
+            Snapshot({"nodes": []})
+
+    def test_partial_dicts_render_empty(self):
+        self.assertEqual(
+            to_mermaid({"nodes": []}), "```mermaid\nmindmap\n  root)GlobalTalk(\n```\n"
+        )
+        self.assertEqual(
+            to_d3({"zones": ["A"]}), {"name": "GlobalTalk", "children": []}
+        )
+
+
+class TestConsumers(unittest.TestCase):
+    def test_metrics_identical(self):
+        # No generated_at, so there is no time-dependent age gauge.
+        self.assertEqual(
+            render(collect_metrics(SNAPSHOT_NO_TIMESTAMP)),
+            render(collect_metrics(Snapshot(SNAPSHOT_NO_TIMESTAMP))),
+        )
+
+    def test_visualisations_identical(self):
+        snapshot = Snapshot(SNAPSHOT_BASIC)
+        self.assertEqual(to_mermaid(SNAPSHOT_BASIC), to_mermaid(snapshot))
+        self.assertEqual(to_d3(SNAPSHOT_BASIC), to_d3(snapshot))
+
+
+class TestAddressIndex(unittest.TestCase):
+    def test_pack_round_trip(self):
+        self.assertEqual(pack_address("5311.212"), 5311 << 8 | 212)
+        self.assertEqual(unpack_address(pack_address("5311.212")), "5311.212")
+
+    def test_pack_rejects_invalid(self):
+        for address in (
+            "",
+            "5311",
+            "a.b",
+            "5311.256",
+            "65536.1",
+            "-1.2",
+            "1.\u00b2",  # superscript two
+            "1.\u0663",  # Arabic-Indic three
+        ):
+            with self.subTest(address=address):
+                self.assertIsNone(pack_address(address))
+
+    def test_unusual_digits_counted_invalid(self):
+        snapshot = Snapshot(
+            {"zones": [], "nodes": [{"address": "1.\u00b2"}, {"address": "1.2"}]}
+        )
+        self.assertEqual(len(snapshot.address_index), 1)
+        self.assertEqual(snapshot.address_index.invalid, 1)
+
+    def test_parse_network_range(self):
+        self.assertEqual(parse_network_range("5000-5999"), (5000, 5999))
+        self.assertEqual(parse_network_range("5311"), (5311, 5311))
+        for text in ("", "x-1", "10-5", "1-70000"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_network_range(text)
+
+    def test_index(self):
+        index = Snapshot(SNAPSHOT_BASIC).address_index
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.network_counts(), {5311: 3, 6100: 1})
+        self.assertEqual(index.count_range(5000, 5999), 3)
+        self.assertEqual(index.count_range(5312, 6099), 0)
+        self.assertEqual(index.addresses_in_range(6000, 7000), ["6100.5"])
+        self.assertEqual(
+            [network for network, _ in index.iter_networks()], [5311, 6100]
+        )
+
+    def test_numeric_order_and_invalid(self):
+        index = AddressIndex(["10.2", "9.30", "10.10", "10.2", "bogus"])
+        self.assertEqual(
+            list(index.iter_networks()), [(9, ["9.30"]), (10, ["10.2", "10.10"])]
+        )
+        self.assertEqual(index.invalid, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
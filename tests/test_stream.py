@@ -0,0 +1,148 @@
+"""
+Tests for globaltalk.stream
+
+Covers:
+  - iter_nodes (same records as json.load, any chunk size, member order,
+    top-level fields collected)
+  - iter_nodes errors (invalid root, missing fields, truncated and malformed
+    JSON, extra data)
+  - count_file / load_metrics_source (streamed metrics identical to loaded)
+  - metrics --stream-threshold
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from globaltalk.exposition import render
+from globaltalk.metrics import (
+    SnapshotCounts,
+    ZoneTypeLimits,
+    collect_metrics,
+    count_file,
+    load_metrics_source,
+    main,
+)
+from globaltalk.snapshot import Snapshot
+from globaltalk.stream import iter_nodes
+from tests.fixtures import (
+    SNAPSHOT_BASIC,
+    SNAPSHOT_EMPTY,
+    SNAPSHOT_MULTI_JROUTER,
+    SNAPSHOT_NO_TIMESTAMP,
+)
+
+
+def _stream(text, chunk_size=7):
+    fields = {}
+    nodes = list(iter_nodes(io.StringIO(text), fields, chunk_size=chunk_size))
+    return fields, nodes
+
+
+class TestIterNodes(unittest.TestCase):
+    def test_matches_json_load(self):
+        for data in (SNAPSHOT_BASIC, SNAPSHOT_EMPTY, SNAPSHOT_MULTI_JROUTER):
+            for indent in (None, 2):
+                for chunk_size in (1, 7, 4096):
+                    with self.subTest(indent=indent, chunk_size=chunk_size):
+                        fields, nodes = _stream(
+                            json.dumps(data, indent=indent), chunk_size
+                        )
+                        self.assertEqual(nodes, data["nodes"])
+                        self.assertEqual(
+                            fields, {k: v for k, v in data.items() if k != "nodes"}
+                        )
+
+    def test_fields_after_nodes(self):
+        text = '{"nodes": [{"object": "a"}], "zones": ["Z"], "count": 12345}'
+        fields, nodes = _stream(text, chunk_size=1)
+        self.assertEqual(nodes, [{"object": "a"}])
+        # The number is split across chunks and must not be cut short.
+        self.assertEqual(fields, {"zones": ["Z"], "count": 12345})
+
+    def test_nodes_yielded_lazily(self):
+        text = json.dumps(SNAPSHOT_BASIC)
+        nodes = iter_nodes(io.StringIO(text), {})
+        self.assertEqual(next(nodes), SNAPSHOT_BASIC["nodes"][0])
+
+    def test_invalid_root(self):
+        with self.assertRaisesRegex(ValueError, "root must be an object"):
+            _stream("[]")
+
+    def test_missing_fields(self):
+        for text in ('{"nodes": []}', '{"zones": []}', "{}"):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, "'nodes' and 'zones'"):
+                    _stream(text)
+
+    def test_malformed(self):
+        for text in (
+            "",
+            '{"zones": [], "nodes": [{"object": "a"}',
+            '{"zones": [], "nodes": [{"object": "a"},]}',
+            '{"zones": [] "nodes": []}',
+            '{"zones": [], "nodes": {}}',
+            '{"zones": [], "nodes": []} []',
+        ):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, "Failed to decode JSON"):
+                    _stream(text)
+
+    def test_unknown_format_warns(self):
+        with self.assertLogs("root", level="WARNING"):
+            _stream('{"format": "v2", "zones": [], "nodes": []}')
+
+
+class TestStreamedMetrics(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "snapshot.json")
+
+    def _write(self, data):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=2)
+
+    def test_counts_match_loaded_snapshot(self):
+        for data in (SNAPSHOT_NO_TIMESTAMP, SNAPSHOT_MULTI_JROUTER, SNAPSHOT_EMPTY):
+            # Drop generated_at so there is no time-dependent age gauge.
+            data = {k: v for k, v in data.items() if k != "generated_at"}
+            with self.subTest(zones=data["zones"]):
+                self._write(data)
+                limits = ZoneTypeLimits(top_k=1)
+                self.assertEqual(
+                    render(
+                        collect_metrics(
+                            count_file(self.path, chunk_size=16), zone_types=limits
+                        )
+                    ),
+                    render(collect_metrics(Snapshot(data), zone_types=limits)),
+                )
+
+    def test_load_metrics_source_threshold(self):
+        self._write(SNAPSHOT_BASIC)
+        self.assertIsInstance(load_metrics_source(self.path, 0), SnapshotCounts)
+        self.assertIsInstance(load_metrics_source(self.path), Snapshot)
+        self.assertIsInstance(load_metrics_source(self.path, None), Snapshot)
+
+    def test_cli_streamed_output_identical(self):
+        self._write(SNAPSHOT_NO_TIMESTAMP)
+        outputs = []
+        for threshold in ("0", str(2**40)):
+            with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                main([self.path, "--stream-threshold", threshold, "--quiet"])
+            outputs.append(stdout.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_cli_streamed_invalid_snapshot(self):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.write('{"zones": [], "nodes": [')
+        with self.assertRaises(SystemExit):
+            main([self.path, "--stream-threshold", "0", "--quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,17 +4,34 @@ Tests for globaltalk.visualise
 Covers:
   - to_mermaid (zone branches, leaf deduplication, excluded types,
                 include_infrastructure flag, empty snapshot, special characters)
+  - to_mermaid limits (max_leaves / max_zones "+N more" nodes)
+  - split_mermaid (zone groups, numbered roots) and the --split CLI option
+    (stale files removed, --output rejected)
   - to_d3 (tree structure, included types filter, empty zones omitted,
            all-types mode, empty snapshot)
+  - to_d3 summary mode (type level, endpoint counts, top-N "+N more" leaves,
+                       max-leaves collapse)
+  - write_d3 (parity with json.dump of to_d3, compact mode, incremental writes)
+  - to_d3_networks (network → address → endpoint grouping, --by-network)
 """
 
+import io
+import json
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
 from globaltalk.visualise import (
     _D3_INCLUDED_TYPES,
+    D3Summary,
     _MERMAID_EXCLUDED_TYPES,
+    main,
+    split_mermaid,
     to_d3,
+    to_d3_networks,
     to_mermaid,
+    write_d3,
 )
 from tests.fixtures import (
     SNAPSHOT_BASIC,
@@ -239,6 +256,115 @@ class TestToMermaidLabelEscaping(unittest.TestCase):
         self.assertGreater(len(out), 50)
 
 
+class TestToMermaidLimits(unittest.TestCase):
+    """Verify the max_leaves / max_zones summarisation."""
+
+    def setUp(self):
+        # Zone "Big" has 5 devices, "Mid" 3, "Small" 1.
+        nodes = [_node(f"big{i}", "Workstation", "1.1", "Big") for i in range(5)]
+        nodes += [_node(f"mid{i}", "Workstation", "2.1", "Mid") for i in range(3)]
+        nodes += [_node("small0", "Workstation", "3.1", "Small")]
+        self.data = _snapshot(["Small", "Big", "Mid"], nodes)
+
+    def test_no_limits_matches_default(self):
+        self.assertEqual(
+            to_mermaid(self.data, max_leaves=None, max_zones=None),
+            to_mermaid(self.data),
+        )
+
+    def test_max_leaves_collapses_overflow(self):
+        out = to_mermaid(self.data, max_leaves=2)
+        self.assertIn('"big1"', out)
+        self.assertNotIn('"big2"', out)
+        self.assertIn('      "+3 more"\n', out)
+        self.assertIn('      "+1 more"\n', out)
+
+    def test_max_leaves_not_reached_adds_nothing(self):
+        self.assertNotIn("more", to_mermaid(self.data, max_leaves=5))
+
+    def test_max_zones_keeps_largest_in_snapshot_order(self):
+        out = to_mermaid(self.data, max_zones=2)
+        self.assertNotIn('"Small"', out)
+        self.assertLess(out.index('"Big"'), out.index('"Mid"'))
+        self.assertIn('    "+1 more zones"\n', out)
+
+    def test_invalid_limit_raises(self):
+        with self.assertRaises(ValueError):
+            to_mermaid(self.data, max_leaves=0)
+
+
+class TestSplitMermaid(unittest.TestCase):
+    """Verify splitting the mindmap into one document per zone group."""
+
+    def setUp(self):
+        zones = ["A", "B", "C"]
+        self.data = _snapshot(
+            zones, [_node(f"mac{z}", "Workstation", "1.1", z) for z in zones]
+        )
+
+    def test_groups_zones(self):
+        docs = split_mermaid(self.data, 2)
+        self.assertEqual(len(docs), 2)
+        self.assertIn('"A"', docs[0])
+        self.assertIn('"B"', docs[0])
+        self.assertIn('"C"', docs[1])
+        self.assertIn("root)GlobalTalk 2 of 2(", docs[1])
+
+    def test_single_group_matches_to_mermaid(self):
+        self.assertEqual(split_mermaid(self.data, 10), [to_mermaid(self.data)])
+
+    def test_empty_snapshot_gives_one_document(self):
+        self.assertEqual(split_mermaid(SNAPSHOT_EMPTY, 2), [to_mermaid(SNAPSHOT_EMPTY)])
+
+    def test_cli_writes_one_file_per_group(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh)
+            out_dir = os.path.join(d, "maps")
+            main(["mermaid", path, "--split", "1", "--output-dir", out_dir])
+            self.assertEqual(
+                sorted(os.listdir(out_dir)),
+                ["mindmap-01.md", "mindmap-02.md", "mindmap-03.md"],
+            )
+
+    def test_cli_removes_stale_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh)
+            out_dir = os.path.join(d, "maps")
+            os.makedirs(out_dir)
+            for name in ("mindmap-05.md", "mindmap-001.md", "notes.md"):
+                with open(os.path.join(out_dir, name), "w", encoding="utf-8") as fh:
+                    fh.write("old")
+            main(["mermaid", path, "--split", "2", "--output-dir", out_dir])
+            self.assertEqual(
+                sorted(os.listdir(out_dir)),
+                ["mindmap-01.md", "mindmap-02.md", "notes.md"],
+            )
+
+    def test_cli_split_rejects_output(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh)
+            argv = ["mermaid", path, "--split", "1", "--output-dir", d]
+            with patch("sys.stderr", new_callable=io.StringIO) as stderr:
+                with self.assertRaises(SystemExit):
+                    main([*argv, "--output", os.path.join(d, "out.md")])
+            self.assertIn("--output", stderr.getvalue())
+            self.assertFalse(any(n.startswith("mindmap-") for n in os.listdir(d)))
+
+    def test_cli_split_requires_output_dir(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snap.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh)
+            with self.assertRaises(SystemExit):
+                main(["mermaid", path, "--split", "1"])
+
+
 # ---------------------------------------------------------------------------
 # to_d3
 # ---------------------------------------------------------------------------
@@ -468,5 +594,187 @@ class TestToD3Serialisability(unittest.TestCase):
         self.assertIn("GlobalTalk", serialised)
 
 
+class TestToD3Summary(unittest.TestCase):
+    """Verify the pre-aggregated, level-of-detail D3 tree."""
+
+    def _zone(self, n_objects=5, endpoints=1):
+        nodes = []
+        for i in range(n_objects):
+            for socket in range(endpoints):
+                nodes.append(
+                    _node(f"mac{i}", "Workstation", f"1.{i}", "Z", socket=str(socket))
+                )
+        nodes.append(_node("printer", "LaserWriter", "1.99", "Z"))
+        return _snapshot(["Z"], nodes)
+
+    def _children(self, data, **limits):
+        result = to_d3(data, summary=D3Summary(**limits))
+        return result["children"][0]["children"]
+
+    def test_type_level_under_zone(self):
+        types = self._children(self._zone(), max_leaves=None)
+        self.assertEqual([t["name"] for t in types], ["LaserWriter", "Workstation"])
+
+    def test_leaf_value_is_endpoint_count(self):
+        data = _snapshot(
+            ["Doofnet"],
+            [
+                _node("nas-afp", "AFPServer", "5311.212", "Doofnet", socket="128"),
+                _node("nas-afp", "AFPServer", "5311.212", "Doofnet", socket="129"),
+            ],
+        )
+        types = self._children(data)
+        self.assertEqual(types[0]["children"], [{"name": "nas-afp", "value": 2}])
+
+    def test_top_n_groups_remainder(self):
+        types = self._children(self._zone(n_objects=5), top_n=3)
+        workstations = next(t for t in types if t["name"] == "Workstation")
+        # The printer takes one of the zone's three places.
+        self.assertEqual(len(workstations["children"]), 3)
+        self.assertEqual(workstations["children"][-1], {"name": "+3 more", "value": 3})
+
+    def test_top_n_applies_across_the_zone(self):
+        data = self._zone(n_objects=3)
+        data["nodes"].append(_node("mac0", "Workstation", "1.0", "Z", socket="9"))
+        types = self._children(data, top_n=1)
+        self.assertEqual(
+            types,
+            [
+                {"name": "LaserWriter", "children": [{"name": "+1 more", "value": 1}]},
+                {
+                    "name": "Workstation",
+                    "children": [
+                        {"name": "mac0", "value": 2},
+                        {"name": "+2 more", "value": 2},
+                    ],
+                },
+            ],
+        )
+
+    def test_top_n_keeps_largest_objects(self):
+        data = self._zone(n_objects=2)
+        data["nodes"].append(_node("mac1", "Workstation", "1.1", "Z", socket="9"))
+        types = self._children(data, top_n=1)
+        workstations = next(t for t in types if t["name"] == "Workstation")
+        self.assertEqual(workstations["children"][0], {"name": "mac1", "value": 2})
+
+    def test_large_zone_collapsed_to_type_counts(self):
+        types = self._children(self._zone(n_objects=5), max_leaves=3)
+        self.assertEqual(
+            types,
+            [{"name": "LaserWriter", "value": 1}, {"name": "Workstation", "value": 5}],
+        )
+
+    def test_top_n_applied_before_collapse(self):
+        # 5 workstations trimmed to 2 + "+3 more" = 3 leaves, plus 1 printer.
+        types = self._children(self._zone(n_objects=5), max_leaves=4, top_n=2)
+        self.assertIn("children", types[0])
+
+    def test_total_value_preserved(self):
+        def _total(node):
+            if "children" in node:
+                return sum(_total(c) for c in node["children"])
+            return node["value"]
+
+        data = self._zone(n_objects=7, endpoints=2)
+        for limits in ({}, {"top_n": 2}, {"max_leaves": 1}):
+            with self.subTest(limits=limits):
+                result = to_d3(data, summary=D3Summary(**limits))
+                self.assertEqual(_total(result), len(data["nodes"]))
+
+    def test_summary_streamed_by_write_d3(self):
+        buf = io.StringIO()
+        summary = D3Summary(top_n=1)
+        write_d3(SNAPSHOT_BASIC, buf, summary=summary)
+        self.assertEqual(
+            json.loads(buf.getvalue()), to_d3(SNAPSHOT_BASIC, summary=summary)
+        )
+
+
+class TestWriteD3(unittest.TestCase):
+    """Verify the streaming D3 writer."""
+
+    def _write(self, data, **kwargs) -> str:
+        buf = io.StringIO()
+        write_d3(data, buf, **kwargs)
+        return buf.getvalue()
+
+    def test_matches_json_dump_of_to_d3(self):
+        for data in (SNAPSHOT_BASIC, SNAPSHOT_EMPTY, SNAPSHOT_MULTI_JROUTER):
+            with self.subTest(zones=data["zones"]):
+                expected = json.dumps(to_d3(data, include_types=[]), indent=2)
+                self.assertEqual(self._write(data, include_types=[]), expected)
+
+    def test_default_types_match_to_d3(self):
+        self.assertEqual(
+            self._write(SNAPSHOT_BASIC), json.dumps(to_d3(SNAPSHOT_BASIC), indent=2)
+        )
+
+    def test_compact_output(self):
+        expected = json.dumps(to_d3(SNAPSHOT_BASIC), separators=(",", ":"))
+        self.assertEqual(self._write(SNAPSHOT_BASIC, compact=True), expected)
+
+    def test_compact_empty_snapshot(self):
+        out = self._write(SNAPSHOT_EMPTY, compact=True)
+        self.assertEqual(json.loads(out), {"name": "GlobalTalk", "children": []})
+
+    def test_zones_written_incrementally(self):
+        data = _snapshot(
+            ["A", "B", "C"],
+            [_node(f"mac{z}", "Workstation", "1.1", z) for z in ("A", "B", "C")],
+        )
+        buf = io.StringIO()
+        writes = []
+        buf.write = writes.append
+        write_d3(data, buf)
+        # Each zone object is written with its own write() call.
+        self.assertEqual(sum(1 for w in writes if '"name": "mac' in w), 3)
+
+
+class TestToD3Networks(unittest.TestCase):
+    def test_grouped_by_network(self):
+        tree = to_d3_networks(SNAPSHOT_BASIC, include_types=[])
+        self.assertEqual(
+            [n["name"] for n in tree["children"]], ["Network 5311", "Network 6100"]
+        )
+        devices = tree["children"][0]["children"]
+        # Numeric, not lexical, order of node IDs.
+        self.assertEqual(
+            [d["name"] for d in devices], ["5311.1", "5311.100", "5311.212"]
+        )
+        self.assertEqual(len(devices[2]["children"]), 4)
+
+    def test_included_types_filter(self):
+        tree = to_d3_networks(SNAPSHOT_BASIC)
+        leaves = [
+            leaf["name"]
+            for network in tree["children"]
+            for device in network["children"]
+            for leaf in device["children"]
+        ]
+        self.assertNotIn("jrouter v0.0.12 - AppleRouter", leaves)
+        self.assertIn("retro-mac - Workstation", leaves)
+
+    def test_invalid_addresses_grouped_as_unknown(self):
+        data = {
+            "zones": ["Z"],
+            "nodes": [
+                {"object": "x", "type": "Workstation", "address": "?", "zone": "Z"}
+            ],
+        }
+        tree = to_d3_networks(data)
+        self.assertEqual([n["name"] for n in tree["children"]], ["Unknown"])
+
+    def test_cli_by_network(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "snapshot.json")
+            out = os.path.join(d, "tree.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(SNAPSHOT_BASIC, fh)
+            main(["d3", path, "--by-network", "--output", out])
+            with open(out, encoding="utf-8") as fh:
+                self.assertEqual(json.load(fh), to_d3_networks(SNAPSHOT_BASIC))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,244 @@
+"""
+Tests for globaltalk.watch
+
+Covers:
+  - file_signature (present, missing, changes on atomic replace)
+  - watch_file with polling and inotify (initial call, change, duplicate
+    events ignored, missing file tolerated)
+  - ZoneCache (hits, misses, invalidation, retain)
+  - cached to_mermaid / write_d3 output identical to uncached output
+  - metrics and visualise --watch (outputs rewritten, invalid snapshot kept)
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from globaltalk import metrics, visualise
+from globaltalk.snapshot import Snapshot, ZoneCache
+from globaltalk.visualise import D3Summary, to_mermaid, write_d3
+from globaltalk.watch import file_signature, watch_file
+from tests.fixtures import SNAPSHOT_BASIC, SNAPSHOT_NO_TIMESTAMP, snapshot_changed
+
+# Generous upper bound for a change to be noticed; the tests poll quickly.
+_TIMEOUT = 5.0
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+class _WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, "snapshot.json")
+
+    def _start(self, target, *args, **kwargs):
+        """Run *target* in a thread until the test ends; return its stop event."""
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=target, args=args, kwargs={**kwargs, "stop": stop}, daemon=True
+        )
+        thread.start()
+
+        def _join():
+            stop.set()
+            thread.join(_TIMEOUT)
+
+        self.addCleanup(_join)
+        return stop
+
+    def _wait_for(self, predicate):
+        deadline = time.monotonic() + _TIMEOUT
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(0.01)
+        self.fail("timed out waiting for the watcher")
+
+
+class TestFileSignature(_WatchTestCase):
+    def test_missing_file(self):
+        self.assertIsNone(file_signature(self.path))
+
+    def test_atomic_replace_changes_signature(self):
+        _write_json(self.path, SNAPSHOT_BASIC)
+        before = file_signature(self.path)
+        _write_json(self.path, SNAPSHOT_BASIC)
+        self.assertNotEqual(file_signature(self.path), before)
+
+
+class _WatchFileTests:
+    use_inotify = True
+
+    def test_called_initially_and_on_change(self):
+        _write_json(self.path, SNAPSHOT_BASIC)
+        calls = []
+        self._start(
+            watch_file,
+            self.path,
+            lambda: calls.append(1),
+            poll_interval=0.02,
+            use_inotify=self.use_inotify,
+        )
+        self._wait_for(lambda: len(calls) == 1)
+
+        _write_json(self.path, SNAPSHOT_NO_TIMESTAMP)
+        self._wait_for(lambda: len(calls) == 2)
+
+        # Unrelated files in the same directory do not trigger a callback.
+        _write_json(os.path.join(self.dir, "other.json"), SNAPSHOT_BASIC)
+        time.sleep(0.1)
+        self.assertEqual(len(calls), 2)
+
+    def test_missing_file_picked_up_later(self):
+        calls = []
+        self._start(
+            watch_file,
+            self.path,
+            lambda: calls.append(1),
+            poll_interval=0.02,
+            use_inotify=self.use_inotify,
+        )
+        self._wait_for(lambda: len(calls) == 1)
+        _write_json(self.path, SNAPSHOT_BASIC)
+        self._wait_for(lambda: len(calls) == 2)
+
+    def test_stop_ends_watch(self):
+        stop = threading.Event()
+        stop.set()
+        calls = []
+        watch_file(
+            self.path,
+            lambda: calls.append(1),
+            poll_interval=0.01,
+            use_inotify=self.use_inotify,
+            stop=stop,
+        )
+        self.assertEqual(calls, [1])
+
+
+class TestWatchFilePolling(_WatchFileTests, _WatchTestCase):
+    use_inotify = False
+
+
+class TestWatchFileInotify(_WatchFileTests, _WatchTestCase):
+    # Falls back to polling where inotify is unavailable, so this also
+    # exercises the fallback path on other platforms.
+    use_inotify = True
+
+
+class TestZoneCache(unittest.TestCase):
+    def test_hit_miss_and_invalidation(self):
+        cache = ZoneCache()
+        nodes = [{"object": "a"}]
+        self.assertEqual(cache.get("Z", nodes, lambda: 1), 1)
+        self.assertEqual(cache.get("Z", list(nodes), lambda: 2), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        self.assertEqual(cache.get("Z", [{"object": "b"}], lambda: 3), 3)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        cache.reset_stats()
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+    def test_retain(self):
+        cache = ZoneCache()
+        cache.get("A", [], lambda: 1)
+        cache.get("B", [], lambda: 2)
+        cache.retain(["B"])
+        self.assertEqual(len(cache), 1)
+
+
+class TestCachedRenderers(unittest.TestCase):
+    def test_mermaid_matches_uncached(self):
+        cache = ZoneCache()
+        for data in (SNAPSHOT_BASIC, snapshot_changed()):
+            self.assertEqual(to_mermaid(data, cache=cache), to_mermaid(data))
+        # Only RetroZone changed in the second render.
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_d3_matches_uncached(self):
+        for options in ({}, {"compact": True}, {"summary": D3Summary()}):
+            cache = ZoneCache()
+            for data in (SNAPSHOT_BASIC, snapshot_changed()):
+                cached, plain = io.StringIO(), io.StringIO()
+                write_d3(data, cached, include_types=[], cache=cache, **options)
+                write_d3(data, plain, include_types=[], **options)
+                self.assertEqual(cached.getvalue(), plain.getvalue())
+            self.assertEqual(cache.misses, 3)
+
+
+class TestWatchCommands(_WatchTestCase):
+    def _read(self, path):
+        with open(path, encoding="utf-8") as fh:
+            return fh.read()
+
+    def test_visualise_watch_rewrites_output(self):
+        _write_json(self.path, SNAPSHOT_BASIC)
+        out = os.path.join(self.dir, "map.md")
+        args = argparse.Namespace(
+            format="mermaid",
+            filename=self.path,
+            output=open(out, "w", encoding="utf-8"),
+            include_infrastructure=False,
+            max_leaves=None,
+            max_zones=None,
+            split=None,
+            poll_interval=0.02,
+        )
+        with patch("sys.stderr", io.StringIO()):
+            self._start(visualise._watch, args)
+            self._wait_for(lambda: os.path.exists(out) and self._read(out) != "")
+            self.assertEqual(self._read(out), to_mermaid(SNAPSHOT_BASIC))
+
+            # An invalid snapshot leaves the previous output in place.
+            _write_json(self.path, {"nodes": []})
+            time.sleep(0.1)
+            self.assertEqual(self._read(out), to_mermaid(SNAPSHOT_BASIC))
+
+            _write_json(self.path, SNAPSHOT_NO_TIMESTAMP)
+            expected = to_mermaid(SNAPSHOT_NO_TIMESTAMP)
+            self._wait_for(lambda: self._read(out) == expected)
+
+    def test_metrics_watch_rewrites_output(self):
+        _write_json(self.path, SNAPSHOT_NO_TIMESTAMP)
+        out = os.path.join(self.dir, "out.prom")
+        args = argparse.Namespace(
+            filename=self.path,
+            output=open(out, "w", encoding="utf-8"),
+            prefix="globaltalk",
+            openmetrics=False,
+            timestamps=False,
+            push_url=None,
+            stream_threshold=None,
+            churn_state=None,
+            poll_interval=0.02,
+        )
+        expected = io.StringIO()
+        metrics.generate_metrics(Snapshot(SNAPSHOT_NO_TIMESTAMP), expected)
+        with self.assertLogs("root", level="INFO"):
+            self._start(metrics._watch_metrics, args, None)
+            self._wait_for(lambda: self._read(out) == expected.getvalue())
+
+    def test_watch_requires_output(self):
+        with patch("sys.stderr", io.StringIO()):
+            with self.assertRaises(SystemExit):
+                metrics.main([self.path, "--watch"])
+            with self.assertRaises(SystemExit):
+                visualise.main(["mermaid", self.path, "--watch"])
+
+
+if __name__ == "__main__":
+    unittest.main()